@@ -1,12 +1,54 @@
 # backend.py
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, Query, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional, List
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from typing import Optional, List, ClassVar, NamedTuple, Callable
+from dataclasses import dataclass, fields
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from random import Random
+from urllib.parse import urlencode
+import numpy as np
 import sqlite3
+import asyncio
+import threading
+import json
+import gzip
 import os
+import re
+import sys
+import hashlib
+import io
+import itertools
+import ast
+import copy
+import keyword
+import time
+import math
+import bisect
+import heapq
+import logging
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = ImageOps = None
 
 app = FastAPI()
+logger = logging.getLogger(__name__)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,12 +62,83 @@ app.add_middleware(
 DB_PATH = "window_calculator.db"
 
 
-def get_db():
-    conn = sqlite3.connect(DB_PATH)
+# ===================================
+# CATALOGS (one SQLite file per manufacturer)
+# ===================================
+# The default catalog is DB_PATH; other catalogs are CATALOG_DIR/<name>.db.
+# A request picks one with the X-Catalog header or an /api/catalogs/<name>/
+# path prefix, and everything below get_db() follows the choice.
+
+DEFAULT_CATALOG = "default"
+CATALOG_DIR = os.environ.get("CATALOG_DIR", "catalogs")
+CATALOG_NAME_RE = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+CATALOG_PATH_RE = re.compile(r'^/api/catalogs/([^/]+)(/.*)$')
+
+current_catalog_name = ContextVar('current_catalog_name', default=DEFAULT_CATALOG)
+
+# Catalogs whose schema has been created/migrated by this process
+initialized_catalogs = set()
+catalog_init_lock = threading.Lock()
+
+
+class CatalogRoutingMiddleware:
+    """Set the catalog of the request from `/api/catalogs/<name>/...` (the
+    prefix is stripped before routing) or the `X-Catalog` header"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] not in ('http', 'websocket'):
+            await self.app(scope, receive, send)
+            return
+        name = DEFAULT_CATALOG
+        match = CATALOG_PATH_RE.match(scope['path'])
+        if match:
+            name, path = match.group(1), '/api' + match.group(2)
+            scope = dict(scope, path=path, raw_path=path.encode())
+        else:
+            for key, value in scope['headers']:
+                if key == b'x-catalog':
+                    name = value.decode('latin-1').strip() or DEFAULT_CATALOG
+                    break
+        token = current_catalog_name.set(name)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_catalog_name.reset(token)
+
+
+app.add_middleware(CatalogRoutingMiddleware)
+
+
+def catalog_db_path(name):
+    if name == DEFAULT_CATALOG:
+        return DB_PATH
+    path = os.path.join(CATALOG_DIR, f"{name}.db")
+    if not CATALOG_NAME_RE.match(name) or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Catalog not found")
+    return path
+
+
+def open_db(path):
+    conn = sqlite3.connect(path, factory=TracedConnection) if SQL_TRACE else sqlite3.connect(path)
     conn.row_factory = sqlite3.Row
     return conn
 
 
+def get_db():
+    """Connection to the catalog of the current request"""
+    name = current_catalog_name.get()
+    path = catalog_db_path(name)
+    if name not in initialized_catalogs:
+        with catalog_init_lock:
+            if name not in initialized_catalogs:
+                init_db(path, seed=name == DEFAULT_CATALOG)
+                initialized_catalogs.add(name)
+    return open_db(path)
+
+
 def row_to_dict(row):
     if row is None:
         return None
@@ -36,11 +149,43 @@ def rows_to_list(rows):
     return [dict(row) for row in rows]
 
 
-def init_db():
+def get_catalog_version(cursor):
+    cursor.execute("SELECT value FROM metadata WHERE key = 'catalog_version'")
+    row = cursor.fetchone()
+    return int(row[0]) if row else 0
+
+
+def read_catalog_version():
     conn = get_db()
+    try:
+        return get_catalog_version(conn.cursor())
+    finally:
+        conn.close()
+
+
+def bump_catalog_version(cursor):
+    """Advance the catalog version; call inside the transaction of the edit"""
+    cursor.execute('''
+        UPDATE metadata SET value = CAST(value AS INTEGER) + 1
+        WHERE key = 'catalog_version'
+    ''')
+
+
+def init_db(path=None, seed=True):
+    """Create/migrate the schema; seed the Profilco catalog into an empty DB"""
+    conn = open_db(path or DB_PATH)
     cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(uw_limits)")
+    new_uw_limits = not cursor.fetchall()
     
     cursor.executescript('''
+        -- METADATA (catalog_version is bumped by every admin edit)
+        CREATE TABLE IF NOT EXISTS metadata (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        INSERT OR IGNORE INTO metadata (key, value) VALUES ('catalog_version', '1');
+
         -- 0. TYPES (Sliding / Opening)
         CREATE TABLE IF NOT EXISTS types (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -122,11 +267,107 @@ def init_db():
             FOREIGN KEY (category_id) REFERENCES categories(id),
             FOREIGN KEY (sash_id) REFERENCES sashes(id)
         );
+
+        -- Lookups of the calculator steps by parent id (SQL_TRACE showed
+        -- them scanning); driver_categories is searched by its UNIQUE index
+        CREATE INDEX IF NOT EXISTS idx_series_type ON series(type_id);
+        CREATE INDEX IF NOT EXISTS idx_categories_type ON categories(type_id);
+        CREATE INDEX IF NOT EXISTS idx_drivers_series ON drivers(series_id);
+        CREATE INDEX IF NOT EXISTS idx_sashes_series ON sashes(series_id);
+        CREATE INDEX IF NOT EXISTS idx_params_series_category ON series_category_params(series_id, category_id);
+
+        -- 7. PROJECTS (saved quotes)
+        CREATE TABLE IF NOT EXISTS projects (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+
+        -- 8. OPENINGS (windows of a project - stored inputs + last result)
+        -- stale > 0 means the catalog changed since `result` was computed;
+        -- it is a counter so a recalculation racing an admin edit never
+        -- clears a newer invalidation
+        CREATE TABLE IF NOT EXISTS openings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            project_id INTEGER NOT NULL,
+            label TEXT,
+            quantity INTEGER NOT NULL DEFAULT 1,
+            series_id INTEGER NOT NULL,
+            category_id INTEGER NOT NULL,
+            driver_id INTEGER NOT NULL,
+            sash_id INTEGER NOT NULL,
+            params_id INTEGER,
+            plaisio_width REAL NOT NULL,
+            plaisio_height REAL NOT NULL,
+            ug_value REAL NOT NULL,
+            psi_value REAL NOT NULL,
+            is_narrow BOOLEAN NOT NULL DEFAULT FALSE,
+            has_rolo BOOLEAN NOT NULL DEFAULT FALSE,
+            rolo_height REAL,
+            ur_value REAL,
+            result TEXT,
+            error TEXT,
+            stale INTEGER NOT NULL DEFAULT 1,
+            computed_at TEXT,
+            catalog_version INTEGER,
+            FOREIGN KEY (project_id) REFERENCES projects(id),
+            FOREIGN KEY (series_id) REFERENCES series(id),
+            FOREIGN KEY (category_id) REFERENCES categories(id),
+            FOREIGN KEY (driver_id) REFERENCES drivers(id),
+            FOREIGN KEY (sash_id) REFERENCES sashes(id),
+            FOREIGN KEY (params_id) REFERENCES series_category_params(id)
+        );
+
+        -- Dependency index: catalog row id -> openings that used it
+        CREATE INDEX IF NOT EXISTS idx_openings_project ON openings(project_id);
+        CREATE INDEX IF NOT EXISTS idx_openings_series ON openings(series_id);
+        CREATE INDEX IF NOT EXISTS idx_openings_category ON openings(category_id);
+        CREATE INDEX IF NOT EXISTS idx_openings_sash ON openings(sash_id);
+        CREATE INDEX IF NOT EXISTS idx_openings_params ON openings(params_id);
+        CREATE INDEX IF NOT EXISTS idx_openings_stale ON openings(id) WHERE stale > 0;
+
+        -- 9. CATALOG_CHANGES (filled by triggers, see create_change_log_triggers)
+        CREATE TABLE IF NOT EXISTS catalog_changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            version INTEGER NOT NULL,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            before TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_catalog_changes_version ON catalog_changes(version);
+
+        -- 10. FORMULAS (admin overrides of a calculation method, see FORMULA EXPRESSIONS)
+        CREATE TABLE IF NOT EXISTS formulas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            method TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            expression TEXT NOT NULL,
+            UNIQUE (method, name)
+        );
+
+        -- 11. UW_LIMITS (maximum Uw by climate zone and building use, see COMPLIANCE SCREENING)
+        CREATE TABLE IF NOT EXISTS uw_limits (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            climate_zone TEXT NOT NULL,
+            building_use TEXT NOT NULL,
+            max_uw REAL NOT NULL,
+            UNIQUE (climate_zone, building_use)
+        );
     ''')
+
+    # The catalog version a stored result was calculated against (see
+    # prune_catalog_changes), also into catalogs created before the column
+    cursor.execute("PRAGMA table_info(openings)")
+    if 'catalog_version' not in [column[1] for column in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE openings ADD COLUMN catalog_version INTEGER")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_openings_catalog_version ON openings(catalog_version)")
     
     # Check if data exists
     cursor.execute("SELECT COUNT(*) FROM categories")
-    if cursor.fetchone()[0] == 0:
+    if seed and cursor.fetchone()[0] == 0:
         # Insert types first
         cursor.executescript('''
             INSERT INTO types (name, name_gr) VALUES 
@@ -342,10 +583,31 @@ def init_db():
                 (5, 4, 12, 4, 121.5, 214, 99);
         ''')
     
+    # KENAK 2017 limits for openings (the same for new and renovated
+    # buildings), also into catalogs created before the table existed
+    if seed and new_uw_limits:
+        cursor.executescript('''
+            INSERT INTO uw_limits (climate_zone, building_use, max_uw) VALUES 
+                ('A', 'residential', 3.0),
+                ('B', 'residential', 2.8),
+                ('C', 'residential', 2.6),
+                ('D', 'residential', 2.4),
+                ('A', 'non_residential', 3.0),
+                ('B', 'non_residential', 2.8),
+                ('C', 'non_residential', 2.6),
+                ('D', 'non_residential', 2.4);
+        ''')
+    
+    # After seeding, so the seed itself is not logged
+    create_change_log_triggers(cursor)
     conn.commit()
     conn.close()
 
 
+# Long-running tasks started with the app (cancelled on shutdown)
+background_jobs = []
+
+
 # Initialize database on startup
 @app.on_event("startup")
 async def startup():
@@ -353,218 +615,1267 @@ async def startup():
         init_db()
     else:
         init_db()
+    initialized_catalogs.add(DEFAULT_CATALOG)
+    background_jobs.append(asyncio.ensure_future(catalog_events.watch()))
+    if WARM_UP:
+        background_jobs.append(asyncio.ensure_future(warm_up_flight.do(DEFAULT_CATALOG, warm_up, DEFAULT_CATALOG)))
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    for job in background_jobs:
+        job.cancel()
+    background_jobs.clear()
+
+
+# ===================================
+# SQL TRACING (opt-in, SQL_TRACE=1)
+# ===================================
+# With SQL_TRACE set, open_db() returns a TracedConnection. Its trace
+# callback counts every statement SQLite runs for the request (executescript
+# and trigger bodies included) and its cursors time execute(): per statement
+# text the executions, total and max time, and the EXPLAIN QUERY PLAN taken
+# the first time the text is seen. Logged to stderr: statements slower than
+# SQL_SLOW_MS, plans that scan a table without an index (once per
+# statement) and requests running one statement more than SQL_REPEAT_WARNING
+# times (N+1). Responses carry Server-Timing: sql and /api/metrics lists
+# the statements by total time. Without SQL_TRACE nothing is wrapped.
+# Times cover execute() up to the first row, not the fetches.
+
+SQL_TRACE = os.environ.get("SQL_TRACE", "") not in ("", "0")
+SQL_SLOW_MS = float(os.environ.get("SQL_SLOW_MS", "20"))
+SQL_REPEAT_WARNING = int(os.environ.get("SQL_REPEAT_WARNING", "20"))
+SQL_EXPLAINED = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+# Statement accounting of the current request (None outside a traced request)
+current_sql_trace = ContextVar('current_sql_trace', default=None)
+
+
+class SqlStatementStats:
+    __slots__ = ('count', 'total', 'max', 'plan', 'scans')
+
+    def __init__(self, sql, plan):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.plan = plan
+        # Tables the plan reads in full (SCAN without an index) to filter or
+        # join them; reading a whole table on purpose is not reported
+        filtered = re.search(r'\b(WHERE|JOIN)\b', sql, re.IGNORECASE)
+        self.scans = [
+            detail.split()[1] for detail in plan or ()
+            if filtered and detail.startswith('SCAN ') and 'INDEX' not in detail
+        ]
+
+
+class RequestSqlTrace:
+    __slots__ = ('path', 'statements', 'time', 'counts')
+
+    def __init__(self, path):
+        self.path = path
+        self.statements = 0  # from the trace callback
+        self.time = 0.0
+        self.counts = {}  # statement key -> executions
+
+
+# statement key -> SqlStatementStats, over every catalog and request. Past
+# MAX_SQL_STATEMENTS keys new statements are only reported, not kept.
+MAX_SQL_STATEMENTS = int(os.environ.get("MAX_SQL_STATEMENTS", "1000"))
+sql_statements = {}
+sql_statements_lock = threading.Lock()
+
+SQL_PLACEHOLDER_LIST = re.compile(r'\?(?:\s*,\s*\?)+')
+
+
+def sql_statement_key(sql):
+    """`sql` on one line with placeholder lists of any length written as
+    `?, ...`, so IN (?, ?, ...) of every length is one statement"""
+    return SQL_PLACEHOLDER_LIST.sub('?, ...', ' '.join(sql.split()))
+
+
+def explain_query_plan(conn, sql, parameters):
+    """Plan details of a statement, or None when it cannot be explained"""
+    if not sql.lstrip().upper().startswith(SQL_EXPLAINED):
+        return None
+    conn.explaining = True
+    try:
+        # A plain cursor: the plan is not timed or explained itself
+        cursor = sqlite3.Cursor(conn)
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", parameters)
+        return [row[3] for row in cursor.fetchall()]
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.explaining = False
+
+
+def record_sql(conn, sql, parameters, duration):
+    key = sql_statement_key(sql)
+    stats = sql_statements.get(key)
+    if stats is None:
+        stats = SqlStatementStats(sql, explain_query_plan(conn, sql, parameters))
+        with sql_statements_lock:
+            if len(sql_statements) < MAX_SQL_STATEMENTS:
+                stats = sql_statements.setdefault(key, stats)
+        if stats.scans:
+            logger.warning("SQL scans %s without an index: %s", ', '.join(stats.scans), key)
+    with sql_statements_lock:
+        stats.count += 1
+        stats.total += duration
+        stats.max = max(stats.max, duration)
+
+    trace = current_sql_trace.get()
+    if trace is not None:
+        trace.time += duration
+        trace.counts[key] = trace.counts.get(key, 0) + 1
+    if duration * 1000 > SQL_SLOW_MS:
+        logger.warning(
+            "Slow SQL %.1f ms%s: %s -- plan: %s",
+            duration * 1000, f" in {trace.path}" if trace else '', key, '; '.join(stats.plan or ['-']),
+        )
+
+
+class TracedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            record_sql(self.connection, sql, parameters, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        seq_of_parameters = list(seq_of_parameters)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            record_sql(self.connection, sql, seq_of_parameters[0] if seq_of_parameters else (), time.perf_counter() - start)
+
+    def executescript(self, sql_script):
+        start = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            record_sql(self.connection, sql_script, (), time.perf_counter() - start)
+
+
+class TracedConnection(sqlite3.Connection):
+    """Connection whose cursors (conn.execute() included) are traced"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.explaining = False
+        self.set_trace_callback(self.count_statement)
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    # sqlite3's own shortcuts open a plain cursor
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+    def count_statement(self, statement):
+        trace = current_sql_trace.get()
+        if trace is not None and not self.explaining:
+            trace.statements += 1
+
+
+class SqlTraceMiddleware:
+    """Account the statements of each request (SQL_TRACE only): Server-Timing
+    header, N+1 warning"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not SQL_TRACE or scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        trace = RequestSqlTrace(f"{scope['method']} {scope['path']}")
+        token = current_sql_trace.set(trace)
+
+        async def send_with_timing(message):
+            if message['type'] == 'http.response.start':
+                timing = f'sql;dur={trace.time * 1000:.2f};desc="{trace.statements} statements"'
+                message = {**message, 'headers': [*message.get('headers', []), (b'server-timing', timing.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_sql_trace.reset(token)
+            for sql, count in trace.counts.items():
+                if count > SQL_REPEAT_WARNING:
+                    logger.warning("SQL run %d times in %s (N+1?): %s", count, trace.path, sql)
+
+
+app.add_middleware(SqlTraceMiddleware)
+
+
+def sql_trace_stats(limit=50):
+    """Traced statements by total time"""
+    with sql_statements_lock:
+        statements = sorted(sql_statements.items(), key=lambda item: -item[1].total)[:limit]
+        return [
+            {
+                "sql": sql,
+                "count": stats.count,
+                "total_ms": round(stats.total * 1000, 3),
+                "mean_ms": round(stats.total * 1000 / stats.count, 3) if stats.count else None,
+                "max_ms": round(stats.max * 1000, 3),
+                "plan": stats.plan,
+                "scans": stats.scans,
+            }
+            for sql, stats in statements
+        ]
+
+
+# ===================================
+# REQUEST COALESCING (single-flight)
+# ===================================
+
+class SingleFlight:
+    """Share one in-flight computation between concurrent identical calls.
+
+    The first caller for a key starts `fn` in the threadpool; every caller
+    that arrives with the same key before it finishes awaits that same task
+    instead of opening its own connection and repeating the work. The task is
+    shielded, so a disconnecting caller never cancels it for the others.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.in_flight = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key, fn, *args):
+        self.calls += 1
+        task = self.in_flight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(run_in_threadpool(fn, *args))
+            self.in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task):
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here so unawaited failures are not logged twice
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": len(self.in_flight),
+            "coalesced_ratio": round(self.coalesced / self.calls, 4) if self.calls else 0.0,
+        }
+
+
+catalog_flight = SingleFlight("catalog")
+calculation_flight = SingleFlight("calculate")
+
+
+def run_query(sql, params=(), one=False):
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        return row_to_dict(cursor.fetchone()) if one else rows_to_list(cursor.fetchall())
+    finally:
+        conn.close()
+
+
+async def catalog_query(sql, params=(), one=False):
+    """Run a read-only catalog query, coalesced with identical concurrent ones"""
+    key = (current_catalog_name.get(), sql, params, one)
+    return await catalog_flight.do(key, run_query, sql, params, one)
+
+
+# ===================================
+# ADMISSION CONTROL (calculation lanes)
+# ===================================
+# Calculation requests are admitted through one of two lanes so bulk work
+# cannot starve the calculator: `interactive` (/api/calculate, single
+# openings from Calculator.jsx) and `bulk` (the endpoints taking many
+# openings, the project reports and recalculation). Each lane runs at most
+# `concurrency` requests; the next ones wait in a queue of at most `queue`
+# for up to `queue_timeout` seconds. A full queue or a timed-out wait is
+# answered at once with 503, and a client (by address) over the `rate`
+# requests/s of its token bucket (`burst` deep) with 429, both carrying
+# Retry-After. Behind a reverse proxy or CDN the client is the address the
+# proxies in TRUSTED_PROXIES (comma separated, `*` for any) put in
+# X-Forwarded-For; uvicorn --proxy-headers --forwarded-allow-ips does the
+# same before the app sees the request. Lanes and buckets are per worker process; the live WebSocket
+# is not limited here (it only calculates the latest inputs).
+# ADMISSION_CONTROL=0 turns it off.
+
+ADMISSION_CONTROL = os.environ.get("ADMISSION_CONTROL", "1") not in ("", "0")
+ADMISSION_BULK_CONCURRENCY = int(os.environ.get("ADMISSION_BULK_CONCURRENCY", max(1, (os.cpu_count() or 2) // 2)))
+# Clients with a token bucket kept per lane, least recently seen dropped first
+ADMISSION_MAX_CLIENTS = 10000
+TRUSTED_PROXIES = {address.strip() for address in os.environ.get("TRUSTED_PROXIES", "").split(',') if address.strip()}
+
+ADMISSION_LANES = {
+    'interactive': dict(concurrency=16, queue=64, queue_timeout=2.0, rate=50.0, burst=100),
+    'bulk': dict(concurrency=ADMISSION_BULK_CONCURRENCY, queue=8, queue_timeout=30.0, rate=2.0, burst=10),
+}
+
+# (method, path) -> lane, paths without the /api/catalogs/<name> prefix
+ADMISSION_ROUTES = [
+    ('POST', re.compile(r'^/api/calculate$'), 'interactive'),
+    ('POST', re.compile(r'^/api/calculate/(batch|sensitivity|aggregate|glass|profiles|compliance)$'), 'bulk'),
+    ('GET', re.compile(r'^/api/projects/\d+/(glass|profiles|compliance)$'), 'bulk'),
+    ('POST', re.compile(r'^/api/projects/\d+/recalculate$'), 'bulk'),
+]
+
+
+class TokenBuckets:
+    """Token bucket of every client of a lane"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = OrderedDict()  # client -> (tokens, time)
+
+    def take(self, client, now):
+        """0 when the client had a token, else the seconds until it has one"""
+        tokens, last = self.buckets.pop(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self.buckets[client] = (tokens, now)
+        if len(self.buckets) > ADMISSION_MAX_CLIENTS:
+            self.buckets.popitem(last=False)
+        return wait
+
+
+class AdmissionLane:
+    """Concurrency slots of a lane and its bounded, first-come queue"""
+
+    def __init__(self, name, concurrency, queue, queue_timeout, rate, burst):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue = queue
+        self.queue_timeout = queue_timeout
+        self.buckets = TokenBuckets(rate, burst)
+        self.active = 0
+        self.waiters = deque()
+        self.service_time = 0.0  # moving average, seconds
+        self.admitted = 0
+        self.queued = 0
+        self.rejected_rate = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    async def acquire(self):
+        """True once the request holds a slot, False when the queue is full
+        or the wait timed out"""
+        if self.active < self.concurrency and not self.waiters:
+            self.active += 1
+            self.admitted += 1
+            return True
+        if len(self.waiters) >= self.queue:
+            self.rejected_full += 1
+            return False
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self.waiters.append(waiter)
+        self.queued += 1
+        start = time.perf_counter()
+        timer = loop.call_later(self.queue_timeout, lambda: waiter.done() or waiter.set_result(False))
+        try:
+            granted = await waiter
+        except asyncio.CancelledError:
+            # The client went away: pass on a slot handed over meanwhile
+            if waiter.done() and not waiter.cancelled() and waiter.result():
+                self.release()
+            raise
+        finally:
+            timer.cancel()
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+
+        waited = time.perf_counter() - start
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        if not granted:
+            self.rejected_timeout += 1
+            return False
+        self.admitted += 1
+        return True
+
+    def release(self, duration=None):
+        if duration is not None:
+            self.service_time = duration if not self.service_time else 0.8 * self.service_time + 0.2 * duration
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                # The slot goes to the first waiter
+                waiter.set_result(True)
+                return
+        self.active -= 1
+
+    def retry_after(self):
+        """Seconds until the queue has drained by one place, estimated"""
+        return (len(self.waiters) + 1) * self.service_time / self.concurrency
+
+    def stats(self):
+        return {
+            "concurrency": self.concurrency,
+            "queue_limit": self.queue,
+            "active": self.active,
+            "queued_now": len(self.waiters),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": {
+                "rate": self.rejected_rate,
+                "queue_full": self.rejected_full,
+                "queue_timeout": self.rejected_timeout,
+            },
+            "wait_ms": {
+                "mean": round(self.wait_total * 1000 / self.queued, 3) if self.queued else 0.0,
+                "max": round(self.wait_max * 1000, 3),
+            },
+            "service_ms": round(self.service_time * 1000, 3),
+            "clients": len(self.buckets.buckets),
+        }
+
+
+admission_lanes = {name: AdmissionLane(name, **settings) for name, settings in ADMISSION_LANES.items()}
+
+
+def admission_lane(scope):
+    """Lane of a request, None when it is not admission controlled"""
+    path = scope['path']
+    match = CATALOG_PATH_RE.match(path)
+    if match:
+        path = '/api' + match.group(2)
+    for method, pattern, lane in ADMISSION_ROUTES:
+        if scope['method'] == method and pattern.match(path):
+            return admission_lanes[lane]
+    return None
+
+
+def admission_client(scope):
+    """Address of the client: the peer, or behind TRUSTED_PROXIES the last
+    X-Forwarded-For address not added by one of them"""
+    client = scope.get('client')
+    address = client[0] if client else ''
+    if not TRUSTED_PROXIES or ('*' not in TRUSTED_PROXIES and address not in TRUSTED_PROXIES):
+        return address
+    forwarded = [
+        value.decode('latin-1') for key, value in scope['headers'] if key == b'x-forwarded-for'
+    ]
+    hops = [hop.strip() for hop in ','.join(forwarded).split(',') if hop.strip()]
+    for hop in reversed(hops):
+        address = hop
+        if '*' in TRUSTED_PROXIES or hop not in TRUSTED_PROXIES:
+            break
+    return address
+
+
+def admission_rejection(status, detail, retry_after):
+    return JSONResponse(
+        {"detail": detail},
+        status_code=status,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class AdmissionMiddleware:
+    """Admit calculation requests through their lane (429/503 when not)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        lane = admission_lane(scope) if ADMISSION_CONTROL and scope['type'] == 'http' else None
+        if lane is None:
+            await self.app(scope, receive, send)
+            return
+        wait = lane.buckets.take(admission_client(scope), time.monotonic())
+        if wait:
+            lane.rejected_rate += 1
+            response = admission_rejection(429, f"Too many {lane.name} requests, retry later", wait)
+            await response(scope, receive, send)
+            return
+        if not await lane.acquire():
+            response = admission_rejection(503, f"The server is busy with {lane.name} requests, retry later", lane.retry_after())
+            await response(scope, receive, send)
+            return
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            lane.release(time.perf_counter() - start)
+
+
+app.add_middleware(AdmissionMiddleware)
+
+
+# ===================================
+# LIST PROJECTION AND PAGINATION
+# ===================================
+# List endpoints take `fields` (comma separated columns, `id` is always
+# returned, `*` is every column) and keyset pagination: the rows after row
+# `after_id` in the order of the list, at most `limit` of them, with a
+# Link: <?...>; rel="next" header while more rows follow. Both go into the
+# SQL, so only the selected columns and rows are read. The calculator step
+# endpoints leave HEAVY_COLUMNS out unless `fields` asks for them.
+
+HEAVY_COLUMNS = ('image_url',)
+MAX_LIST_LIMIT = 1000
+
+# table -> columns in schema order (every catalog has the same schema)
+table_columns_cache = {}
+
+
+def table_columns(table):
+    columns = table_columns_cache.get(table)
+    if columns is None:
+        conn = get_db()
+        try:
+            columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+        finally:
+            conn.close()
+        table_columns_cache[table] = columns
+    return columns
+
+
+def selected_columns(table, fields, light=False):
+    """Columns `fields` selects from `table`, in schema order (400 for
+    unknown ones); without `fields` every column, the heavy ones only
+    when not `light`"""
+    columns = table_columns(table)
+    if fields is None:
+        return [column for column in columns if not (light and column in HEAVY_COLUMNS)]
+    if fields.strip() == '*':
+        return columns
+    requested = {field.strip() for field in fields.split(',') if field.strip()}
+    unknown = sorted(requested - set(columns))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown field(s) for {table}: {', '.join(unknown)}")
+    return [column for column in columns if column == 'id' or column in requested]
+
+
+class ListQuery:
+    """`fields`, `after_id` and `limit` of a list endpoint (dependency)"""
+
+    def __init__(
+        self,
+        request: Request,
+        fields: Optional[str] = None,
+        after_id: Optional[int] = None,
+        limit: Optional[int] = Query(None, ge=1, le=MAX_LIST_LIMIT),
+    ):
+        self.request = request
+        self.fields = fields
+        self.after_id = after_id
+        self.limit = limit
+
+
+async def catalog_list(query, table, where='', params=(), alias=None, joins='', order=(), light=False):
+    """Rows of `table` (as `alias`, after `joins`) matching `where`, projected
+    and paginated by `query`, ordered by the `order` columns and then id"""
+    prefix = f"{alias}." if alias else ''
+    columns = selected_columns(table, query.fields, light)
+    order = [*order, 'id']
+    conditions = [where] if where else []
+    params = list(params)
+    if query.after_id is not None:
+        if len(order) == 1:
+            conditions.append(f"{prefix}id > ?")
+        else:
+            # the sort key of the row after_id names
+            keys = ', '.join(f"{prefix}{column}" for column in order)
+            conditions.append(f"({keys}) > (SELECT {', '.join(order)} FROM {table} WHERE id = ?)")
+        params.append(query.after_id)
+    sql = (
+        f"SELECT {'DISTINCT ' if joins else ''}{', '.join(prefix + column for column in columns)} "
+        f"FROM {table} {alias or ''} {joins} "
+        f"{'WHERE ' + ' AND '.join(conditions) if conditions else ''} "
+        f"ORDER BY {', '.join(prefix + column for column in order)}"
+    )
+    if query.limit is not None:
+        sql += " LIMIT ?"
+        params.append(query.limit + 1)
+    rows = await catalog_query(sql, tuple(params))
+    if not rows and query.after_id is not None and len(order) > 1:
+        # The sort key of a deleted row is NULL, which would end the list
+        if await catalog_query(f"SELECT id FROM {table} WHERE id = ?", (query.after_id,), one=True) is None:
+            raise HTTPException(status_code=400, detail=f"after_id {query.after_id} no longer exists; start from the first page")
+    return list_page(query, rows, query.limit)
+
+
+def list_page(query, rows, limit):
+    """Response of a list fetched with `limit` + 1 rows: at most `limit` of
+    them and the Link to the next page while more follow"""
+    headers = {}
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        # relative, so a /api/catalogs/<name>/ prefix is kept
+        next_query = urlencode({**query.request.query_params, 'after_id': rows[-1]['id']})
+        headers['Link'] = f'<?{next_query}>; rel="next"'
+    return JSONResponse(rows, headers=headers)
 
 
 # ===================================
 # PUBLIC API ENDPOINTS
 # ===================================
+# Lists take fields=, after_id= and limit= (see LIST PROJECTION AND
+# PAGINATION); the calculator steps leave out image_url by default.
 
 @app.get("/api/types")
-async def get_all_types():
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM types")
-    result = rows_to_list(cursor.fetchall())
-    conn.close()
-    return result
+async def get_all_types(query: ListQuery = Depends()):
+    return await catalog_list(query, 'types', light=True)
 
 
 @app.get("/api/types/{type_id}/series")
-async def get_series_by_type(type_id: int):
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM series WHERE type_id = ?", (type_id,))
-    result = rows_to_list(cursor.fetchall())
-    conn.close()
-    return result
+async def get_series_by_type(type_id: int, query: ListQuery = Depends()):
+    return await catalog_list(query, 'series', "type_id = ?", (type_id,), light=True)
 
 
 @app.get("/api/types/{type_id}/categories")
-async def get_categories_by_type(type_id: int):
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM categories WHERE type_id = ?", (type_id,))
-    result = rows_to_list(cursor.fetchall())
-    conn.close()
-    return result
+async def get_categories_by_type(type_id: int, query: ListQuery = Depends()):
+    return await catalog_list(query, 'categories', "type_id = ?", (type_id,), light=True)
 
 
 @app.get("/api/series")
-async def get_all_series():
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM series")
-    result = rows_to_list(cursor.fetchall())
-    conn.close()
-    return result
+async def get_all_series(query: ListQuery = Depends()):
+    return await catalog_list(query, 'series')
 
 
 @app.get("/api/series/{series_id}")
-async def get_series(series_id: int):
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM series WHERE id = ?", (series_id,))
-    result = row_to_dict(cursor.fetchone())
-    conn.close()
-    return result
+async def get_series(series_id: int, fields: Optional[str] = None):
+    columns = ', '.join(selected_columns('series', fields))
+    return await catalog_query(f"SELECT {columns} FROM series WHERE id = ?", (series_id,), one=True)
 
 
 @app.get("/api/categories")
-async def get_all_categories():
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM categories")
-    result = rows_to_list(cursor.fetchall())
-    conn.close()
-    return result
+async def get_all_categories(query: ListQuery = Depends()):
+    return await catalog_list(query, 'categories')
 
 
 @app.get("/api/series/{series_id}/categories")
-async def get_categories_for_series(series_id: int):
+async def get_categories_for_series(series_id: int, query: ListQuery = Depends()):
     """Get categories available for a series (based on what drivers support)"""
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT DISTINCT c.* FROM categories c
-        JOIN driver_categories dc ON c.id = dc.category_id
-        JOIN drivers d ON dc.driver_id = d.id
-        WHERE d.series_id = ?
-        ORDER BY c.num_glasses
-    ''', (series_id,))
-    result = rows_to_list(cursor.fetchall())
-    conn.close()
-    return result
+    return await catalog_list(
+        query, 'categories', "d.series_id = ?", (series_id,), alias='c',
+        joins='''
+            JOIN driver_categories dc ON c.id = dc.category_id
+            JOIN drivers d ON dc.driver_id = d.id
+        ''',
+        order=['num_glasses'], light=True,
+    )
 
 
 @app.get("/api/series/{series_id}/category/{category_id}/drivers")
-async def get_drivers_for_category(series_id: int, category_id: int):
+async def get_drivers_for_category(series_id: int, category_id: int, query: ListQuery = Depends()):
     """Get drivers that support a specific category in a series"""
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT d.* FROM drivers d
-        JOIN driver_categories dc ON d.id = dc.driver_id
-        WHERE d.series_id = ? AND dc.category_id = ?
-    ''', (series_id, category_id))
-    result = rows_to_list(cursor.fetchall())
-    conn.close()
-    return result
+    return await catalog_list(
+        query, 'drivers', "d.series_id = ? AND dc.category_id = ?", (series_id, category_id), alias='d',
+        joins="JOIN driver_categories dc ON d.id = dc.driver_id", light=True,
+    )
 
 
 @app.get("/api/series/{series_id}/sashes")
-async def get_sashes_for_series(series_id: int):
+async def get_sashes_for_series(series_id: int, query: ListQuery = Depends()):
     """Get all sashes for a series"""
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM sashes WHERE series_id = ?", (series_id,))
-    result = rows_to_list(cursor.fetchall())
-    conn.close()
-    return result
+    return await catalog_list(query, 'sashes', "series_id = ?", (series_id,), light=True)
 
 
 @app.get("/api/series/{series_id}/category/{category_id}/params")
 async def get_category_params(series_id: int, category_id: int, sash_id: Optional[int] = None):
     """Get GW/GH params for a series+category (and optionally sash for IQ580)"""
-    conn = get_db()
-    cursor = conn.cursor()
-    
     if sash_id:
-        cursor.execute('''
+        return await catalog_query('''
             SELECT * FROM series_category_params 
             WHERE series_id = ? AND category_id = ? AND sash_id = ?
-        ''', (series_id, category_id, sash_id))
-    else:
-        cursor.execute('''
-            SELECT * FROM series_category_params 
-            WHERE series_id = ? AND category_id = ? AND sash_id IS NULL
-        ''', (series_id, category_id))
-    
-    result = row_to_dict(cursor.fetchone())
-    conn.close()
-    return result
+        ''', (series_id, category_id, sash_id), one=True)
+    return await catalog_query('''
+        SELECT * FROM series_category_params 
+        WHERE series_id = ? AND category_id = ? AND sash_id IS NULL
+    ''', (series_id, category_id), one=True)
 
 
 # ===================================
-# CALCULATION ENDPOINT
+# IN-MEMORY CATALOG
 # ===================================
+# Calculations read slotted records from an immutable snapshot instead of
+# querying SQLite and building a dict per row on every request. The snapshot
+# follows the catalog version in `metadata`: a new version is derived from
+# the previous snapshot and the change log, sharing every unchanged record,
+# and older versions are rebuilt the same way from the logged before-images.
 
-class CalculationRequest(BaseModel):
-    series_id: int
-    category_id: int
-    driver_id: int
-    sash_id: int
-    plaisio_width: float  # FW
-    plaisio_height: float  # FH
-    ug_value: float
-    psi_value: float
-    is_narrow: bool = False  # στενή επαλληλία checkbox
-    has_rolo: bool = False
-    rolo_height: Optional[float] = None
-    ur_value: Optional[float] = None
+@dataclass(frozen=True, slots=True)
+class Series:
+    table: ClassVar[str] = 'series'
+    id: int
+    type_id: int
+    name: str
+    code: str
+    a: float
+    b: Optional[float]
+    x: float
+    uf1: Optional[float]
+    uf2: Optional[float]
+    e: Optional[float]
+    f: Optional[float]
+    e_narrow: Optional[float]
+    f_narrow: Optional[float]
+    image_url: Optional[str]
 
 
-@app.post("/api/calculate")
-async def calculate(req: CalculationRequest):
-    conn = get_db()
+@dataclass(frozen=True, slots=True)
+class Category:
+    table: ClassVar[str] = 'categories'
+    id: int
+    type_id: int
+    name: str
+    num_glasses: int
+    has_special_calculation: Optional[bool]
+    image_url: Optional[str]
+
+
+@dataclass(frozen=True, slots=True)
+class Sash:
+    table: ClassVar[str] = 'sashes'
+    id: int
+    series_id: int
+    name: str
+    b_override: Optional[float]
+
+
+@dataclass(frozen=True, slots=True)
+class Driver:
+    table: ClassVar[str] = 'drivers'
+    id: int
+    series_id: int
+    name: str
+
+
+@dataclass(frozen=True, slots=True)
+class DriverCategory:
+    table: ClassVar[str] = 'driver_categories'
+    id: int
+    driver_id: int
+    category_id: int
+
+
+@dataclass(frozen=True, slots=True)
+class SeriesCategoryParams:
+    table: ClassVar[str] = 'series_category_params'
+    id: int
+    series_id: int
+    category_id: int
+    sash_id: Optional[int]
+    gw_divisor: float
+    gw_offset: float
+    gh_offset: float
+    narrow_gw_offset: Optional[float]
+
+
+@dataclass(frozen=True, slots=True)
+class Formula:
+    table: ClassVar[str] = 'formulas'
+    id: int
+    method: str
+    position: int
+    name: str
+    expression: str
+
+
+@dataclass(frozen=True, slots=True)
+class UwLimit:
+    table: ClassVar[str] = 'uw_limits'
+    id: int
+    climate_zone: str
+    building_use: str
+    max_uw: float
+
+
+def load_records(cursor, record_type):
+    columns = [field.name for field in fields(record_type)]
+    cursor.execute(f"SELECT {', '.join(columns)} FROM {record_type.table} ORDER BY id")
+    return [record_type(*row) for row in cursor.fetchall()]
+
+
+CATALOG_RECORD_TYPES = {
+    record_type.table: record_type
+    for record_type in (Series, Category, Sash, Driver, DriverCategory, SeriesCategoryParams, Formula, UwLimit)
+}
+
+
+class Catalog:
+    """Immutable snapshot of the records calculations need, indexed by id.
+
+    `params` is keyed by (series_id, category_id, sash_id); when several rows
+    share a key the lowest id wins, like the fetchone() it replaces.
+    `methods` holds the CalculationMethod of each category (by its type),
+    compiled from the `formulas` rows where the admin replaced them.
+    `uw_limits` is keyed by (climate_zone, building_use) -> max_uw.
+    `driver_categories` (which drivers fit which categories) is versioned
+    with the rest, so the configurations of an older version are its own.
+    """
+    __slots__ = (
+        'version', 'series', 'categories', 'sashes', 'drivers', 'driver_categories', 'params_by_id', 'formulas',
+        'limits', 'params', 'methods', 'uw_limits',
+    )
+
+    def __init__(
+        self, version, series, categories, sashes, drivers, driver_categories, params_by_id, formulas, limits,
+        params=None,
+    ):
+        """Tables are {id: record} dicts, in CATALOG_RECORD_TYPES order"""
+        self.version = version
+        self.series = series
+        self.categories = categories
+        self.sashes = sashes
+        self.drivers = drivers
+        self.driver_categories = driver_categories
+        self.params_by_id = params_by_id
+        self.formulas = formulas
+        self.limits = limits
+        self.uw_limits = {(limit.climate_zone, limit.building_use): limit.max_uw for limit in limits.values()}
+        if params is None:
+            params = {}
+            for record_id in sorted(params_by_id):
+                record = params_by_id[record_id]
+                params.setdefault((record.series_id, record.category_id, record.sash_id), record)
+        self.params = params
+        overrides = catalog_formula_methods(formulas)
+        self.methods = {}
+        for category in categories.values():
+            method = TYPE_METHODS.get(category.type_id)
+            if method is not None and method.name in overrides:
+                method = overrides[method.name]
+            # Without a method (formulas that do not compile, or a special
+            # category of a method without special) the category cannot be
+            # calculated: 404 from resolve_calculation()
+            if method is not None and (method.special or not category.has_special_calculation):
+                self.methods[category.id] = method
+
+    def tables(self):
+        return dict(zip(
+            CATALOG_RECORD_TYPES,
+            (
+                self.series, self.categories, self.sashes, self.drivers, self.driver_categories, self.params_by_id,
+                self.formulas, self.limits,
+            ),
+        ))
+
+    @classmethod
+    def read(cls, cursor):
+        """Full snapshot; call inside a transaction"""
+        return cls(
+            get_catalog_version(cursor),
+            *[{record.id: record for record in load_records(cursor, record_type)}
+              for record_type in CATALOG_RECORD_TYPES.values()],
+        )
+
+    @classmethod
+    def load(cls):
+        conn = get_db()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN")
+            catalog = cls.read(cursor)
+            conn.commit()
+        finally:
+            conn.close()
+        return catalog
+
+    def evolve(self, version, changes):
+        """Snapshot at `version`: this one with `changes` ({table: {id: record,
+        or None when the row does not exist}}) applied. Only the tables in
+        `changes` are copied; records and the other tables are shared."""
+        tables = self.tables()
+        for table, rows in changes.items():
+            records = dict(tables[table])
+            for record_id, record in rows.items():
+                if record is None:
+                    records.pop(record_id, None)
+                else:
+                    records[record_id] = record
+            tables[table] = records
+        params = None if 'series_category_params' in changes else self.params
+        return Catalog(version, *tables.values(), params=params)
+
+
+def change_log_start(cursor):
+    cursor.execute("SELECT CAST(value AS INTEGER) FROM metadata WHERE key = 'change_log_start'")
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def load_changed_records(cursor, since):
+    """{table: {id: current record or None}} for the rows changed after `since`"""
+    cursor.execute("SELECT DISTINCT table_name, row_id FROM catalog_changes WHERE version > ?", (since,))
+    changed = {}
+    for table, row_id in cursor.fetchall():
+        if table in CATALOG_RECORD_TYPES:
+            changed.setdefault(table, []).append(row_id)
+
+    changes = {}
+    for table, row_ids in changed.items():
+        record_type = CATALOG_RECORD_TYPES[table]
+        columns = ', '.join(field.name for field in fields(record_type))
+        rows = dict.fromkeys(row_ids)
+        for i in range(0, len(row_ids), 500):
+            chunk = row_ids[i:i + 500]
+            cursor.execute(f"SELECT {columns} FROM {table} WHERE id IN ({', '.join('?' * len(chunk))})", chunk)
+            for row in cursor.fetchall():
+                rows[row[0]] = record_type(*row)
+        changes[table] = rows
+    return changes
+
+
+def load_before_images(cursor, version):
+    """{table: {id: record or None}} undoing every change after `version`"""
+    cursor.execute('''
+        SELECT table_name, row_id, op, before FROM catalog_changes
+        WHERE version > ? ORDER BY id DESC
+    ''', (version,))
+    changes = {}
+    for table, row_id, op, before in cursor.fetchall():
+        record_type = CATALOG_RECORD_TYPES.get(table)
+        if record_type is None:
+            continue
+        # Newest first, so the first change after `version` is applied last
+        if op == 'insert':
+            record = None
+        elif before is None:
+            # logged before old rows were kept
+            raise HTTPException(status_code=404, detail=f"Catalog version {version} not found")
+        else:
+            values = json.loads(before)
+            record = record_type(*[values[field.name] for field in fields(record_type)])
+        changes.setdefault(table, {})[row_id] = record
+    return changes
+
+
+def refresh_catalog(previous):
+    """Snapshot of the current version: `previous` evolved with the logged
+    changes when the change log covers the gap, a full load otherwise"""
+    conn = get_db()
     cursor = conn.cursor()
-    
-    # Get series data
-    cursor.execute("SELECT * FROM series WHERE id = ?", (req.series_id,))
-    series = row_to_dict(cursor.fetchone())
+    try:
+        cursor.execute("BEGIN")
+        version = get_catalog_version(cursor)
+        start = change_log_start(cursor)
+        if previous is not None and start is not None and start <= previous.version < version:
+            catalog = previous.evolve(version, load_changed_records(cursor, previous.version))
+        else:
+            catalog = Catalog.read(cursor)
+        conn.commit()
+    finally:
+        conn.close()
+    return catalog
+
+
+# Catalog snapshots kept in memory, least recently used first
+MAX_RESIDENT_CATALOGS = int(os.environ.get("MAX_RESIDENT_CATALOGS", "8"))
+resident_catalogs = OrderedDict()
+# Older versions requested with catalog_version, keyed (catalog name, version)
+MAX_CATALOG_VERSIONS = int(os.environ.get("MAX_CATALOG_VERSIONS", "16"))
+catalog_versions = OrderedDict()
+catalog_lock = threading.Lock()
+# A resident snapshot is served without reading the catalog version for
+# CATALOG_VERSION_TTL seconds. Edits made through this worker, and versions
+# the change event poll sees, expire it at once; edits made through another
+# worker show up within the TTL.
+CATALOG_VERSION_TTL = float(os.environ.get("CATALOG_VERSION_TTL", "1"))
+catalog_checked = {}  # catalog name -> time.monotonic() the version read started
+catalog_expired = {}  # catalog name -> time.monotonic() of the last expire_catalog()
+# One lock per catalog, held while its snapshot is refreshed, so a slow
+# reload of one catalog does not hold up the others
+catalog_refresh_locks = {}
+
+
+def expire_catalog(name):
+    """Read the version of catalog `name` again on its next use"""
+    with catalog_lock:
+        catalog_expired[name] = time.monotonic()
+
+
+def resident_catalog(name):
+    """The resident snapshot of `name` while its version check is recent, else None"""
+    catalog = resident_catalogs.get(name)
+    checked = catalog_checked.get(name)
+    if catalog is None or checked is None or time.monotonic() - checked >= CATALOG_VERSION_TTL:
+        return None
+    # An expiry during the check may have missed the edit it was for
+    if checked <= catalog_expired.get(name, -math.inf):
+        return None
+    return catalog
+
+
+def historical_catalog(name, current, version):
+    """Snapshot of an older version: `current` with the before-images of
+    every later change applied"""
+    key = (name, version)
+    with catalog_lock:
+        catalog = catalog_versions.get(key)
+        if catalog is not None:
+            catalog_versions.move_to_end(key)
+            return catalog
+
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN")
+        start = change_log_start(cursor)
+        if start is None or not start <= version < current.version:
+            raise HTTPException(status_code=404, detail=f"Catalog version {version} not found")
+        catalog = current.evolve(version, load_before_images(cursor, version))
+        conn.commit()
+    finally:
+        conn.close()
+
+    with catalog_lock:
+        catalog_versions[key] = catalog
+        while len(catalog_versions) > MAX_CATALOG_VERSIONS:
+            catalog_versions.popitem(last=False)
+    return catalog
+
+
+def refresh_resident_catalog(name):
+    """Check the version of catalog `name` and make the current snapshot
+    resident; one thread per catalog at a time"""
+    with catalog_lock:
+        refresh_lock = catalog_refresh_locks.setdefault(name, threading.Lock())
+    with refresh_lock:
+        with catalog_lock:
+            catalog = resident_catalog(name)
+            previous = resident_catalogs.get(name)
+        if catalog is not None:
+            # refreshed by the thread we waited for
+            return catalog
+        checked = time.monotonic()
+        try:
+            catalog = previous
+            if catalog is None or catalog.version != read_catalog_version():
+                catalog = refresh_catalog(catalog)
+        except HTTPException:
+            # e.g. an unknown catalog: keep no lock for it
+            with catalog_lock:
+                if name not in resident_catalogs:
+                    catalog_refresh_locks.pop(name, None)
+            raise
+        with catalog_lock:
+            resident_catalogs[name] = catalog
+            catalog_checked[name] = checked
+            resident_catalogs.move_to_end(name)
+            while len(resident_catalogs) > MAX_RESIDENT_CATALOGS:
+                evicted, _ = resident_catalogs.popitem(last=False)
+                for state in (catalog_checked, catalog_expired, catalog_refresh_locks):
+                    state.pop(evicted, None)
+                drop_encoded_catalog(evicted)
+                compiled_catalogs.pop(evicted, None)
+                for key in [key for key in catalog_versions if key[0] == evicted]:
+                    del catalog_versions[key]
+    return catalog
+
+
+def get_catalog(version=None):
+    """Snapshot of the current request's catalog, (re)loaded on first use or
+    when its version moved on (checked every CATALOG_VERSION_TTL seconds).
+    At most MAX_RESIDENT_CATALOGS stay resident.
+
+    An older `version` is rebuilt from the change log (404 when it is newer
+    than the current one or older than the kept history).
+    """
+    name = current_catalog_name.get()
+    with catalog_lock:
+        catalog = resident_catalog(name)
+        if catalog is not None:
+            resident_catalogs.move_to_end(name)
+    if catalog is None:
+        catalog = refresh_resident_catalog(name)
+    if version is None or version == catalog.version:
+        return catalog
+    return historical_catalog(name, catalog, version)
+
+
+# ===================================
+# CALCULATION ENDPOINT
+# ===================================
+
+class CalculationRequest(BaseModel):
+    series_id: int
+    category_id: int
+    driver_id: int
+    sash_id: int
+    plaisio_width: float  # FW
+    plaisio_height: float  # FH
+    ug_value: float
+    psi_value: float
+    is_narrow: bool = False  # στενή επαλληλία checkbox
+    has_rolo: bool = False
+    rolo_height: Optional[float] = None
+    ur_value: Optional[float] = None
+
+
+# Input limits, as enforced by Calculator.jsx (LIMITS) and api/index.py
+CALCULATION_LIMITS = {
+    'plaisio_height': (300, 5000),
+    'plaisio_width': (300, 10000),
+    'ug_value': (0.3, 7.0),
+    'rolo_height': (100, 1000),
+    'ur_value': (0.6, 10.0),
+}
+PSI_VALUES = (0.05, 0.08, 0.11)
+
+# 400 errors in the order the checks run - the first failing check wins
+VALIDATION_ERRORS = {
+    'HEIGHT_RANGE': "Plaisio height must be between 300-5000 mm",
+    'WIDTH_RANGE': "Plaisio width must be between 300-10000 mm",
+    'UG_RANGE': "Ug value must be between 0.3-7.0 W/m²K",
+    'PSI_VALUE': "Psi value must be 0.05, 0.08, or 0.11",
+    'ROLO_HEIGHT_RANGE': "Rolo height must be between 100-1000 mm",
+    'UR_RANGE': "Ur value must be between 0.6-10.0 W/m²K",
+}
+
+# 404 errors of resolve_calculation(), by detail message
+NOT_FOUND_ERRORS = {
+    "Series not found": 'SERIES_NOT_FOUND',
+    "Category not found": 'CATEGORY_NOT_FOUND',
+    "Sash not found": 'SASH_NOT_FOUND',
+    "Driver not found": 'DRIVER_NOT_FOUND',
+    "Category params not found for this series": 'PARAMS_NOT_FOUND',
+    "Calculation method not found for this category": 'METHOD_NOT_FOUND',
+}
+
+
+def in_limits(value, field):
+    low, high = CALCULATION_LIMITS[field]
+    return low <= value <= high
+
+
+def validation_error(req):
+    """Code of the first input check a calculation request fails, or None"""
+    if not in_limits(req.plaisio_height, 'plaisio_height'):
+        return 'HEIGHT_RANGE'
+    if not in_limits(req.plaisio_width, 'plaisio_width'):
+        return 'WIDTH_RANGE'
+    if not in_limits(req.ug_value, 'ug_value'):
+        return 'UG_RANGE'
+    if req.psi_value not in PSI_VALUES:
+        return 'PSI_VALUE'
+    if req.has_rolo:
+        if not req.rolo_height or not in_limits(req.rolo_height, 'rolo_height'):
+            return 'ROLO_HEIGHT_RANGE'
+        if not req.ur_value or not in_limits(req.ur_value, 'ur_value'):
+            return 'UR_RANGE'
+    return None
+
+
+def validate_calculation(req):
+    code = validation_error(req)
+    if code:
+        raise HTTPException(status_code=400, detail=VALIDATION_ERRORS[code])
+
+
+# Every input of a calculation (single-flight key, stored opening columns)
+CALCULATION_FIELDS = [
+    'series_id', 'category_id', 'driver_id', 'sash_id',
+    'plaisio_width', 'plaisio_height', 'ug_value', 'psi_value',
+    'is_narrow', 'has_rolo', 'rolo_height', 'ur_value',
+]
+
+
+def resolve_calculation(catalog, req):
+    """Look up the series/category/sash/driver/params records a calculation
+    needs and the calculation method of the category"""
+    series = catalog.series.get(req.series_id)
     if not series:
         raise HTTPException(status_code=404, detail="Series not found")
     
-    # Get category data
-    cursor.execute("SELECT * FROM categories WHERE id = ?", (req.category_id,))
-    category = row_to_dict(cursor.fetchone())
+    category = catalog.categories.get(req.category_id)
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
     
-    # Get sash data
-    cursor.execute("SELECT * FROM sashes WHERE id = ?", (req.sash_id,))
-    sash = row_to_dict(cursor.fetchone())
+    sash = catalog.sashes.get(req.sash_id)
     if not sash:
         raise HTTPException(status_code=404, detail="Sash not found")
     
-    # Get driver data
-    cursor.execute("SELECT * FROM drivers WHERE id = ?", (req.driver_id,))
-    driver = row_to_dict(cursor.fetchone())
+    driver = catalog.drivers.get(req.driver_id)
     if not driver:
         raise HTTPException(status_code=404, detail="Driver not found")
     
-    # Get GW/GH params
-    # For IQ580 (series_id=5), we need sash-specific params
-    if req.series_id == 5:
-        cursor.execute('''
-            SELECT * FROM series_category_params 
-            WHERE series_id = ? AND category_id = ? AND sash_id = ?
-        ''', (req.series_id, req.category_id, req.sash_id))
-    else:
-        cursor.execute('''
-            SELECT * FROM series_category_params 
-            WHERE series_id = ? AND category_id = ? AND sash_id IS NULL
-        ''', (req.series_id, req.category_id))
+    method = catalog.methods.get(category.id)
+    if not method:
+        raise HTTPException(status_code=404, detail="Calculation method not found for this category")
     
-    params = row_to_dict(cursor.fetchone())
-    if not params:
+    # Get GW/GH params: sash-specific ones (e.g. IQ580) before the series-wide row
+    params = (
+        catalog.params.get((req.series_id, req.category_id, req.sash_id))
+        or catalog.params.get((req.series_id, req.category_id, None))
+    )
+    if not params and method.uses_params:
         raise HTTPException(status_code=404, detail="Category params not found for this series")
     
-    conn.close()
-    
+    return series, category, sash, driver, params, method
+
+
+def finite_result(result):
+    """Whether every number of a compute_uw() result, debug values included,
+    is finite (JSON has no inf or NaN)"""
+    for values in (result, result.get("debug") or {}):
+        for value in values.values():
+            if isinstance(value, float) and not math.isfinite(value):
+                return False
+    return True
+
+
+def compute_uw(req, series, category, sash, driver, params, method):
+    """Run the Uw formulas of the category's calculation method for one
+    opening against its catalog records (as returned by resolve_calculation).
+
+    Raises ArithmeticError when the catalog values or admin formulas give no
+    finite result for these inputs (division by zero, overflow).
+    """
+    result = method.compute(req, series, category, sash, driver, params)
+    if not finite_result(result):
+        raise FloatingPointError("Calculation result is not finite")
+    return result
+
+
+def compute_sliding_uw(req, series, category, sash, driver, params):
+    """Uw formulas of sliding windows (Φιλητό with has_special_calculation)"""
     # === CALCULATIONS ===
     
     # Get values
-    a = series['a']
-    b = sash['b_override'] if sash['b_override'] else series['b']
-    x = series['x']
-    uf1 = series['uf1']
-    uf2 = series['uf2']
-    e = series['e']  # Akentrou value (normal)
-    f = series['f']  # For Φιλητό
-    e_narrow = series['e_narrow']  # Akentrou value (narrow)
-    f_narrow = series['f_narrow']  # For Φιλητό (narrow)
-    num_glasses = category['num_glasses']
-    has_special = category['has_special_calculation']
+    a = series.a
+    b = sash.b_override if sash.b_override else series.b
+    x = series.x
+    uf1 = series.uf1
+    uf2 = series.uf2
+    e = series.e  # Akentrou value (normal)
+    f = series.f  # For Φιλητό
+    e_narrow = series.e_narrow  # Akentrou value (narrow)
+    f_narrow = series.f_narrow  # For Φιλητό (narrow)
+    num_glasses = category.num_glasses
+    has_special = category.has_special_calculation
     
     # =========================================
     # INPUT VALUES
@@ -594,9 +1905,9 @@ async def calculate(req: CalculationRequest):
     # =========================================
     # GW/GH PARAMETERS (from database)
     # =========================================
-    gw_divisor = params['gw_divisor']
-    gw_offset = params['narrow_gw_offset'] if req.is_narrow and params['narrow_gw_offset'] else params['gw_offset']
-    gh_offset = params['gh_offset']
+    gw_divisor = params.gw_divisor
+    gw_offset = params.narrow_gw_offset if req.is_narrow and params.narrow_gw_offset else params.gw_offset
+    gh_offset = params.gh_offset
     
     # =========================================
     # CALCULATIONS - LENGTHS (mm to m where noted)
@@ -708,10 +2019,10 @@ async def calculate(req: CalculationRequest):
         "FH_original": FH_original,
         "FH_effective": FH if req.has_rolo else None,
         "rolo_height": req.rolo_height if req.has_rolo else None,
-        "series_name": series['name'],
-        "category_name": category['name'],
-        "driver_name": driver['name'],
-        "sash_name": sash['name'],
+        "series_name": series.name,
+        "category_name": category.name,
+        "driver_name": driver.name,
+        "sash_name": sash.name,
         "num_glasses": num_glasses,
         "has_rolo": req.has_rolo,
         "is_narrow": req.is_narrow,
@@ -739,7 +2050,7 @@ async def calculate(req: CalculationRequest):
             "gw_divisor": gw_divisor,
             "gw_offset": gw_offset,
             "gh_offset": gh_offset,
-            "narrow_gw_offset": params['narrow_gw_offset'],
+            "narrow_gw_offset": params.narrow_gw_offset,
             # Calculated intermediate values
             "l": round(l, 4),
             "GW": round(GW, 4),
@@ -772,155 +2083,4772 @@ async def calculate(req: CalculationRequest):
     }
 
 
-# ===================================
-# ADMIN API - GET ALL DATA
-# ===================================
+def run_calculation(req, catalog_version=None):
+    validate_calculation(req)
+    records = resolve_calculation(get_catalog(catalog_version), req)
+    try:
+        return compute_uw(req, *records)
+    except ArithmeticError:
+        raise HTTPException(status_code=422, detail=CALCULATION_FAILED)
 
-@app.get("/api/admin/all-data")
-async def get_all_data():
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    data = {}
-    
-    cursor.execute("SELECT * FROM types")
-    data['types'] = rows_to_list(cursor.fetchall())
-    
-    cursor.execute("SELECT * FROM categories")
-    data['categories'] = rows_to_list(cursor.fetchall())
-    
-    cursor.execute("SELECT * FROM series")
-    data['series'] = rows_to_list(cursor.fetchall())
-    
-    cursor.execute("SELECT * FROM drivers")
-    data['drivers'] = rows_to_list(cursor.fetchall())
-    
-    cursor.execute("SELECT * FROM driver_categories")
-    data['driver_categories'] = rows_to_list(cursor.fetchall())
-    
-    cursor.execute("SELECT * FROM sashes")
-    data['sashes'] = rows_to_list(cursor.fetchall())
-    
-    cursor.execute("SELECT * FROM series_category_params")
-    data['series_category_params'] = rows_to_list(cursor.fetchall())
-    
-    conn.close()
-    return data
+
+@app.post("/api/calculate")
+async def calculate(req: CalculationRequest, catalog_version: Optional[int] = None):
+    """Uw of one opening; ?catalog_version= calculates against an earlier
+    catalog version (e.g. to reproduce a quote)"""
+    key = (current_catalog_name.get(), catalog_version) + tuple(getattr(req, field) for field in CALCULATION_FIELDS)
+    return await calculation_flight.do(key, run_calculation, req, catalog_version)
 
 
 # ===================================
-# ADMIN API - UPDATE ENDPOINTS
+# BATCH CALCULATION (columnar fast path)
 # ===================================
+# Bulk inputs are validated and calculated as NumPy columns: no Pydantic
+# model per opening, one mask per check, and the formulas of compute_uw()
+# applied to whole arrays. Error codes and messages match /api/calculate.
 
-class UpdateSeriesRequest(BaseModel):
-    name: Optional[str] = None
-    code: Optional[str] = None
-    a: Optional[float] = None
-    b: Optional[float] = None
-    x: Optional[float] = None
-    uf1: Optional[float] = None
-    uf2: Optional[float] = None
-    e: Optional[float] = None
-    f: Optional[float] = None
-    e_narrow: Optional[float] = None
-    f_narrow: Optional[float] = None
-    image_url: Optional[str] = None
+MAX_BATCH_SIZE = 100_000
+# Largest `quantity` of one opening (projects, glass, profiles, aggregates)
+MAX_QUANTITY = 10_000
 
+# Per-row error code -> (HTTP status of the single endpoint, message)
+# Catalog values the formulas cannot use (e.g. gw_divisor = 0)
+CALCULATION_FAILED = "The catalog values of this configuration give no finite result"
+BATCH_ERRORS = {
+    'INVALID_VALUE': (422, "Missing or non-numeric input value"),
+    **{code: (400, detail) for code, detail in VALIDATION_ERRORS.items()},
+    **{code: (404, detail) for detail, code in NOT_FOUND_ERRORS.items()},
+    'LIMIT_NOT_FOUND': (404, "No Uw limit for this climate zone and building use"),
+    'NO_GLASS_AREA': (422, "The formulas leave no glass area for this opening"),
+    'PROFILE_TOO_SHORT': (422, "The opening is too small for its frame or sash profiles"),
+    'CALCULATION_FAILED': (422, CALCULATION_FAILED),
+}
+BATCH_ERROR_CODES = [None] + list(BATCH_ERRORS)
 
-@app.put("/api/admin/series/{series_id}")
-async def update_series(series_id: int, req: UpdateSeriesRequest):
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    updates = []
-    values = []
-    
-    for field in ['name', 'code', 'a', 'b', 'x', 'uf1', 'uf2', 'e', 'f', 'e_narrow', 'f_narrow', 'image_url']:
-        val = getattr(req, field)
-        if val is not None:
-            updates.append(f"{field} = ?")
-            values.append(val)
-    
-    if updates:
-        values.append(series_id)
-        cursor.execute(f"UPDATE series SET {', '.join(updates)} WHERE id = ?", values)
-        conn.commit()
-    
-    cursor.execute("SELECT * FROM series WHERE id = ?", (series_id,))
-    result = row_to_dict(cursor.fetchone())
-    conn.close()
-    return result
+# Constants compute_uw() takes from the catalog records, per configuration
+CONFIG_COLUMNS = [
+    'a', 'b', 'x', 'uf1', 'uf2', 'e', 'f', 'e_narrow', 'f_narrow',
+    'num_glasses', 'has_special', 'gw_divisor', 'gw_offset', 'gh_offset', 'narrow_gw_offset',
+    'method',
+]
 
 
-class UpdateCategoryRequest(BaseModel):
-    name: Optional[str] = None
-    num_glasses: Optional[int] = None
-    has_special_calculation: Optional[bool] = None
-    image_url: Optional[str] = None
+class ConfigKey(NamedTuple):
+    series_id: int
+    category_id: int
+    driver_id: int
+    sash_id: int
 
 
-@app.put("/api/admin/categories/{category_id}")
-async def update_category(category_id: int, req: UpdateCategoryRequest):
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    updates = []
-    values = []
-    
-    for field in ['name', 'num_glasses', 'has_special_calculation', 'image_url']:
-        val = getattr(req, field)
-        if val is not None:
-            updates.append(f"{field} = ?")
-            values.append(val)
-    
-    if updates:
-        values.append(category_id)
-        cursor.execute(f"UPDATE categories SET {', '.join(updates)} WHERE id = ?", values)
-        conn.commit()
-    
-    cursor.execute("SELECT * FROM categories WHERE id = ?", (category_id,))
-    result = row_to_dict(cursor.fetchone())
-    conn.close()
-    return result
+def float_column(values, n, invalid):
+    """Column as float64 (None -> NaN); rows that do not convert, nested
+    values included, are flagged"""
+    try:
+        column = np.array([np.nan if value is None else value for value in values], dtype=float)
+        if column.shape == (n,):
+            return column
+    except (TypeError, ValueError):
+        pass
+    column = np.full(n, np.nan)
+    for i, value in enumerate(values):
+        if value is None:
+            continue
+        try:
+            column[i] = float(value)
+        except (TypeError, ValueError):
+            invalid[i] = True
+    return column
 
 
-class UpdateParamsRequest(BaseModel):
-    gw_divisor: Optional[float] = None
-    gw_offset: Optional[float] = None
-    gh_offset: Optional[float] = None
-    narrow_gw_offset: Optional[float] = None
+def bool_column(values, n, invalid):
+    """Column as bool (None -> False); rows with anything but a bool or 0/1
+    (e.g. "false") are flagged"""
+    column = np.zeros(n, dtype=bool)
+    for i, value in enumerate(values):
+        if isinstance(value, (bool, int, float)) and value in (0, 1):
+            column[i] = value
+        elif value is not None:
+            invalid[i] = True
+    return column
 
 
-@app.put("/api/admin/series-category-params/{param_id}")
-async def update_params(param_id: int, req: UpdateParamsRequest):
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    updates = []
-    values = []
-    
-    for field in ['gw_divisor', 'gw_offset', 'gh_offset', 'narrow_gw_offset']:
-        val = getattr(req, field)
-        if val is not None:
-            updates.append(f"{field} = ?")
-            values.append(val)
-    
-    if updates:
-        values.append(param_id)
-        cursor.execute(f"UPDATE series_category_params SET {', '.join(updates)} WHERE id = ?", values)
-        conn.commit()
-    
-    cursor.execute("SELECT * FROM series_category_params WHERE id = ?", (param_id,))
-    result = row_to_dict(cursor.fetchone())
-    conn.close()
-    return result
+def quantity_column(values, n, invalid):
+    """`quantity` column; rows that are not a whole number from 1 to
+    MAX_QUANTITY are flagged"""
+    quantity = float_column(values, n, invalid)
+    invalid |= ~((quantity >= 1) & (quantity <= MAX_QUANTITY) & (quantity == np.floor(quantity)))
+    return quantity
 
 
-@app.get("/api/health")
-async def health_check():
-    return {"status": "healthy", "database": DB_PATH}
+def parse_batch_columns(body):
+    """Turn a batch body into NumPy columns.
 
+    The body is either {field: [values...]} (columnar; a scalar is used for
+    every row) or a list of CalculationRequest-shaped objects.
+    Returns (n, columns, invalid-mask).
+    """
+    if isinstance(body, list):
+        body = {field: [row.get(field) if isinstance(row, dict) else None for row in body] for field in CALCULATION_FIELDS}
+    if not isinstance(body, dict):
+        raise HTTPException(status_code=400, detail="Batch body must be an object of columns or a list of openings")
 
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    lengths = {len(value) for value in body.values() if isinstance(value, list)}
+    if len(lengths) > 1:
+        raise HTTPException(status_code=400, detail="All batch columns must have the same length")
+    n = lengths.pop() if lengths else 1
+    if n > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch is limited to {MAX_BATCH_SIZE} openings")
+
+    invalid = np.zeros(n, dtype=bool)
+    columns = {}
+    for field in CALCULATION_FIELDS:
+        values = body.get(field)
+        if not isinstance(values, list):
+            values = [values] * n
+        if field in ('is_narrow', 'has_rolo'):
+            columns[field] = bool_column(values, n, invalid)
+        else:
+            columns[field] = float_column(values, n, invalid)
+
+    for field in ('series_id', 'category_id', 'driver_id', 'sash_id',
+                  'plaisio_width', 'plaisio_height', 'ug_value', 'psi_value'):
+        invalid |= np.isnan(columns[field])
+    for field in ('series_id', 'category_id', 'driver_id', 'sash_id'):
+        column = columns[field]
+        invalid |= np.isfinite(column) & (column != np.floor(column))
+        columns[field] = np.where(invalid, -1, np.nan_to_num(column, nan=-1)).astype(np.int64)
+    return n, columns, invalid
+
+
+def batch_validation_codes(columns, invalid):
+    """Index into BATCH_ERROR_CODES of the first failed check of every row"""
+    def outside(field, column):
+        low, high = CALCULATION_LIMITS[field]
+        return ~((low <= column) & (column <= high))  # NaN is outside, like None
+
+    has_rolo = columns['has_rolo']
+    checks = [
+        ('INVALID_VALUE', invalid),
+        ('HEIGHT_RANGE', outside('plaisio_height', columns['plaisio_height'])),
+        ('WIDTH_RANGE', outside('plaisio_width', columns['plaisio_width'])),
+        ('UG_RANGE', outside('ug_value', columns['ug_value'])),
+        ('PSI_VALUE', ~np.isin(columns['psi_value'], PSI_VALUES)),
+        ('ROLO_HEIGHT_RANGE', has_rolo & outside('rolo_height', columns['rolo_height'])),
+        ('UR_RANGE', has_rolo & outside('ur_value', columns['ur_value'])),
+    ]
+    return np.select(
+        [mask for _, mask in checks],
+        [BATCH_ERROR_CODES.index(code) for code, _ in checks],
+        default=0,
+    )
+
+
+def group_rows(key_columns):
+    """Group rows by several integer columns.
+
+    Returns (first row of every group, group number of every row). Columns are
+    folded in one at a time so the combined key never overflows int64.
+    """
+    inverse = np.zeros(len(key_columns[0]), dtype=np.int64)
+    for column in key_columns:
+        values, column_inverse = np.unique(column, return_inverse=True)
+        inverse = inverse * len(values) + column_inverse.reshape(-1)
+        _, first, inverse = np.unique(inverse, return_index=True, return_inverse=True)
+        inverse = inverse.reshape(-1)
+    return first, inverse
+
+
+def gather_config_columns(catalog, columns, codes):
+    """Look each distinct (series, category, driver, sash) up once and spread
+    its constants over the rows. Rows with unknown references get a 404 code."""
+    first, inverse = group_rows([columns[field] for field in ConfigKey._fields])
+    unique_keys = np.stack([columns[field][first] for field in ConfigKey._fields], axis=1)
+
+    config_codes = np.zeros(len(unique_keys), dtype=np.int64)
+    constants = np.full((len(unique_keys), len(CONFIG_COLUMNS)), np.nan)
+    compiled = compiled_catalog(catalog)
+    for i, key in enumerate(unique_keys.tolist()):
+        row = compiled.rows.get(tuple(key)) if compiled else None
+        if row is not None:
+            constants[i] = compiled.table[row, len(ConfigKey._fields):]
+            constants[i, CONFIG_COLUMNS.index('method')] = compiled.methods[row]
+            continue
+        try:
+            resolved = resolve_calculation(catalog, ConfigKey(*key))
+        except HTTPException as exc:
+            config_codes[i] = BATCH_ERROR_CODES.index(NOT_FOUND_ERRORS[exc.detail])
+            continue
+        constants[i] = config_constants(*resolved)
+
+    codes = np.where(codes == 0, config_codes[inverse], codes)
+    config = {name: constants[inverse, j] for j, name in enumerate(CONFIG_COLUMNS)}
+    return codes, config
+
+
+def truthy(column):
+    """Python truthiness of a float column where None was stored as NaN"""
+    return ~np.isnan(column) & (column != 0)
+
+
+def compute_uw_columns(cfg, cols):
+    """compute_uw() over arrays: each row by the calculation method of its
+    configuration. A batch of a single method is evaluated in one call."""
+    methods = cfg['method']
+    codes = methods[~np.isnan(methods)]
+    if not len(codes) or codes.min() == codes.max():
+        method = CALCULATION_METHODS[int(codes[0]) if len(codes) else 0]
+        return method.compute_columns(cfg, cols)
+
+    results = {}
+    for code in np.unique(codes).tolist():
+        rows = np.flatnonzero(methods == code)
+        part = CALCULATION_METHODS[int(code)].compute_columns(
+            {name: column[rows] for name, column in cfg.items()},
+            {name: column[rows] for name, column in cols.items()},
+        )
+        for name, column in part.items():
+            if name not in results:
+                results[name] = np.zeros(len(methods), dtype=bool) if column.dtype == bool else np.full(len(methods), np.nan)
+            results[name][rows] = column
+    return results
+
+
+def compute_sliding_columns(cfg, cols):
+    """compute_sliding_uw() over arrays, with the same operation order (so the
+    same floats) and the same `x if x else y` fallbacks"""
+    FW = cols['plaisio_width']
+    FH_original = cols['plaisio_height']
+    Ug = cols['ug_value']
+    Psi = cols['psi_value']
+    is_narrow = cols['is_narrow']
+    rolo_height = cols['rolo_height']
+    ur_value = cols['ur_value']
+
+    with np.errstate(all='ignore'):
+        has_rolo = cols['has_rolo'] & truthy(rolo_height)
+        FH = np.where(has_rolo, FH_original - rolo_height, FH_original)
+        Ar = (FW * rolo_height) / 1_000_000
+
+        gw_offset = np.where(is_narrow & truthy(cfg['narrow_gw_offset']), cfg['narrow_gw_offset'], cfg['gw_offset'])
+        l = (cfg['a'] + cfg['b'] - cfg['x']) / 1000
+        GW = (FW / cfg['gw_divisor']) - gw_offset
+        GH = FH - cfg['gh_offset']
+        Kentro_height = FH - (2 * l * 1000)
+        akentrou_value = np.where(is_narrow & truthy(cfg['e_narrow']), cfg['e_narrow'], cfg['e'])
+
+        num_glasses = cfg['num_glasses']
+        Akoufomatos = (FH * FW) / 1_000_000
+        Aw = Akoufomatos
+        Af1 = Akoufomatos - ((FH/1000 - 2*l) * (FW/1000 - 2*l))
+        Af2 = (num_glasses - 1) * (Kentro_height * akentrou_value) / 1_000_000
+        Aff2 = (num_glasses - 2) * (Kentro_height * akentrou_value) / 1_000_000
+        Af = Af1 + Af2
+        Ag = Akoufomatos - Af
+        Ig = (2 * GH + 2 * GW) * num_glasses / 1000
+
+        afilitou_value = np.where(is_narrow & truthy(cfg['f_narrow']), cfg['f_narrow'], cfg['f'])
+        Afilitou = np.where(truthy(afilitou_value), (Kentro_height * afilitou_value) / 1_000_000, 0)
+        Af_Uf = np.where(
+            truthy(cfg['has_special']),
+            (Af1 * cfg['uf1']) + (Aff2 * cfg['uf2']) + (Afilitou * cfg['uf1']),
+            (Af1 * cfg['uf1']) + (Af2 * cfg['uf2']),
+        )
+        Uw = (Af_Uf + (Ag * Ug) + (Ig * Psi)) / Aw
+
+        has_ur = has_rolo & truthy(ur_value)
+        Uw_open = (Uw * Aw + Ar * ur_value) / (Aw + Ar)
+        Uw_closed = 1 / ((1 / Uw_open) + 0.15)
+        dGW_dFW = 1 / cfg['gw_divisor']
+
+    return {
+        'Uw': Uw,
+        'Uw_open': np.where(has_ur, Uw_open, np.nan),
+        'Uw_closed': np.where(has_ur, Uw_closed, np.nan),
+        'GW': GW,
+        'GH': GH,
+        'Aw': Aw,
+        'Af': Af,
+        'Ag': Ag,
+        'Ig': Ig,
+        # intermediates used by the sensitivity analysis
+        'l': l,
+        'FH': FH,
+        'Ar': Ar,
+        'akentrou_value': akentrou_value,
+        'afilitou_value': np.where(truthy(afilitou_value), afilitou_value, 0),
+        'filitou': truthy(cfg['has_special']),
+        'uf2': cfg['uf2'],
+        'dGW_dFW': dGW_dFW,
+        'has_rolo': has_rolo,
+        'has_ur': has_ur,
+    }
+
+
+# Batch result columns and their rounding (as in the /api/calculate response)
+BATCH_RESULT_DIGITS = {'Uw': 4, 'Uw_open': 4, 'Uw_closed': 4, 'GW': 2, 'GH': 2, 'Aw': 4, 'Af': 4, 'Ag': 4, 'Ig': 4}
+
+
+def rounded_list(column, digits, valid):
+    """Round like Python's round() and return a list with None for invalid
+    rows, NaN (e.g. Uw_open without rolo) and infinities.
+
+    np.round agrees with round() except next to a .5 tie, where scaling by
+    10**digits can land on the wrong side; only those values go through round().
+    """
+    with np.errstate(invalid='ignore'):
+        scaled = column * 10.0 ** digits
+        result = np.round(column, digits)
+        near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_tie).tolist():
+        result[i] = round(float(column[i]), digits)
+    result = np.where(valid & np.isfinite(result), result, np.nan).tolist()
+    return [None if value != value else value for value in result]
+
+
+def failed_calculation_codes(codes, results):
+    """`codes` with CALCULATION_FAILED for the valid rows without a finite Uw"""
+    with np.errstate(invalid='ignore'):
+        failed = (codes == 0) & ~np.isfinite(results['Uw'])
+    return np.where(failed, BATCH_ERROR_CODES.index('CALCULATION_FAILED'), codes)
+
+
+def batch_errors(codes, valid):
+    errors = []
+    for i in np.flatnonzero(~valid).tolist():
+        code = BATCH_ERROR_CODES[codes[i]]
+        status, detail = BATCH_ERRORS[code]
+        errors.append({"index": i, "code": code, "status": status, "detail": detail})
+    return errors
+
+
+def run_batch_calculation(body, catalog_version=None):
+    n, columns, invalid = parse_batch_columns(body)
+    catalog = get_catalog(catalog_version)
+    codes = batch_validation_codes(columns, invalid)
+    codes, config = gather_config_columns(catalog, columns, codes)
+    results = compute_uw_columns(config, columns)
+    codes = failed_calculation_codes(codes, results)
+    valid = codes == 0
+    errors = batch_errors(codes, valid)
+
+    return {
+        "count": n,
+        "valid": int(valid.sum()),
+        "catalog_version": catalog.version,
+        "errors": errors,
+        "results": {
+            name: rounded_list(results[name], digits, valid)
+            for name, digits in BATCH_RESULT_DIGITS.items()
+        },
+    }
+
+
+@app.post("/api/calculate/batch")
+async def calculate_batch(request: Request, catalog_version: Optional[int] = None):
+    """Calculate many openings in one request.
+
+    Send columns ({"series_id": [...], "plaisio_width": [...], ...}, scalars
+    apply to every row) or a list of /api/calculate bodies. Invalid rows are
+    reported in `errors` with the code, status and message /api/calculate
+    would return; their `results` entries are null. ?catalog_version=
+    calculates against an earlier catalog version.
+    """
+    try:
+        body = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Batch body must be JSON")
+    # JSONResponse skips jsonable_encoder, which is slow on 100k-item lists
+    return JSONResponse(await run_in_threadpool(run_batch_calculation, body, catalog_version))
+
+
+# ===================================
+# CALCULATION METHODS (formula strategies per window type)
+# ===================================
+# Every category is calculated by one registered method, chosen from its
+# type when a catalog snapshot is built (Catalog.methods), so requests do not
+# branch on the window family. A method has a scalar evaluator (compute_uw)
+# and a columnar one (the batch paths); compute_uw_columns() hands a batch
+# of a single method straight to it and splits mixed batches per method.
+
+class CalculationMethod(NamedTuple):
+    name: str
+    compute: Callable  # (req, series, category, sash, driver, params) -> result
+    compute_columns: Callable  # (cfg, cols) -> result columns
+    uses_params: bool = True  # needs a series_category_params row
+    builtin: bool = True  # hand-written (False: compiled from admin formulas)
+    # applies has_special_calculation; categories that have it set are not
+    # calculated by a method without it (404 METHOD_NOT_FOUND)
+    special: bool = True
+
+
+# Registered methods by their code in the `method` column. Codes are not
+# reused, so a code read before its method was unregistered names no other.
+CALCULATION_METHODS = {}
+calculation_method_codes = {}  # method -> code
+next_method_code = itertools.count()
+
+
+def register_calculation_method(method):
+    code = next(next_method_code)
+    CALCULATION_METHODS[code] = method
+    calculation_method_codes[method] = code
+    return method
+
+
+def unregister_calculation_method(method):
+    del CALCULATION_METHODS[calculation_method_codes.pop(method)]
+
+
+def compute_opening_uw(req, series, category, sash, driver, params):
+    """Uw formulas of opening (casement) windows.
+
+    The leaves do not overlap, so the glass follows from the sightlines: the
+    frame+sash band l all round and num_glasses - 1 meeting stiles of width
+    e (e_narrow when narrow). The band has Uf = uf1, the stiles uf2 (uf1
+    when not set). GW/GH params are not used.
+
+    There is no special (Φιλητό) opening layout: categories with
+    has_special_calculation are not calculated by this method (special=False).
+    """
+    a = series.a
+    b = sash.b_override if sash.b_override else series.b
+    x = series.x
+    uf1 = series.uf1
+    uf2 = series.uf2 if series.uf2 else series.uf1
+    num_glasses = category.num_glasses
+
+    FW = req.plaisio_width
+    FH_original = req.plaisio_height
+    Ug = req.ug_value
+    Psi = req.psi_value
+
+    Ar = None
+    Uw_open = None
+    Uw_closed = None
+    if req.has_rolo and req.rolo_height:
+        FH = FH_original - req.rolo_height
+        Ar = (FW * req.rolo_height) / 1_000_000
+    else:
+        FH = FH_original
+
+    l = (a + b - x) / 1000
+    akentrou_value = series.e_narrow if req.is_narrow and series.e_narrow else (series.e if series.e else 0)
+    Kentro_height = FH - (2 * l * 1000)
+    # Glass of one leaf (mm)
+    GW = (FW - (2 * l * 1000) - (num_glasses - 1) * akentrou_value) / num_glasses
+    GH = Kentro_height
+
+    Akoufomatos = (FH * FW) / 1_000_000
+    Aw = Akoufomatos
+    Af1 = Akoufomatos - ((FH/1000 - 2*l) * (FW/1000 - 2*l))
+    Af2 = (num_glasses - 1) * (Kentro_height * akentrou_value) / 1_000_000
+    Af = Af1 + Af2
+    Ag = Akoufomatos - Af
+    Ig = (2 * GH + 2 * GW) * num_glasses / 1000
+
+    Af_Uf = (Af1 * uf1) + (Af2 * uf2)
+    Uw = (Af_Uf + (Ag * Ug) + (Ig * Psi)) / Aw
+
+    if req.has_rolo and req.rolo_height and req.ur_value:
+        Uw_open = (Uw * Aw + Ar * req.ur_value) / (Aw + Ar)
+        Uw_closed = 1 / ((1 / Uw_open) + 0.15)
+
+    return {
+        "Uw": round(Uw, 4),
+        "Uw_open": round(Uw_open, 4) if Uw_open else None,
+        "Uw_closed": round(Uw_closed, 4) if Uw_closed else None,
+        "l": round(l, 4),
+        "GW": round(GW, 2),
+        "GH": round(GH, 2),
+        "Akoufomatos": round(Akoufomatos, 4),
+        "Af1": round(Af1, 4),
+        "Af2": round(Af2, 4),
+        "Aff2": None,
+        "Af": round(Af, 4),
+        "Ag": round(Ag, 4),
+        "Ig": round(Ig, 4),
+        "Af_Uf": round(Af_Uf, 4),
+        "Afilitou": None,
+        "Ar": round(Ar, 4) if Ar else None,
+        "FH_original": FH_original,
+        "FH_effective": FH if req.has_rolo else None,
+        "rolo_height": req.rolo_height if req.has_rolo else None,
+        "series_name": series.name,
+        "category_name": category.name,
+        "driver_name": driver.name,
+        "sash_name": sash.name,
+        "num_glasses": num_glasses,
+        "has_rolo": req.has_rolo,
+        "is_narrow": req.is_narrow,
+        "has_special": category.has_special_calculation,
+        "debug": {
+            "method": "opening",
+            "input_FW": FW,
+            "input_FH_original": FH_original,
+            "input_FH_effective": FH,
+            "rolo_height": req.rolo_height if req.has_rolo else None,
+            "Ug": Ug,
+            "Psi": Psi,
+            "a": a,
+            "b": b,
+            "x": x,
+            "uf1": uf1,
+            "uf2": uf2,
+            "l": round(l, 4),
+            "GW": round(GW, 4),
+            "GH": round(GH, 4),
+            "Kentro_height": round(Kentro_height, 4),
+            "akentrou_value": akentrou_value,
+            "Akoufomatos": round(Akoufomatos, 6),
+            "Af1": round(Af1, 6),
+            "Af2": round(Af2, 6),
+            "Af": round(Af, 6),
+            "Ag": round(Ag, 6),
+            "Aw": round(Aw, 6),
+            "Ig": round(Ig, 6),
+            "Af_Uf": round(Af_Uf, 6),
+            "Ar": round(Ar, 6) if Ar else None,
+            "Uw": round(Uw, 6),
+            "Uw_open": round(Uw_open, 6) if Uw_open else None,
+            "Uw_closed": round(Uw_closed, 6) if Uw_closed else None,
+            "num_glasses": num_glasses,
+            "is_narrow": req.is_narrow,
+        }
+    }
+
+
+def compute_opening_columns(cfg, cols):
+    """compute_opening_uw() over arrays (same operation order)"""
+    FW = cols['plaisio_width']
+    FH_original = cols['plaisio_height']
+    is_narrow = cols['is_narrow']
+    rolo_height = cols['rolo_height']
+    ur_value = cols['ur_value']
+
+    with np.errstate(all='ignore'):
+        has_rolo = cols['has_rolo'] & truthy(rolo_height)
+        FH = np.where(has_rolo, FH_original - rolo_height, FH_original)
+        Ar = (FW * rolo_height) / 1_000_000
+
+        l = (cfg['a'] + cfg['b'] - cfg['x']) / 1000
+        uf2 = np.where(truthy(cfg['uf2']), cfg['uf2'], cfg['uf1'])
+        num_glasses = cfg['num_glasses']
+        akentrou_value = np.where(
+            is_narrow & truthy(cfg['e_narrow']), cfg['e_narrow'], np.where(truthy(cfg['e']), cfg['e'], 0),
+        )
+        Kentro_height = FH - (2 * l * 1000)
+        GW = (FW - (2 * l * 1000) - (num_glasses - 1) * akentrou_value) / num_glasses
+        GH = Kentro_height
+
+        Akoufomatos = (FH * FW) / 1_000_000
+        Aw = Akoufomatos
+        Af1 = Akoufomatos - ((FH/1000 - 2*l) * (FW/1000 - 2*l))
+        Af2 = (num_glasses - 1) * (Kentro_height * akentrou_value) / 1_000_000
+        Af = Af1 + Af2
+        Ag = Akoufomatos - Af
+        Ig = (2 * GH + 2 * GW) * num_glasses / 1000
+
+        Af_Uf = (Af1 * cfg['uf1']) + (Af2 * uf2)
+        Uw = (Af_Uf + (Ag * cols['ug_value']) + (Ig * cols['psi_value'])) / Aw
+
+        has_ur = has_rolo & truthy(ur_value)
+        Uw_open = (Uw * Aw + Ar * ur_value) / (Aw + Ar)
+        Uw_closed = 1 / ((1 / Uw_open) + 0.15)
+        dGW_dFW = 1 / num_glasses
+
+    return {
+        'Uw': Uw,
+        'Uw_open': np.where(has_ur, Uw_open, np.nan),
+        'Uw_closed': np.where(has_ur, Uw_closed, np.nan),
+        'GW': GW,
+        'GH': GH,
+        'Aw': Aw,
+        'Af': Af,
+        'Ag': Ag,
+        'Ig': Ig,
+        # intermediates used by the sensitivity analysis
+        'l': l,
+        'FH': FH,
+        'Ar': Ar,
+        'akentrou_value': akentrou_value,
+        'afilitou_value': np.zeros(len(Uw)),
+        'filitou': np.zeros(len(Uw), dtype=bool),
+        'uf2': uf2,
+        'dGW_dFW': dGW_dFW,
+        'has_rolo': has_rolo,
+        'has_ur': has_ur,
+    }
+
+
+SLIDING_METHOD = register_calculation_method(
+    CalculationMethod('sliding', compute_sliding_uw, compute_sliding_columns)
+)
+OPENING_METHOD = register_calculation_method(
+    CalculationMethod('opening', compute_opening_uw, compute_opening_columns, uses_params=False, special=False)
+)
+
+# types.id -> method of the categories of that type
+TYPE_METHODS = {
+    1: SLIDING_METHOD,  # Συρόμενα
+    2: OPENING_METHOD,  # Ανοιγόμενα
+}
+
+
+# ===================================
+# FORMULA EXPRESSIONS (admin-editable calculation methods)
+# ===================================
+# The formulas of a method can be replaced from the admin by an ordered list
+# of `name = expression` rows in the `formulas` table. Expressions are a small
+# arithmetic language: numbers, + - * /, comparisons, `x if cond else y`
+# (and/or/not inside conditions) and abs/min/max over FORMULA_INPUTS and the
+# names assigned before. They are checked on the AST and compiled once per
+# formula set into a plain Python function and a NumPy one, so a custom
+# method is as fast as a hand-written one (`python backend.py formulas
+# --bench`). Missing catalog values are 0 inside formulas.
+
+# Arguments of a compiled formula function, in order
+FORMULA_INPUTS = [
+    # opening (FH after the rolo)
+    'FW', 'FH', 'Ug', 'Psi', 'is_narrow',
+    # series (b after the sash override)
+    'a', 'b', 'x', 'uf1', 'uf2', 'e', 'f', 'e_narrow', 'f_narrow',
+    # category
+    'num_glasses', 'has_special',
+    # series_category_params
+    'gw_divisor', 'gw_offset', 'gh_offset', 'narrow_gw_offset',
+]
+FORMULA_PARAMS = ['gw_divisor', 'gw_offset', 'gh_offset', 'narrow_gw_offset']
+# Names every formula set assigns, and the other reported ones
+FORMULA_OUTPUTS = ['GW', 'GH', 'Aw', 'Af', 'Ag', 'Ig', 'Uw']
+FORMULA_REPORTED = ['l', 'Akoufomatos', 'Af1', 'Af2', 'Aff2', 'Af_Uf', 'Afilitou']
+MAX_FORMULAS = 64
+MAX_EXPRESSION_LENGTH = 500
+
+# The hand-written methods as formulas (same operation order, same floats)
+DEFAULT_FORMULAS = {
+    'sliding': [
+        ('l', '(a + b - x) / 1000'),
+        ('GW', '(FW / gw_divisor) - (narrow_gw_offset if is_narrow and narrow_gw_offset else gw_offset)'),
+        ('GH', 'FH - gh_offset'),
+        ('Kentro_height', 'FH - (2 * l * 1000)'),
+        ('akentrou_value', 'e_narrow if is_narrow and e_narrow else e'),
+        ('Akoufomatos', '(FH * FW) / 1000000'),
+        ('Aw', 'Akoufomatos'),
+        ('Af1', 'Akoufomatos - ((FH / 1000 - 2 * l) * (FW / 1000 - 2 * l))'),
+        ('Af2', '(num_glasses - 1) * (Kentro_height * akentrou_value) / 1000000'),
+        ('Aff2', '(num_glasses - 2) * (Kentro_height * akentrou_value) / 1000000'),
+        ('Af', 'Af1 + Af2'),
+        ('Ag', 'Akoufomatos - Af'),
+        ('Ig', '(2 * GH + 2 * GW) * num_glasses / 1000'),
+        ('afilitou_value', 'f_narrow if is_narrow and f_narrow else f'),
+        ('Afilitou', '(Kentro_height * afilitou_value) / 1000000 if has_special and afilitou_value else 0'),
+        ('Af_Uf', '(Af1 * uf1) + (Aff2 * uf2) + (Afilitou * uf1) if has_special else (Af1 * uf1) + (Af2 * uf2)'),
+        ('Uw', '(Af_Uf + (Ag * Ug) + (Ig * Psi)) / Aw'),
+    ],
+    'opening': [
+        ('l', '(a + b - x) / 1000'),
+        ('uf2_value', 'uf2 if uf2 else uf1'),
+        ('akentrou_value', 'e_narrow if is_narrow and e_narrow else e'),
+        ('Kentro_height', 'FH - (2 * l * 1000)'),
+        ('GW', '(FW - (2 * l * 1000) - (num_glasses - 1) * akentrou_value) / num_glasses'),
+        ('GH', 'Kentro_height'),
+        ('Akoufomatos', '(FH * FW) / 1000000'),
+        ('Aw', 'Akoufomatos'),
+        ('Af1', 'Akoufomatos - ((FH / 1000 - 2 * l) * (FW / 1000 - 2 * l))'),
+        ('Af2', '(num_glasses - 1) * (Kentro_height * akentrou_value) / 1000000'),
+        ('Af', 'Af1 + Af2'),
+        ('Ag', 'Akoufomatos - Af'),
+        ('Ig', '(2 * GH + 2 * GW) * num_glasses / 1000'),
+        ('Af_Uf', '(Af1 * uf1) + (Af2 * uf2_value)'),
+        ('Uw', '(Af_Uf + (Ag * Ug) + (Ig * Psi)) / Aw'),
+    ],
+}
+
+FORMULA_BINARY_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div)
+FORMULA_COMPARISONS = (ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq)
+FORMULA_FUNCTIONS = {'abs': 1, 'min': 2, 'max': 2}  # name -> minimum arguments
+# Helpers the columnar function calls (see VectorizeFormula), not usable as names
+FORMULA_COLUMN_HELPERS = ('where', 'truthy', 'absolute', 'minimum', 'maximum')
+
+
+class FormulaError(ValueError):
+    pass
+
+
+def check_formula_node(name, node, known, condition=False):
+    """Reject anything outside the formula language; and/or/not are only
+    allowed where a truth value is expected"""
+    def check(child, condition=False):
+        check_formula_node(name, child, known, condition)
+
+    if isinstance(node, ast.Constant):
+        if type(node.value) not in (int, float):
+            raise FormulaError(f"{name}: only numbers are allowed as constants")
+        # Floats, so repeated products of an integer cannot grow without bound
+        try:
+            node.value = float(node.value)
+        except OverflowError:
+            node.value = math.inf
+        if not math.isfinite(node.value):
+            raise FormulaError(f"{name}: number too large")
+    elif isinstance(node, ast.Name):
+        if node.id not in known:
+            raise FormulaError(f"{name}: unknown name '{node.id}'")
+    elif isinstance(node, ast.BinOp):
+        if not isinstance(node.op, FORMULA_BINARY_OPERATORS):
+            raise FormulaError(f"{name}: only + - * / are allowed")
+        check(node.left)
+        check(node.right)
+    elif isinstance(node, ast.UnaryOp):
+        if isinstance(node.op, ast.Not):
+            if not condition:
+                raise FormulaError(f"{name}: 'not' is only allowed in conditions")
+            check(node.operand, True)
+        elif isinstance(node.op, (ast.USub, ast.UAdd)):
+            check(node.operand)
+        else:
+            raise FormulaError(f"{name}: operator not allowed")
+    elif isinstance(node, ast.BoolOp):
+        if not condition:
+            raise FormulaError(f"{name}: 'and'/'or' are only allowed in conditions")
+        for value in node.values:
+            check(value, True)
+    elif isinstance(node, ast.Compare):
+        if len(node.ops) != 1 or not isinstance(node.ops[0], FORMULA_COMPARISONS):
+            raise FormulaError(f"{name}: use one of < <= > >= == != per comparison")
+        check(node.left)
+        check(node.comparators[0])
+    elif isinstance(node, ast.IfExp):
+        check(node.test, True)
+        check(node.body)
+        check(node.orelse)
+    elif isinstance(node, ast.Call):
+        function = node.func.id if isinstance(node.func, ast.Name) else None
+        if function not in FORMULA_FUNCTIONS or node.keywords or len(node.args) < FORMULA_FUNCTIONS[function]:
+            raise FormulaError(f"{name}: only abs(x), min(x, y, ...) and max(x, y, ...) can be called")
+        if function == 'abs' and len(node.args) != 1:
+            raise FormulaError(f"{name}: abs() takes one argument")
+        for arg in node.args:
+            check(arg)
+    else:
+        raise FormulaError(f"{name}: {type(node).__name__} is not allowed")
+
+
+def parse_formulas(formulas):
+    """Checked (name, expression AST) pairs of an ordered formula list"""
+    if not 1 <= len(formulas) <= MAX_FORMULAS:
+        raise FormulaError(f"A method needs between 1 and {MAX_FORMULAS} formulas")
+    known = set(FORMULA_INPUTS)
+    parsed = []
+    for name, expression in formulas:
+        if not name.isidentifier() or keyword.iskeyword(name) or name.startswith('_'):
+            raise FormulaError(f"'{name}' is not a valid formula name")
+        if name in FORMULA_INPUTS or name in FORMULA_FUNCTIONS or name in known:
+            raise FormulaError(f"{name}: already defined")
+        if name in FORMULA_COLUMN_HELPERS:
+            raise FormulaError(f"'{name}' is reserved")
+        if len(expression) > MAX_EXPRESSION_LENGTH:
+            raise FormulaError(f"{name}: expression longer than {MAX_EXPRESSION_LENGTH} characters")
+        try:
+            tree = ast.parse(expression.strip(), mode='eval')
+        except SyntaxError as exc:
+            raise FormulaError(f"{name}: {exc.msg}")
+        check_formula_node(name, tree.body, known)
+        parsed.append((name, tree.body))
+        known.add(name)
+
+    missing = [name for name in FORMULA_OUTPUTS if name not in known]
+    if missing:
+        raise FormulaError(f"Missing formulas for {', '.join(missing)}")
+    return parsed
+
+
+class VectorizeFormula(ast.NodeTransformer):
+    """Rewrite a checked expression for NumPy columns: conditionals become
+    where(), and/or/not work on truthy() masks, min/max are pairwise"""
+
+    @staticmethod
+    def call(function, *args):
+        return ast.Call(func=ast.Name(id=function, ctx=ast.Load()), args=list(args), keywords=[])
+
+    def visit_IfExp(self, node):
+        self.generic_visit(node)
+        return self.call('where', self.call('truthy', node.test), node.body, node.orelse)
+
+    def visit_BoolOp(self, node):
+        self.generic_visit(node)
+        operator = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        masks = [self.call('truthy', value) for value in node.values]
+        result = masks[0]
+        for mask in masks[1:]:
+            result = ast.BinOp(left=result, op=operator, right=mask)
+        return result
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return ast.UnaryOp(op=ast.Invert(), operand=self.call('truthy', node.operand))
+        return node
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        if node.func.id == 'abs':
+            return self.call('absolute', *node.args)
+        function = 'minimum' if node.func.id == 'min' else 'maximum'
+        result = node.args[0]
+        for arg in node.args[1:]:
+            result = self.call(function, result, arg)
+        return result
+
+
+def compile_formula_function(function_name, parsed, namespace):
+    """def function_name(*FORMULA_INPUTS): <assignments>; return {name: value}"""
+    lines = [f"def {function_name}({', '.join(FORMULA_INPUTS)}):"]
+    lines += [f"    {name} = {ast.unparse(node)}" for name, node in parsed]
+    lines.append(f"    return {{{', '.join(f'{name!r}: {name}' for name, _ in parsed)}}}")
+    namespace = {'__builtins__': {}, **namespace}
+    exec(compile('\n'.join(lines), f"<formulas {function_name}>", 'exec'), namespace)
+    return namespace[function_name]
+
+
+def compile_formulas(method_name, formulas):
+    """(scalar function, column function, FORMULA_INPUTS used) of an ordered
+    [(name, expression)]"""
+    parsed = parse_formulas(formulas)
+    inputs = {
+        node.id for _, expression in parsed for node in ast.walk(expression)
+        if isinstance(node, ast.Name) and node.id in FORMULA_INPUTS
+    }
+    scalar = compile_formula_function(
+        f"{method_name}_formulas", parsed, {'abs': abs, 'min': min, 'max': max},
+    )
+    vectorized = [(name, ast.fix_missing_locations(VectorizeFormula().visit(copy.deepcopy(node)))) for name, node in parsed]
+    columns = compile_formula_function(
+        f"{method_name}_formula_columns", vectorized,
+        {'where': np.where, 'truthy': formula_condition, 'absolute': np.absolute, 'minimum': np.minimum, 'maximum': np.maximum},
+    )
+    return scalar, columns, inputs
+
+
+def formula_column(column):
+    """Catalog column for a formula: missing values (NaN) are 0"""
+    nan = np.isnan(column)
+    return np.where(nan, 0.0, column) if nan.any() else column
+
+
+def formula_condition(value):
+    """Truth value column of a condition (comparisons already are)"""
+    value = np.asarray(value)
+    return value if value.dtype == bool else truthy(value)
+
+
+def full_column(value, n):
+    """A formula result as a column (constant formulas give scalars)"""
+    return value if np.ndim(value) else np.full(n, float(value))
+
+
+def formula_method(method_name, formulas):
+    """CalculationMethod running compiled formulas (raises FormulaError)"""
+    scalar, columns, inputs = compile_formulas(method_name, formulas)
+    uses_params = any(name in inputs for name in FORMULA_PARAMS)
+    special = 'has_special' in inputs
+    # Catalog columns the formulas read; the others are passed as 0
+    config_inputs = [name if name in inputs else None for name in FORMULA_INPUTS[5:]]
+
+    def compute(req, series, category, sash, driver, params):
+        FW = req.plaisio_width
+        FH_original = req.plaisio_height
+        Ar = None
+        Uw_open = None
+        Uw_closed = None
+        if req.has_rolo and req.rolo_height:
+            FH = FH_original - req.rolo_height
+            Ar = (FW * req.rolo_height) / 1_000_000
+        else:
+            FH = FH_original
+
+        b = sash.b_override if sash.b_override else series.b
+        arguments = [
+            FW, FH, req.ug_value, req.psi_value, req.is_narrow,
+            series.a, b, series.x, series.uf1, series.uf2, series.e, series.f, series.e_narrow, series.f_narrow,
+            category.num_glasses, category.has_special_calculation,
+        ]
+        arguments += [getattr(params, name) for name in FORMULA_PARAMS] if params else [None] * len(FORMULA_PARAMS)
+        values = scalar(*[0 if value is None else value for value in arguments])
+
+        Uw = values['Uw']
+        Aw = values['Aw']
+        if req.has_rolo and req.rolo_height and req.ur_value:
+            Uw_open = (Uw * Aw + Ar * req.ur_value) / (Aw + Ar)
+            Uw_closed = 1 / ((1 / Uw_open) + 0.15)
+
+        def reported(name, digits=4):
+            return round(values[name], digits) if name in values else None
+
+        # Unrounded, unlike the hand-written methods: rounding every value
+        # would cost more than evaluating the formulas
+        return {
+            "Uw": round(Uw, 4),
+            "Uw_open": round(Uw_open, 4) if Uw_open else None,
+            "Uw_closed": round(Uw_closed, 4) if Uw_closed else None,
+            "l": reported('l'),
+            "GW": reported('GW', 2),
+            "GH": reported('GH', 2),
+            "Akoufomatos": reported('Akoufomatos'),
+            "Af1": reported('Af1'),
+            "Af2": reported('Af2'),
+            "Aff2": reported('Aff2'),
+            "Af": reported('Af'),
+            "Ag": reported('Ag'),
+            "Ig": reported('Ig'),
+            "Af_Uf": reported('Af_Uf'),
+            "Afilitou": reported('Afilitou') if values.get('Afilitou') else None,
+            "Ar": round(Ar, 4) if Ar else None,
+            "FH_original": FH_original,
+            "FH_effective": FH if req.has_rolo else None,
+            "rolo_height": req.rolo_height if req.has_rolo else None,
+            "series_name": series.name,
+            "category_name": category.name,
+            "driver_name": driver.name,
+            "sash_name": sash.name,
+            "num_glasses": category.num_glasses,
+            "has_rolo": req.has_rolo,
+            "is_narrow": req.is_narrow,
+            "has_special": category.has_special_calculation,
+            "debug": {
+                "method": method_name,
+                "custom_formulas": True,
+                **dict(zip(FORMULA_INPUTS, arguments)),
+                **values,
+                "Ar": round(Ar, 6) if Ar else None,
+                "Uw_open": round(Uw_open, 6) if Uw_open else None,
+                "Uw_closed": round(Uw_closed, 6) if Uw_closed else None,
+            }
+        }
+
+    def compute_columns(cfg, cols):
+        FW = cols['plaisio_width']
+        rolo_height = cols['rolo_height']
+        ur_value = cols['ur_value']
+        with np.errstate(all='ignore'):
+            has_rolo = cols['has_rolo'] & truthy(rolo_height)
+            FH = np.where(has_rolo, cols['plaisio_height'] - rolo_height, cols['plaisio_height'])
+            Ar = (FW * rolo_height) / 1_000_000
+
+            arguments = [FW, FH, cols['ug_value'], cols['psi_value'], cols['is_narrow']]
+            arguments += [formula_column(cfg[name]) if name else 0 for name in config_inputs]
+            values = {name: full_column(value, len(FW)) for name, value in columns(*arguments).items()}
+            Uw = values['Uw']
+            Aw = values['Aw']
+
+            has_ur = has_rolo & truthy(ur_value)
+            Uw_open = (Uw * Aw + Ar * ur_value) / (Aw + Ar)
+            Uw_closed = 1 / ((1 / Uw_open) + 0.15)
+
+        results = {name: values[name] for name in ('GW', 'GH', 'Af', 'Ag', 'Ig')}
+        return {
+            'Uw': Uw,
+            'Uw_open': np.where(has_ur, Uw_open, np.nan),
+            'Uw_closed': np.where(has_ur, Uw_closed, np.nan),
+            'Aw': Aw,
+            **results,
+            'has_rolo': has_rolo,
+            'has_ur': has_ur,
+        }
+
+    return CalculationMethod(method_name, compute, compute_columns, uses_params, builtin=False, special=special)
+
+
+# (method name, formulas) -> registered CalculationMethod (None when the set
+# does not compile), least recently used first. A formula set is compiled
+# and registered once; beyond MAX_FORMULA_METHODS the oldest sets no catalog
+# in memory uses are unregistered.
+MAX_FORMULA_METHODS = 32
+formula_methods = OrderedDict()
+formula_methods_lock = threading.Lock()
+
+
+def forget_formula_methods(keep):
+    """Unregister the oldest unused formula methods over MAX_FORMULA_METHODS,
+    except the sets in `keep` (formula_methods_lock held)"""
+    excess = len(formula_methods) - MAX_FORMULA_METHODS
+    if excess <= 0:
+        return
+    in_use = {
+        id(method)
+        for catalog in [*resident_catalogs.values(), *catalog_versions.values()]
+        for method in catalog.methods.values()
+    }
+    for key in list(formula_methods):
+        method = formula_methods[key]
+        if key not in keep and (method is None or id(method) not in in_use):
+            del formula_methods[key]
+            if method is not None:
+                unregister_calculation_method(method)
+            excess -= 1
+            if not excess:
+                return
+
+
+def catalog_formula_methods(formulas):
+    """{method name: CalculationMethod} for the methods the `formulas` table
+    overrides (None for a set that does not compile)"""
+    by_method = {}
+    for formula in sorted(formulas.values(), key=lambda formula: (formula.method, formula.position, formula.id)):
+        by_method.setdefault(formula.method, []).append((formula.name, formula.expression))
+
+    methods = {}
+    # Sets of the catalog under construction, not in memory yet
+    keys = {(method_name, tuple(definitions)) for method_name, definitions in by_method.items()}
+    for method_name, definitions in by_method.items():
+        key = (method_name, tuple(definitions))
+        with formula_methods_lock:
+            if key in formula_methods:
+                formula_methods.move_to_end(key)
+            else:
+                try:
+                    formula_methods[key] = register_calculation_method(formula_method(method_name, definitions))
+                except FormulaError as exc:
+                    logger.warning("Formulas of method %s do not compile: %s", method_name, exc)
+                    formula_methods[key] = None
+                forget_formula_methods(keys)
+            methods[method_name] = formula_methods[key]
+    return methods
+
+
+def check_default_formulas(count=2000, bench=False):
+    """Compare DEFAULT_FORMULAS compiled against the hand-written methods on
+    `count` openings per configuration sample, scalar and columnar. Returns
+    problems (and prints timings with `bench`)."""
+    catalog = get_catalog()
+    keys = [
+        ConfigKey(series_id, category_id, driver_ids[0], sash_id)
+        for series_id, configurations in catalog_configurations(catalog).items()
+        for (category_id, sash_id), driver_ids in configurations.items()
+    ]
+    random = Random(0)
+    limits = CALCULATION_LIMITS
+    problems = []
+    for builtin in list(CALCULATION_METHODS.values()):
+        if not builtin.builtin or builtin.name not in DEFAULT_FORMULAS:
+            continue
+        compiled = formula_method(builtin.name, DEFAULT_FORMULAS[builtin.name])
+        method_keys = [key for key in keys if catalog.methods.get(key.category_id) is builtin]
+        if not method_keys:
+            continue
+
+        rows = []
+        for i in range(count):
+            has_rolo = i % 3 == 0
+            rows.append({
+                **method_keys[i % len(method_keys)]._asdict(),
+                "plaisio_width": round(random.uniform(*limits['plaisio_width']), 1),
+                "plaisio_height": round(random.uniform(1000, limits['plaisio_height'][1]), 1),
+                "ug_value": round(random.uniform(*limits['ug_value']), 2),
+                "psi_value": random.choice(PSI_VALUES),
+                "is_narrow": i % 2 == 1,
+                "has_rolo": has_rolo,
+                "rolo_height": random.randint(100, 600) if has_rolo else None,
+                "ur_value": round(random.uniform(*limits['ur_value']), 2) if has_rolo else None,
+            })
+        requests = [CalculationRequest(**row) for row in rows]
+        records = [resolve_calculation(catalog, req)[:5] for req in requests]
+
+        timings = {}
+        results = {}
+        for label, method in (('hand-written', builtin), ('compiled', compiled)):
+            start = time.perf_counter()
+            results[label] = [method.compute(req, *resolved) for req, resolved in zip(requests, records)]
+            timings[label, 'scalar'] = (time.perf_counter() - start) / count * 1e6
+
+        n, columns, invalid = parse_batch_columns(rows * 50)
+        codes, config = gather_config_columns(catalog, columns, batch_validation_codes(columns, invalid))
+        for label, method in (('hand-written', builtin), ('compiled', compiled)):
+            start = time.perf_counter()
+            results[label, 'columns'] = method.compute_columns(config, columns)
+            timings[label, 'columns'] = (time.perf_counter() - start) / n * 1e9
+
+        for i, (expected, got) in enumerate(zip(results['hand-written'], results['compiled'])):
+            wrong = [key for key in expected if key != 'debug' and expected[key] != got[key]]
+            if wrong:
+                problems.append(f"{builtin.name} row {i}: {', '.join(wrong)} differ")
+        for name in BATCH_RESULT_DIGITS:
+            expected, got = results['hand-written', 'columns'][name], results['compiled', 'columns'][name]
+            if not np.array_equal(expected, got, equal_nan=True):
+                problems.append(f"{builtin.name} columns: {name} differs")
+
+        if bench:
+            print(
+                f"{builtin.name}: scalar {timings['hand-written', 'scalar']:.1f} µs hand-written, "
+                f"{timings['compiled', 'scalar']:.1f} µs compiled; "
+                f"columns {timings['hand-written', 'columns']:.1f} ns/row hand-written, "
+                f"{timings['compiled', 'columns']:.1f} ns/row compiled ({n} rows)"
+            )
+    return problems
+
+
+# ===================================
+# COMPILED CATALOG (numeric, shared between workers)
+# ===================================
+# The batch paths take the constants of the configurations the calculator
+# offers from one numeric table (ConfigKey ids then CONFIG_COLUMNS per row)
+# and resolve only the remaining keys through resolve_calculation(). With
+# CATALOG_SHARE_DIR set, the table of each catalog version is written once
+# as <catalog>-<version>.npy and memory-mapped read-only, so all worker
+# processes share one copy through the page cache.
+
+CATALOG_SHARE_DIR = os.environ.get("CATALOG_SHARE_DIR")
+
+
+class CompiledCatalog:
+    """Constants table of one catalog version with a key -> row index.
+
+    Methods compiled from formulas get their code when this process registers
+    them, so the `method` column is taken from the catalog, not the table.
+    """
+    __slots__ = ('version', 'table', 'rows', 'methods')
+
+    def __init__(self, catalog, table):
+        self.version = catalog.version
+        self.table = table
+        key_width = len(ConfigKey._fields)
+        self.rows = {tuple(key): i for i, key in enumerate(table[:, :key_width].tolist())}
+        category_column = ConfigKey._fields.index('category_id')
+        self.methods = [
+            calculation_method_codes[catalog.methods[category_id]]
+            for category_id in table[:, category_column].astype(int).tolist()
+        ]
+
+
+# catalog name -> CompiledCatalog of its resident version
+compiled_catalogs = {}
+
+
+def config_constants(series, category, sash, driver, params, method):
+    """CONFIG_COLUMNS values of a resolved configuration (None as NaN)"""
+    params_values = {
+        'gw_divisor': params.gw_divisor,
+        'gw_offset': params.gw_offset,
+        'gh_offset': params.gh_offset,
+        'narrow_gw_offset': params.narrow_gw_offset,
+    } if params else {}
+    values = {
+        'a': series.a,
+        'b': sash.b_override if sash.b_override else series.b,
+        'x': series.x,
+        'uf1': series.uf1,
+        'uf2': series.uf2,
+        'e': series.e,
+        'f': series.f,
+        'e_narrow': series.e_narrow,
+        'f_narrow': series.f_narrow,
+        'num_glasses': category.num_glasses,
+        'has_special': category.has_special_calculation,
+        **params_values,
+        'method': calculation_method_codes[method],
+    }
+    return [np.nan if values.get(name) is None else values[name] for name in CONFIG_COLUMNS]
+
+
+def compile_catalog(catalog):
+    rows = []
+    for series_id, configurations in catalog_configurations(catalog).items():
+        for (category_id, sash_id), driver_ids in configurations.items():
+            for driver_id in driver_ids:
+                key = ConfigKey(series_id, category_id, driver_id, sash_id)
+                rows.append(list(key) + config_constants(*resolve_calculation(catalog, key)))
+    return np.array(rows, dtype=np.float64).reshape(-1, len(ConfigKey._fields) + len(CONFIG_COLUMNS))
+
+
+def shared_catalog_table(name, catalog):
+    """The compiled table from CATALOG_SHARE_DIR, written there by the first
+    worker that needs this version, memory-mapped read-only"""
+    path = os.path.join(CATALOG_SHARE_DIR, f"{name}-{catalog.version}.npy")
+    width = len(ConfigKey._fields) + len(CONFIG_COLUMNS)
+    try:
+        table = np.load(path, mmap_mode='r')
+        # A file written by a release with other CONFIG_COLUMNS is replaced
+        if table.shape[1] == width:
+            return table
+    except FileNotFoundError:
+        pass
+
+    os.makedirs(CATALOG_SHARE_DIR, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        np.save(f, compile_catalog(catalog))
+    os.replace(temp_path, path)
+    # Only older versions: a worker lagging behind must not remove the file of
+    # a newer one. Workers still mapping a removed file keep reading it.
+    for other in os.listdir(CATALOG_SHARE_DIR):
+        match = re.fullmatch(rf"{re.escape(name)}-(\d+)\.npy", other)
+        if match and int(match.group(1)) < catalog.version:
+            try:
+                os.remove(os.path.join(CATALOG_SHARE_DIR, other))
+            except FileNotFoundError:
+                pass
+    try:
+        return np.load(path, mmap_mode='r')
+    except FileNotFoundError:
+        # Removed meanwhile by a worker that wrote a newer version
+        return compile_catalog(catalog)
+
+
+def compiled_catalog(catalog):
+    """CompiledCatalog of `catalog` when it is the resident version, else None"""
+    name = current_catalog_name.get()
+    compiled = compiled_catalogs.get(name)
+    if compiled is not None and compiled.version == catalog.version:
+        return compiled
+    if resident_catalogs.get(name) is not catalog:
+        return None
+    table = shared_catalog_table(name, catalog) if CATALOG_SHARE_DIR else compile_catalog(catalog)
+    compiled = compiled_catalogs[name] = CompiledCatalog(catalog, table)
+    return compiled
+
+
+# ===================================
+# SENSITIVITY (analytical dUw/d input)
+# ===================================
+# Uw = (Af·Uf + Ag·Ug + Ig·Psi) / Aw is a closed form in the inputs, so its
+# partial derivatives are closed forms too and are evaluated over the same
+# columns as the batch calculation. Dimensions are per mm, FW/FH/rolo_height
+# being in mm.
+
+# Input -> derivative columns reported for Uw, Uw_open and Uw_closed
+SENSITIVITY_INPUTS = ['ug_value', 'psi_value', 'plaisio_width', 'plaisio_height', 'rolo_height', 'ur_value']
+
+
+def compute_sensitivity_columns(cfg, cols, res):
+    """Partial derivatives of the results of compute_uw_columns(): analytical
+    for the hand-written methods, by central differences for rows of a method
+    compiled from admin formulas"""
+    numeric = np.isin(cfg['method'], [code for code, method in list(CALCULATION_METHODS.items()) if not method.builtin])
+    if not numeric.any():
+        return analytic_sensitivity_columns(cfg, cols, res)
+
+    n = len(numeric)
+    merged = {
+        output: {name: np.full(n, np.nan) for name in SENSITIVITY_INPUTS}
+        for output in ('Uw', 'Uw_open', 'Uw_closed')
+    }
+    for rows, sensitivity_columns in (
+        (np.flatnonzero(numeric), numeric_sensitivity_columns),
+        (np.flatnonzero(~numeric), analytic_sensitivity_columns),
+    ):
+        if not len(rows):
+            continue
+        part = sensitivity_columns(
+            {name: column[rows] for name, column in cfg.items()},
+            {name: column[rows] for name, column in cols.items()},
+            {name: column[rows] for name, column in res.items() if np.ndim(column)},
+        )
+        for output, derivatives in part.items():
+            for name, column in derivatives.items():
+                merged[output][name][rows] = column
+    return merged
+
+
+def numeric_sensitivity_columns(cfg, cols, res):
+    """Central differences of compute_uw_columns(), masked like the
+    analytical derivatives"""
+    derivatives = {'Uw': {}, 'Uw_open': {}, 'Uw_closed': {}}
+    for name in SENSITIVITY_INPUTS:
+        value = cols[name]
+        step = 1e-6 * np.maximum(np.abs(np.nan_to_num(value)), 1)
+        above = compute_uw_columns(cfg, {**cols, name: value + step})
+        below = compute_uw_columns(cfg, {**cols, name: value - step})
+        for output in derivatives:
+            with np.errstate(all='ignore'):
+                derivatives[output][name] = (above[output] - below[output]) / (2 * step)
+    derivatives['Uw']['rolo_height'] = np.where(res['has_rolo'], derivatives['Uw']['rolo_height'], np.nan)
+    derivatives['Uw']['ur_value'] = np.full(len(res['Uw']), np.nan)
+    for output in ('Uw_open', 'Uw_closed'):
+        derivatives[output] = {
+            name: np.where(res['has_ur'], column, np.nan) for name, column in derivatives[output].items()
+        }
+    return derivatives
+
+
+def analytic_sensitivity_columns(cfg, cols, res):
+    """Partial derivatives of Uw (and Uw_open/Uw_closed with rolo) with
+    respect to SENSITIVITY_INPUTS, from the results of compute_uw_columns().
+
+    With FH' = plaisio_height - rolo_height, in mm:
+      dAw/dFW = FH'/1e6            dAw/dFH' = FW/1e6
+      dAf1/dFW = dAf1/dFH' = 2l/1000
+      dAf2/dFH' = (n-1)·e/1e6      dAff2/dFH' = (n-2)·e/1e6   dAfilitou/dFH' = f/1e6
+      dIg/dFW = 2n·dGW/dFW/1000    dIg/dFH' = 2n/1000
+      dUw/dX = (dN/dX - Uw·dAw/dX) / Aw   with N = Af·Uf + Ag·Ug + Ig·Psi
+    Uw_open = P/Q with P = N + Ar·Ur and Q = Aw + Ar = FW·FH/1e6, and
+    dUw_closed/dUw_open = Uw_closed² / Uw_open².
+    """
+    FW = cols['plaisio_width']
+    FH_original = cols['plaisio_height']
+    rolo_height = cols['rolo_height']
+    ur_value = cols['ur_value']
+    num_glasses = cfg['num_glasses']
+    uf1, uf2 = cfg['uf1'], res['uf2']
+    Uw, Aw, Ag, Ig = res['Uw'], res['Aw'], res['Ag'], res['Ig']
+    FH, l, has_rolo, has_ur = res['FH'], res['l'], res['has_rolo'], res['has_ur']
+
+    with np.errstate(all='ignore'):
+        dAw_dFW = FH / 1_000_000
+        dAw_dFH = FW / 1_000_000
+        dAf1 = 2 * l / 1000
+        dAf2_dFH = (num_glasses - 1) * res['akentrou_value'] / 1_000_000
+        dAff2_dFH = (num_glasses - 2) * res['akentrou_value'] / 1_000_000
+        dAfilitou_dFH = res['afilitou_value'] / 1_000_000
+        dIg_dFW = 2 * num_glasses * res['dGW_dFW'] / 1000
+        dIg_dFH = 2 * num_glasses / 1000
+
+        dAfUf_dFW = dAf1 * uf1
+        dAfUf_dFH = np.where(
+            res['filitou'],
+            dAf1 * uf1 + dAff2_dFH * uf2 + dAfilitou_dFH * uf1,
+            dAf1 * uf1 + dAf2_dFH * uf2,
+        )
+        dAg_dFW = dAw_dFW - dAf1
+        dAg_dFH = dAw_dFH - dAf1 - dAf2_dFH
+
+        dN_dFW = dAfUf_dFW + dAg_dFW * cols['ug_value'] + dIg_dFW * cols['psi_value']
+        dN_dFH = dAfUf_dFH + dAg_dFH * cols['ug_value'] + dIg_dFH * cols['psi_value']
+        dUw_dFH = (dN_dFH - Uw * dAw_dFH) / Aw
+        no_rolo = np.full(len(Uw), np.nan)
+        dUw = {
+            'ug_value': Ag / Aw,
+            'psi_value': Ig / Aw,
+            'plaisio_width': (dN_dFW - Uw * dAw_dFW) / Aw,
+            'plaisio_height': dUw_dFH,
+            'rolo_height': np.where(has_rolo, -dUw_dFH, np.nan),
+            'ur_value': no_rolo,
+        }
+
+        # Uw_open = P / Q, differentiated through N = Uw·Aw
+        Ar = res['Ar']
+        Q = FW * FH_original / 1_000_000
+        Uw_open = (Uw * Aw + Ar * ur_value) / Q
+        dP = {
+            'ug_value': Ag,
+            'psi_value': Ig,
+            'plaisio_width': dN_dFW + rolo_height / 1_000_000 * ur_value,
+            'plaisio_height': dN_dFH,
+            'rolo_height': -dN_dFH + FW / 1_000_000 * ur_value,
+            'ur_value': Ar,
+        }
+        dQ = {'plaisio_width': FH_original / 1_000_000, 'plaisio_height': FW / 1_000_000}
+        dUw_open = {name: (dP[name] - Uw_open * dQ.get(name, 0)) / Q for name in SENSITIVITY_INPUTS}
+
+        Uw_closed = 1 / ((1 / Uw_open) + 0.15)
+        closed_factor = Uw_closed ** 2 / Uw_open ** 2
+        dUw_closed = {name: closed_factor * dUw_open[name] for name in SENSITIVITY_INPUTS}
+
+    return {
+        'Uw': dUw,
+        'Uw_open': {name: np.where(has_ur, column, np.nan) for name, column in dUw_open.items()},
+        'Uw_closed': {name: np.where(has_ur, column, np.nan) for name, column in dUw_closed.items()},
+    }
+
+
+def float_list(column, valid):
+    """Unrounded column as a list, None for invalid rows and NaN"""
+    result = np.where(valid, column, np.nan).tolist()
+    return [None if value != value else value for value in result]
+
+
+def run_sensitivity_calculation(body, catalog_version=None):
+    n, columns, invalid = parse_batch_columns(body)
+    catalog = get_catalog(catalog_version)
+    codes = batch_validation_codes(columns, invalid)
+    codes, config = gather_config_columns(catalog, columns, codes)
+    results = compute_uw_columns(config, columns)
+    codes = failed_calculation_codes(codes, results)
+    valid = codes == 0
+    sensitivities = compute_sensitivity_columns(config, columns, results)
+    errors = batch_errors(codes, valid)
+
+    return {
+        "count": n,
+        "valid": int(valid.sum()),
+        "catalog_version": catalog.version,
+        "errors": errors,
+        "results": {
+            name: rounded_list(results[name], BATCH_RESULT_DIGITS[name], valid)
+            for name in sensitivities
+        },
+        "sensitivities": {
+            output: {name: float_list(column, valid) for name, column in derivatives.items()}
+            for output, derivatives in sensitivities.items()
+        },
+    }
+
+
+@app.post("/api/calculate/sensitivity")
+async def calculate_sensitivity(request: Request, catalog_version: Optional[int] = None):
+    """Uw and its partial derivatives for many openings.
+
+    Takes the /api/calculate/batch body and ?catalog_version=. `sensitivities[output][input]` is
+    d output / d input per opening, for output Uw, Uw_open and Uw_closed and
+    input ug_value, psi_value, plaisio_width, plaisio_height (per mm),
+    rolo_height (per mm, with rolo) and ur_value (Uw_open/Uw_closed only).
+    Entries that do not apply are null.
+    """
+    try:
+        body = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Batch body must be JSON")
+    return JSONResponse(await run_in_threadpool(run_sensitivity_calculation, body, catalog_version))
+
+
+# ===================================
+# BUILDING AGGREGATION (streamed openings)
+# ===================================
+# Openings arrive as NDJSON (one /api/calculate body per line, plus optional
+# `quantity` and `facade`) and are calculated in chunks through the batch
+# path. Only running sums per group are kept, so memory does not grow with
+# the number of openings.
+
+AGGREGATE_CHUNK_ROWS = 5000
+AGGREGATE_GROUP_FIELDS = ['series_id', 'category_id', 'driver_id', 'sash_id', 'facade']
+AGGREGATE_SUMS = ['quantity', 'Aw', 'Ag', 'UwAw']
+
+
+class HeatLossAggregate:
+    """Running quantity-weighted sums (ΣAw, ΣAg, ΣUw·Aw) overall and per group"""
+
+    def __init__(self, group_by=(), catalog_version=None):
+        unknown = [field for field in group_by if field not in AGGREGATE_GROUP_FIELDS]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Cannot group by {', '.join(unknown)}; use {', '.join(AGGREGATE_GROUP_FIELDS)}",
+            )
+        self.group_by = list(group_by)
+        self.openings = 0
+        self.valid = 0
+        self.errors = {}
+        self.catalog_version = catalog_version
+        self.totals = dict.fromkeys(AGGREGATE_SUMS, 0.0)
+        self.groups = {}
+
+    def add(self, rows):
+        """Calculate a chunk of opening dicts (None for unparsable lines)"""
+        parsed = [row for row in rows if isinstance(row, dict)]
+        self.openings += len(rows)
+        if len(parsed) < len(rows):
+            self.errors['INVALID_VALUE'] = self.errors.get('INVALID_VALUE', 0) + len(rows) - len(parsed)
+        if not parsed:
+            return
+
+        n, columns, invalid = parse_batch_columns(parsed)
+        # the first chunk pins the version, so a catalog edit mid-stream
+        # does not mix two versions in one total
+        catalog = get_catalog(self.catalog_version)
+        self.catalog_version = catalog.version
+        codes = batch_validation_codes(columns, invalid)
+        codes, config = gather_config_columns(catalog, columns, codes)
+        quantity = quantity_column([row.get('quantity', 1) for row in parsed], n, invalid)
+        codes = np.where(invalid, BATCH_ERROR_CODES.index('INVALID_VALUE'), codes)
+        results = compute_uw_columns(config, columns)
+        codes = failed_calculation_codes(codes, results)
+        valid = codes == 0
+        for code, count in zip(*np.unique(codes[~valid], return_counts=True)):
+            name = BATCH_ERROR_CODES[code]
+            self.errors[name] = self.errors.get(name, 0) + int(count)
+        self.valid += int(valid.sum())
+
+        weight = np.where(valid, quantity, 0)
+        with np.errstate(invalid='ignore'):
+            sums = {
+                'quantity': weight,
+                'Aw': np.where(valid, results['Aw'] * weight, 0),
+                'Ag': np.where(valid, results['Ag'] * weight, 0),
+                'UwAw': np.where(valid, results['Uw'] * results['Aw'] * weight, 0),
+            }
+        for name, column in sums.items():
+            self.totals[name] += float(column.sum())
+
+        if not self.group_by:
+            return
+        key_columns = []
+        for field in self.group_by:
+            if field == 'facade':
+                labels = [str(row.get('facade') or '') for row in parsed]
+                key_columns.append(np.unique(labels, return_inverse=True)[1].reshape(-1))
+            else:
+                key_columns.append(columns[field])
+        first, inverse = group_rows(key_columns)
+        group_sums = {name: np.bincount(inverse, weights=column) for name, column in sums.items()}
+        group_valid = np.bincount(inverse, weights=valid)
+        for g, row in enumerate(first.tolist()):
+            if not group_valid[g]:
+                continue
+            key = tuple(
+                str(parsed[row].get('facade') or '') if field == 'facade' else int(columns[field][row])
+                for field in self.group_by
+            )
+            group = self.groups.setdefault(key, dict.fromkeys(AGGREGATE_SUMS, 0.0))
+            for name in AGGREGATE_SUMS:
+                group[name] += float(group_sums[name][g])
+
+    @staticmethod
+    def summarize(sums):
+        Aw = sums['Aw']
+        return {
+            "quantity": int(sums['quantity']),
+            "Aw": round(Aw, 4),
+            "Ag": round(sums['Ag'], 4),
+            "UwAw": round(sums['UwAw'], 4),
+            "Uw_mean": round(sums['UwAw'] / Aw, 4) if Aw else None,
+            "glazing_ratio": round(sums['Ag'] / Aw, 4) if Aw else None,
+        }
+
+    def result(self):
+        summary = {
+            "openings": self.openings,
+            "valid": self.valid,
+            "catalog_version": self.catalog_version,
+            "errors": self.errors,
+            "totals": self.summarize(self.totals),
+        }
+        if self.group_by:
+            summary["group_by"] = self.group_by
+            summary["groups"] = [
+                {"key": dict(zip(self.group_by, key)), **self.summarize(sums)}
+                for key, sums in sorted(self.groups.items(), key=lambda item: tuple(map(str, item[0])))
+            ]
+        return summary
+
+
+def parse_ndjson_line(line):
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+def aggregate_lines(lines, group_by=()):
+    """Aggregate an iterable of NDJSON lines (used by the CLI)"""
+    aggregate = HeatLossAggregate(group_by)
+    chunk = []
+    for line in lines:
+        if line.strip():
+            chunk.append(parse_ndjson_line(line))
+        if len(chunk) >= AGGREGATE_CHUNK_ROWS:
+            aggregate.add(chunk)
+            chunk = []
+    if chunk:
+        aggregate.add(chunk)
+    return aggregate.result()
+
+
+@app.post("/api/calculate/aggregate")
+async def calculate_aggregate(request: Request, group_by: Optional[str] = None, catalog_version: Optional[int] = None):
+    """Building totals for a stream of openings.
+
+    The body is NDJSON, one /api/calculate body per line with optional
+    `quantity` (default 1, at most MAX_QUANTITY) and `facade`. Returns ΣAw, ΣAg, ΣUw·Aw, the
+    area-weighted mean Uw and the glazing ratio Ag/Aw, overall and, with
+    ?group_by=series_id,facade (any of AGGREGATE_GROUP_FIELDS), per group.
+    ?catalog_version= calculates against an earlier catalog version.
+    """
+    aggregate = HeatLossAggregate(group_by.split(',') if group_by else (), catalog_version)
+    chunk = []
+    pending = b''
+    async for data in request.stream():
+        lines = (pending + data).split(b'\n')
+        pending = lines.pop()
+        chunk.extend(parse_ndjson_line(line) for line in lines if line.strip())
+        if len(chunk) >= AGGREGATE_CHUNK_ROWS:
+            await run_in_threadpool(aggregate.add, chunk)
+            chunk = []
+    if pending.strip():
+        chunk.append(parse_ndjson_line(pending))
+    if chunk:
+        await run_in_threadpool(aggregate.add, chunk)
+    return aggregate.result()
+
+
+# ===================================
+# GLASS CUTTING (pane list and sheet nesting)
+# ===================================
+# The panes of a batch of openings (num_glasses × quantity panes of GW × GH
+# per opening, in whole mm) are grouped by size and nested onto stock sheets
+# in a three-stage guillotine layout, as cut on a glass table: the sheet is
+# cut across into strips, a strip into columns and a column into panes.
+# Placement works per size group and on sorted lists of the open sheets,
+# strips and columns, so 10k+ panes nest in well under a second
+# (`python backend.py glass --bench 10000`).
+
+GLASS_SHEET_WIDTH = 6000  # mm, jumbo float sheet
+GLASS_SHEET_HEIGHT = 3210
+
+
+class GlassSheet(NamedTuple):
+    width: float
+    height: float
+    trim: float = 0  # cut off every edge of the sheet (mm)
+    gap: float = 0  # cutting allowance between panes (mm)
+    rotate: bool = True  # panes may be turned 90° (not for patterned glass)
+
+
+def glass_sheet(width, height, trim, gap, rotate):
+    sheet = GlassSheet(width, height, trim, gap, rotate)
+    if trim < 0 or gap < 0 or min(width, height) - 2 * trim <= 0:
+        raise HTTPException(status_code=400, detail="Sheet size, trim and gap do not leave room for a pane")
+    return sheet
+
+
+class GuillotineNester:
+    """Three-stage guillotine nesting of pane groups on identical sheets.
+
+    Groups are placed tallest first (the strip height is that of the pane
+    that opens it) and every pane goes where it wastes least: on top of the
+    narrowest column it fits in, as a new column in the strip with the least
+    free width, as a new strip on the sheet with the least free height, or on
+    a new sheet. Sizes include the gap, the usable area one gap more, so the
+    gap only appears between panes.
+    """
+
+    def __init__(self, width, height, min_width, min_height):
+        self.width = width
+        self.height = height
+        self.min_width = min_width  # narrowest/lowest pane of the job
+        self.min_height = min_height
+        self.sheets = []  # [free height, strip ids]
+        self.strips = []  # [sheet id, y, height, free width, column ids]
+        self.columns = []  # [strip id, x, width, free height, [(pane, rotated, count)]]
+        self.open_sheets = []  # sorted (free height, sheet id)
+        self.open_strips = []  # sorted (free width, strip id)
+        self.open_columns = []  # sorted (width, column id), room for the current height
+        self.waiting_columns = []  # heap (-free height, column id)
+
+    def place(self, pane, rotated, width, height, count):
+        # Columns with room for this height (heights only go down) become open
+        while self.waiting_columns and -self.waiting_columns[0][0] >= height:
+            column_id = heapq.heappop(self.waiting_columns)[1]
+            bisect.insort(self.open_columns, (self.columns[column_id][2], column_id))
+
+        while count:
+            i = bisect.bisect_left(self.open_columns, (width, -1))
+            if i < len(self.open_columns):
+                column_id = self.open_columns.pop(i)[1]
+                column = self.columns[column_id]
+                stacked = min(count, int(column[3] // height))
+                column[4].append((pane, rotated, stacked))
+                column[3] -= stacked * height
+                count -= stacked
+                self.close_column(column_id)
+                continue
+
+            i = bisect.bisect_left(self.open_strips, (width, -1))
+            if i < len(self.open_strips):
+                strip_id = self.open_strips.pop(i)[1]
+            else:
+                i = bisect.bisect_left(self.open_sheets, (height, -1))
+                if i < len(self.open_sheets):
+                    sheet_id = self.open_sheets.pop(i)[1]
+                else:
+                    sheet_id = len(self.sheets)
+                    self.sheets.append([self.height, []])
+                sheet = self.sheets[sheet_id]
+                strip_id = len(self.strips)
+                self.strips.append([sheet_id, self.height - sheet[0], height, self.width, []])
+                sheet[0] -= height
+                sheet[1].append(strip_id)
+                if sheet[0] >= self.min_height:
+                    bisect.insort(self.open_sheets, (sheet[0], sheet_id))
+            count = self.fill_strip(strip_id, pane, rotated, width, height, count)
+
+    def fill_strip(self, strip_id, pane, rotated, width, height, count):
+        """New columns of this pane across the strip; returns the panes left"""
+        strip = self.strips[strip_id]
+        per_column = int(strip[2] // height)
+        while count and strip[3] >= width:
+            stacked = min(count, per_column)
+            column_id = len(self.columns)
+            self.columns.append([strip_id, self.width - strip[3], width, strip[2] - stacked * height, [(pane, rotated, stacked)]])
+            strip[4].append(column_id)
+            strip[3] -= width
+            count -= stacked
+            self.close_column(column_id)
+        if strip[3] >= self.min_width:
+            bisect.insort(self.open_strips, (strip[3], strip_id))
+        return count
+
+    def close_column(self, column_id):
+        free = self.columns[column_id][3]
+        if free >= self.min_height:
+            heapq.heappush(self.waiting_columns, (-free, column_id))
+
+
+def nest_panes(panes, sheet):
+    """Nest `panes` ([width, height, count] per size) on `sheet`.
+
+    Returns (layouts, oversize): identical sheets share one layout
+    {"sheets": n, "pieces": [[pane, x, y, width, height, rotated], ...]} (pane
+    indexes `panes`, x/y from the sheet corner), oversize lists the panes
+    that fit no sheet.
+    """
+    gap = sheet.gap
+    width = sheet.width - 2 * sheet.trim + gap
+    height = sheet.height - 2 * sheet.trim + gap
+    items = []
+    oversize = []
+    for pane, (pane_width, pane_height, count) in enumerate(panes):
+        orientations = [(pane_width + gap, pane_height + gap, False)]
+        if sheet.rotate and pane_width != pane_height:
+            orientations.append((pane_height + gap, pane_width + gap, True))
+        fitting = [size for size in orientations if size[0] <= width and size[1] <= height]
+        if not fitting:
+            oversize.append(pane)
+            continue
+        # Lying down makes the lowest strip
+        item_width, item_height, rotated = min(fitting, key=lambda size: (size[1], -size[0]))
+        items.append((item_height, item_width, pane, rotated, count))
+    if not items:
+        return [], oversize
+    items.sort(key=lambda item: (-item[0], -item[1], item[2]))
+
+    nester = GuillotineNester(width, height, min(item[1] for item in items), min(item[0] for item in items))
+    for item_height, item_width, pane, rotated, count in items:
+        nester.place(pane, rotated, item_width, item_height, count)
+
+    layouts = {}
+    for sheet_strips in (strips for _, strips in nester.sheets):
+        pieces = []
+        for strip_id in sheet_strips:
+            _, y, _, _, column_ids = nester.strips[strip_id]
+            for column_id in column_ids:
+                _, x, _, _, stacks = nester.columns[column_id]
+                offset = y
+                for pane, rotated, count in stacks:
+                    pane_width, pane_height = panes[pane][:2]
+                    if rotated:
+                        pane_width, pane_height = pane_height, pane_width
+                    for _ in range(count):
+                        pieces.append((pane, x + sheet.trim, offset + sheet.trim, pane_width, pane_height, rotated))
+                        offset += pane_height + gap
+        key = tuple(pieces)
+        layouts[key] = layouts.get(key, 0) + 1
+    return [{"sheets": count, "pieces": [list(piece) for piece in pieces]} for pieces, count in layouts.items()], oversize
+
+
+def batch_values(body, n, field, default=None):
+    """Values of a field parse_batch_columns() does not read, one per opening"""
+    if isinstance(body, list):
+        return [row.get(field, default) if isinstance(row, dict) else None for row in body]
+    values = body.get(field, default)
+    return values if isinstance(values, list) else [values] * n
+
+
+def batch_quantities(body, n):
+    """`quantity` of every opening of a batch body (default 1)"""
+    return batch_values(body, n, 'quantity', 1)
+
+
+def glass_panes(body, catalog_version=None):
+    """Calculate a batch body (/api/calculate/batch, with optional `quantity`
+    per opening) and group its panes. Returns (summary, panes) with panes
+    [width, height, count] per distinct size, largest first."""
+    n, columns, invalid = parse_batch_columns(body)
+    quantity = quantity_column(batch_quantities(body, n), n, invalid)
+
+    catalog = get_catalog(catalog_version)
+    codes = batch_validation_codes(columns, invalid)
+    codes, config = gather_config_columns(catalog, columns, codes)
+    results = compute_uw_columns(config, columns)
+    codes = failed_calculation_codes(codes, results)
+
+    # Panes are ordered in whole mm
+    with np.errstate(invalid='ignore'):
+        pane_width = np.round(results['GW'])
+        pane_height = np.round(results['GH'])
+        unusable = (codes == 0) & ~((pane_width > 0) & (pane_height > 0))
+    codes = np.where(unusable, BATCH_ERROR_CODES.index('NO_GLASS_AREA'), codes)
+    valid = codes == 0
+    pane_width = pane_width[valid].astype(np.int64)
+    pane_height = pane_height[valid].astype(np.int64)
+    count = (quantity * config['num_glasses'])[valid].astype(np.int64)
+    summary = {
+        "count": n,
+        "valid": int(valid.sum()),
+        "catalog_version": catalog.version,
+        "errors": batch_errors(codes, valid),
+    }
+    if not len(count):
+        return summary, []
+
+    first, inverse = group_rows([pane_width, pane_height])
+    counts = np.bincount(inverse, weights=count).astype(np.int64)
+    panes = [
+        [width, height, quantity]
+        for width, height, quantity in zip(pane_width[first].tolist(), pane_height[first].tolist(), counts.tolist())
+    ]
+    panes.sort(key=lambda pane: (-pane[0] * pane[1], -pane[0], -pane[1]))
+    return summary, panes
+
+
+def glass_cutting_plan(body, sheet, catalog_version=None):
+    summary, panes = glass_panes(body, catalog_version)
+    layouts, oversize = nest_panes(panes, sheet)
+
+    sheets = sum(layout["sheets"] for layout in layouts)
+    oversize_panes = set(oversize)
+    nested = [pane for i, pane in enumerate(panes) if i not in oversize_panes]
+    pane_area = sum(width * height * count for width, height, count in nested) / 1_000_000
+    sheet_area = sheet.width * sheet.height / 1_000_000
+    usable_area = (sheet.width - 2 * sheet.trim) * (sheet.height - 2 * sheet.trim) / 1_000_000
+    for layout in layouts:
+        used = sum(piece[3] * piece[4] for piece in layout["pieces"]) / 1_000_000
+        layout["waste_percent"] = round(100 * (1 - used / sheet_area), 2)
+
+    return {
+        **summary,
+        "sheet": sheet._asdict(),
+        "panes": [{"width": width, "height": height, "quantity": count} for width, height, count in panes],
+        "pane_count": sum(count for _, _, count in nested),
+        "pane_area": round(pane_area, 4),
+        "oversize": [{"pane": i, "quantity": panes[i][2]} for i in oversize],
+        "sheets": sheets,
+        # no layout can use fewer sheets than the pane area needs
+        "min_sheets": math.ceil(round(pane_area / usable_area, 9)),
+        "waste_percent": round(100 * (1 - pane_area / (sheets * sheet_area)), 2) if sheets else None,
+        "layouts": layouts,
+    }
+
+
+@app.post("/api/calculate/glass")
+async def calculate_glass(
+    request: Request,
+    sheet_width: float = GLASS_SHEET_WIDTH,
+    sheet_height: float = GLASS_SHEET_HEIGHT,
+    trim: float = 0,
+    gap: float = 0,
+    rotate: bool = True,
+    catalog_version: Optional[int] = None,
+):
+    """Glass order and cutting layouts for many openings.
+
+    Takes the /api/calculate/batch body (an opening may carry `quantity`,
+    1 to MAX_QUANTITY). Openings the formulas leave no glass for are listed
+    in `errors` as NO_GLASS_AREA. Returns the distinct pane sizes with their quantities and the sheets
+    they nest on: `layouts` are the distinct cutting patterns, each with the
+    number of sheets cut that way and its pieces [pane, x, y, width, height,
+    rotated] in mm from the sheet corner, plus the waste overall and per
+    pattern. Sheet size, edge `trim`, the `gap` between panes and whether
+    panes may be rotated are query parameters.
+    """
+    sheet = glass_sheet(sheet_width, sheet_height, trim, gap, rotate)
+    try:
+        body = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Batch body must be JSON")
+    return JSONResponse(await run_in_threadpool(glass_cutting_plan, body, sheet, catalog_version))
+
+
+def benchmark_openings(count):
+    """`count` random openings over the configurations of the current
+    catalog, sized in 10 mm steps as from a facade schedule"""
+    catalog = get_catalog()
+    keys = [
+        ConfigKey(series_id, category_id, driver_id, sash_id)
+        for series_id, configurations in catalog_configurations(catalog).items()
+        for (category_id, sash_id), driver_ids in configurations.items()
+        for driver_id in driver_ids
+    ]
+    random = Random(0)
+    return [
+        {
+            **random.choice(keys)._asdict(),
+            "plaisio_width": random.randrange(800, 3000, 10),
+            "plaisio_height": random.randrange(900, 2500, 10),
+            "ug_value": 1.1,
+            "psi_value": 0.08,
+            "quantity": random.choice((1, 1, 1, 2, 4)),
+        }
+        for _ in range(count)
+    ]
+
+
+def benchmark_glass_nesting(count, sheet):
+    """Nest `count` benchmark_openings() and print the time and yield"""
+    rows = benchmark_openings(count)
+    start = time.perf_counter()
+    summary, panes = glass_panes(rows)
+    calculated = time.perf_counter()
+    layouts, oversize = nest_panes(panes, sheet)
+    nested = time.perf_counter()
+
+    plan = glass_cutting_plan(rows, sheet)
+    print(
+        f"{count} openings, {plan['pane_count']} panes in {len(panes)} sizes: "
+        f"calculation {calculated - start:.3f} s, nesting {nested - calculated:.3f} s"
+    )
+    print(
+        f"{plan['sheets']} sheets of {sheet.width:g}x{sheet.height:g} (at least {plan['min_sheets']}), "
+        f"{len(layouts)} patterns, yield {100 - plan['waste_percent']:.2f}%"
+    )
+
+
+# ===================================
+# PROFILE CUTTING (bar cutting lists)
+# ===================================
+# Profile lengths per opening, from the frame size and the series geometry,
+# in whole mm with mitred ends (outer dimensions):
+#   frame (the driver profile, κάσα/οδηγός): 2 × FW and 2 × FH'
+#   sash (the sash profile), per leaf: 2 × (GW + 2b) and 2 × (FH' - 2(a - x))
+# with FH' the height left by the rolo and b after the sash override: the
+# sash lies a - x in from the frame edge and its face b frames the glass.
+# The pieces of every profile are cut from stock bars by best-fit
+# decreasing over the sorted free lengths, then the emptiest bars are
+# dissolved into the others where they fit.
+
+PROFILE_BAR_LENGTH = 6500  # mm, aluminium stock bar
+PROFILE_SAW_KERF = 4
+
+
+class ProfileBar(NamedTuple):
+    length: float
+    kerf: float = PROFILE_SAW_KERF  # blade width lost per cut (mm)
+    trim: float = 0  # cut off each end of the bar (mm)
+
+
+def profile_bar(length, kerf, trim):
+    bar = ProfileBar(length, kerf, trim)
+    if kerf < 0 or trim < 0 or length - 2 * trim <= 0:
+        raise HTTPException(status_code=400, detail="Bar length, kerf and trim do not leave room for a cut")
+    return bar
+
+
+def cut_bars(pieces, bar):
+    """Cut `pieces` ([length, count], whole mm) from stock bars.
+
+    Returns (patterns, oversize): identical bars share one pattern
+    {"bars": n, "cuts": [piece index, ...], "offcut": mm}, oversize lists the
+    pieces longer than a bar. As with the glass gap, every cut takes its
+    length plus the kerf from a bar one kerf longer.
+    """
+    capacity = bar.length - 2 * bar.trim + bar.kerf
+    order = sorted(range(len(pieces)), key=lambda piece: -pieces[piece][0])
+    oversize = [piece for piece in order if pieces[piece][0] + bar.kerf > capacity]
+    order = [piece for piece in order if pieces[piece][0] + bar.kerf <= capacity]
+    if not order:
+        return [], oversize
+    shortest = pieces[order[-1]][0] + bar.kerf
+
+    bars = []  # [free length, {piece: cuts}]
+    open_bars = []  # sorted (free length, bar id)
+    for piece in order:
+        need = pieces[piece][0] + bar.kerf
+        count = pieces[piece][1]
+        while count:
+            i = bisect.bisect_left(open_bars, (need, -1))
+            if i < len(open_bars):
+                bar_id = open_bars.pop(i)[1]
+            else:
+                bar_id = len(bars)
+                bars.append([capacity, {}])
+            cuts = min(count, int(bars[bar_id][0] // need))
+            bars[bar_id][0] -= cuts * need
+            bars[bar_id][1][piece] = bars[bar_id][1].get(piece, 0) + cuts
+            count -= cuts
+            if bars[bar_id][0] >= shortest:
+                bisect.insort(open_bars, (bars[bar_id][0], bar_id))
+
+    # Local improvement: empty the least used bars into the free length of
+    # the bars with room left (open_bars), best fit, as long as every cut of
+    # the bar finds a place. open_bars and its total are updated in place: a
+    # trial takes the bar's own entry out and is undone if a cut does not fit.
+    open_free = sum(length for length, _ in open_bars)
+    for bar_id in sorted(range(len(bars)), key=lambda bar_id: -bars[bar_id][0]):
+        free, cuts = bars[bar_id]
+        own = bisect.bisect_left(open_bars, (free, bar_id))
+        is_open = own < len(open_bars) and open_bars[own] == (free, bar_id)
+        if is_open:
+            open_bars.pop(own)
+            open_free -= free
+        if capacity - free > open_free:
+            if is_open:
+                open_bars.insert(own, (free, bar_id))
+            break
+        moves = []  # (target, piece, cuts, free length before)
+        count = 0
+        for piece in sorted(cuts, key=lambda piece: -pieces[piece][0]):
+            need = pieces[piece][0] + bar.kerf
+            count = cuts[piece]
+            while count:
+                i = bisect.bisect_left(open_bars, (need, -1))
+                if i == len(open_bars):
+                    break
+                length, target = open_bars.pop(i)
+                moved = min(count, int(length // need))
+                bisect.insort(open_bars, (length - moved * need, target))
+                moves.append((target, piece, moved, length))
+                count -= moved
+            if count:
+                break
+        if count:
+            for target, piece, moved, length in reversed(moves):
+                open_bars.pop(bisect.bisect_left(open_bars, (length - moved * (pieces[piece][0] + bar.kerf), target)))
+                bisect.insort(open_bars, (length, target))
+            if is_open:
+                open_bars.insert(own, (free, bar_id))
+                open_free += free
+            continue
+        for target, piece, moved, _ in moves:
+            bars[target][0] -= moved * (pieces[piece][0] + bar.kerf)
+            bars[target][1][piece] = bars[target][1].get(piece, 0) + moved
+        open_free -= capacity - free
+        bars[bar_id] = [capacity, {}]
+        for target in {target for target, _, _, _ in moves}:
+            if bars[target][0] < shortest:
+                open_bars.pop(bisect.bisect_left(open_bars, (bars[target][0], target)))
+                open_free -= bars[target][0]
+
+    patterns = {}
+    for length, cuts in bars:
+        if cuts:
+            key = (tuple(sorted(cuts.items(), key=lambda cut: (-pieces[cut[0]][0], cut[0]))), length)
+            patterns[key] = patterns.get(key, 0) + 1
+    patterns = [
+        {"bars": count, "cuts": [piece for piece, cuts in cuts for _ in range(cuts)], "offcut": round(max(length - bar.kerf, 0), 1)}
+        for (cuts, length), count in patterns.items()
+    ]
+    patterns.sort(key=lambda pattern: pattern["offcut"])
+    return patterns, oversize
+
+
+def profile_pieces(body, catalog_version=None):
+    """Calculate a batch body (with optional `quantity` per opening) and list
+    the profile lengths. Returns (summary, catalog, {(profile, id): {length:
+    count}}) with profile 'frame' (by driver) or 'sash' (by sash)."""
+    n, columns, invalid = parse_batch_columns(body)
+    quantity = quantity_column(batch_quantities(body, n), n, invalid)
+
+    catalog = get_catalog(catalog_version)
+    codes = batch_validation_codes(columns, invalid)
+    codes, config = gather_config_columns(catalog, columns, codes)
+    results = compute_uw_columns(config, columns)
+    codes = failed_calculation_codes(codes, results)
+
+    # Pieces are cut in whole mm
+    with np.errstate(invalid='ignore'):
+        has_rolo = columns['has_rolo'] & truthy(columns['rolo_height'])
+        FH = np.where(has_rolo, columns['plaisio_height'] - columns['rolo_height'], columns['plaisio_height'])
+        leaves = config['num_glasses']
+        lengths = [
+            ('frame', 'driver_id', np.round(columns['plaisio_width']), 2),
+            ('frame', 'driver_id', np.round(FH), 2),
+            ('sash', 'sash_id', np.round(results['GW'] + 2 * config['b']), 2 * leaves),
+            ('sash', 'sash_id', np.round(FH - 2 * (config['a'] - config['x'])), 2 * leaves),
+        ]
+        too_short = (codes == 0) & ~np.logical_and.reduce([length > 0 for _, _, length, _ in lengths])
+    codes = np.where(too_short, BATCH_ERROR_CODES.index('PROFILE_TOO_SHORT'), codes)
+    valid = codes == 0
+
+    summary = {
+        "count": n,
+        "valid": int(valid.sum()),
+        "catalog_version": catalog.version,
+        "errors": batch_errors(codes, valid),
+    }
+    profiles = {}
+    for profile, field, length, per_opening in lengths:
+        length = length[valid].astype(np.int64)
+        count = (quantity * per_opening)[valid].astype(np.int64)
+        ids = columns[field][valid]
+        first, inverse = group_rows([ids, length])
+        counts = np.bincount(inverse, weights=count).astype(np.int64)
+        for profile_id, piece_length, piece_count in zip(ids[first].tolist(), length[first].tolist(), counts.tolist()):
+            pieces = profiles.setdefault((profile, profile_id), {})
+            pieces[piece_length] = pieces.get(piece_length, 0) + piece_count
+    return summary, catalog, profiles
+
+
+def profile_cutting_plan(body, bar, catalog_version=None):
+    summary, catalog, profiles = profile_pieces(body, catalog_version)
+    records = {'frame': catalog.drivers, 'sash': catalog.sashes}
+    capacity = bar.length - 2 * bar.trim + bar.kerf
+
+    plans = []
+    for (profile, profile_id), lengths in sorted(profiles.items()):
+        pieces = sorted(lengths.items(), reverse=True)
+        patterns, oversize = cut_bars(pieces, bar)
+        record = records[profile][profile_id]
+        bars = sum(pattern["bars"] for pattern in patterns)
+        cut = [piece for i, piece in enumerate(pieces) if i not in oversize]
+        cut_length = sum(length * count for length, count in cut)
+        plans.append({
+            "profile": profile,
+            "id": profile_id,
+            "name": record.name,
+            "series_id": record.series_id,
+            "pieces": [{"length": length, "quantity": count} for length, count in pieces],
+            "piece_count": sum(count for _, count in cut),
+            "piece_length": round(cut_length / 1000, 3),
+            "oversize": [{"piece": i, "quantity": pieces[i][1]} for i in oversize],
+            "bars": bars,
+            # no plan can use fewer bars than the cuts (with kerf) need
+            "min_bars": math.ceil(sum((length + bar.kerf) * count for length, count in cut) / capacity),
+            "waste_percent": round(100 * (1 - cut_length / (bars * bar.length)), 2) if bars else None,
+            "patterns": patterns,
+        })
+
+    bars = sum(plan["bars"] for plan in plans)
+    cut_length = sum(plan["piece_length"] for plan in plans) * 1000
+    return {
+        **summary,
+        "bar": bar._asdict(),
+        "bars": bars,
+        "waste_percent": round(100 * (1 - cut_length / (bars * bar.length)), 2) if bars else None,
+        "profiles": plans,
+    }
+
+
+@app.post("/api/calculate/profiles")
+async def calculate_profiles(
+    request: Request,
+    bar_length: float = PROFILE_BAR_LENGTH,
+    kerf: float = PROFILE_SAW_KERF,
+    trim: float = 0,
+    catalog_version: Optional[int] = None,
+):
+    """Profile cutting list for many openings.
+
+    Takes the /api/calculate/batch body (an opening may carry `quantity`,
+    1 to MAX_QUANTITY). Openings too small for their profiles are listed in
+    `errors` as PROFILE_TOO_SHORT. For every frame (driver) and sash profile: the cut lengths with their
+    quantities and the bars they are cut from, as distinct `patterns` with
+    the number of bars cut that way, the cuts (indexes into `pieces`) and the
+    offcut left, plus the waste. Bar length, saw `kerf` and end `trim` are
+    query parameters.
+    """
+    bar = profile_bar(bar_length, kerf, trim)
+    try:
+        body = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Batch body must be JSON")
+    return JSONResponse(await run_in_threadpool(profile_cutting_plan, body, bar, catalog_version))
+
+
+def benchmark_profile_cutting(count, bar):
+    """Cut the profiles of `count` benchmark_openings() and print the time
+    and yield"""
+    rows = benchmark_openings(count)
+    start = time.perf_counter()
+    summary, catalog, profiles = profile_pieces(rows)
+    listed = time.perf_counter()
+    for lengths in profiles.values():
+        cut_bars(sorted(lengths.items(), reverse=True), bar)
+    cut = time.perf_counter()
+
+    plan = profile_cutting_plan(rows, bar)
+    pieces = sum(profile["piece_count"] for profile in plan["profiles"])
+    print(
+        f"{count} openings, {pieces} cuts on {len(profiles)} profiles: "
+        f"cut list {listed - start:.3f} s, bar cutting {cut - listed:.3f} s"
+    )
+    min_bars = sum(profile["min_bars"] for profile in plan["profiles"])
+    print(
+        f"{plan['bars']} bars of {bar.length:g} mm (at least {min_bars}), "
+        f"yield {100 - plan['waste_percent']:.2f}%"
+    )
+
+
+# ===================================
+# COMPLIANCE SCREENING (KENAK Uw limits)
+# ===================================
+# Openings are checked against the maximum Uw of their climate zone and
+# building use (the uw_limits table of the catalog, edited in the admin).
+# The value checked is Uw_closed for an opening with a rolo and Uw
+# otherwise, at the reported precision (4 decimals). A failing opening gets
+# the cheapest alternative that passes. The catalog has no prices, so the
+# cost of an alternative is the size of the change, cheapest first:
+#   1. the same configuration with a warmer spacer (lower Psi) and/or
+#      better glass (COMPLIANCE_UG_STEPS), fewer glass steps first
+#   2. another driver/sash of the same series, then with those upgrades
+#   3. another series offering the category, then with those upgrades
+# and the lowest Uw among alternatives of the same cost. Each cost step is
+# calculated for every opening still without an alternative in one
+# compute_uw_columns() call.
+
+# Ug of common insulating glass units (double, low-e, argon, triple), W/m²K
+COMPLIANCE_UG_STEPS = (2.8, 1.6, 1.4, 1.1, 1.0, 0.9, 0.7, 0.6, 0.5)
+COMPLIANCE_BUILDING_USE = 'residential'
+
+# Kinds of configuration change, cheapest first
+COMPLIANCE_CHANGES = ['glazing', 'driver_sash', 'series']
+
+
+def checked_uw(results):
+    """Uw_closed where the opening has a rolo, else Uw (rounded as reported)"""
+    return np.round(np.where(np.isnan(results['Uw_closed']), results['Uw'], results['Uw_closed']), 4)
+
+
+def compliance_limits(body, n, catalog, climate_zone, building_use):
+    """max_uw of every opening (NaN without a limit); an opening may carry
+    its own `climate_zone` and `building_use`"""
+    zones = batch_values(body, n, 'climate_zone', climate_zone)
+    uses = batch_values(body, n, 'building_use', building_use)
+    limits = catalog.uw_limits
+    return np.array([
+        limits.get((zone, use), np.nan) if isinstance(zone, str) and isinstance(use, str) else np.nan
+        for zone, use in zip(zones, uses)
+    ], dtype=float)
+
+
+def category_configurations(catalog):
+    """{category_id: array of ConfigKey rows} the catalog can calculate"""
+    compiled = compiled_catalog(catalog)
+    if compiled is not None:
+        keys = [tuple(int(value) for value in key) for key in compiled.rows]
+    else:
+        keys = [
+            (series_id, category_id, driver_id, sash_id)
+            for series_id, configurations in catalog_configurations(catalog).items()
+            for (category_id, sash_id), driver_ids in configurations.items()
+            for driver_id in driver_ids
+        ]
+    by_category = {}
+    for key in keys:
+        by_category.setdefault(key[1], []).append(key)
+    return {category_id: np.array(keys, dtype=np.int64) for category_id, keys in by_category.items()}
+
+
+def alternative_candidates(columns, rows, configurations, change):
+    """(row, ConfigKey) pairs of the configurations `change` allows for `rows`"""
+    key_columns = [columns[field][rows] for field in ConfigKey._fields]
+    if change == 0:
+        return rows, np.stack(key_columns, axis=1)
+    pair_rows, pair_keys = [], []
+    categories = key_columns[1]
+    for category_id in np.unique(categories).tolist():
+        keys = configurations.get(category_id)
+        if keys is None:
+            continue
+        in_category = np.flatnonzero(categories == category_id)
+        same_series = keys[None, :, 0] == key_columns[0][in_category, None]
+        if change == 1:
+            own = same_series
+            for j in range(2, len(ConfigKey._fields)):
+                own = own & (keys[None, :, j] == key_columns[j][in_category, None])
+            allowed = same_series & ~own
+        else:
+            allowed = ~same_series
+        row_index, key_index = np.nonzero(allowed)
+        pair_rows.append(rows[in_category[row_index]])
+        pair_keys.append(keys[key_index])
+    if not pair_rows:
+        return rows[:0], np.zeros((0, len(ConfigKey._fields)), dtype=np.int64)
+    return np.concatenate(pair_rows), np.concatenate(pair_keys)
+
+
+def candidate_uw(catalog, columns, rows, keys, ug_value, psi_value):
+    """Checked Uw of `rows` calculated with other keys, Ug and Psi (NaN where
+    the configuration does not resolve)"""
+    candidates = {field: column[rows] for field, column in columns.items()}
+    for j, field in enumerate(ConfigKey._fields):
+        candidates[field] = keys[:, j]
+    candidates['ug_value'] = ug_value
+    candidates['psi_value'] = psi_value
+    codes, config = gather_config_columns(catalog, candidates, np.zeros(len(rows), dtype=np.int64))
+    return np.where(codes == 0, checked_uw(compute_uw_columns(config, candidates)), np.nan)
+
+
+def compliance_alternatives(catalog, columns, failing, limits):
+    """Cheapest passing alternative of the `failing` rows, as {row: (ConfigKey,
+    ug_value, psi_value, change, checked Uw)}; rows without one are missing"""
+    configurations = category_configurations(catalog)
+    ug_steps = np.array(COMPLIANCE_UG_STEPS)
+    psi_steps = np.array(sorted(PSI_VALUES, reverse=True))
+    # Index of the first step below the opening's own value
+    first_ug = np.searchsorted(-ug_steps, -columns['ug_value'], side='right')
+    first_psi = np.searchsorted(-psi_steps, -columns['psi_value'], side='right')
+
+    def step_values(steps, first, own, rows, step):
+        if not step:
+            return own[rows]
+        return steps[np.minimum(first[rows] + step - 1, len(steps) - 1)]
+
+    found = {}
+    pending = failing
+    for change in range(len(COMPLIANCE_CHANGES)):
+        rows, keys = alternative_candidates(columns, pending, configurations, change)
+        # Uw falls with Ug and Psi: drop the configurations that fail even
+        # with the best glazing
+        with np.errstate(invalid='ignore'):
+            viable = candidate_uw(
+                catalog, columns, rows, keys,
+                np.minimum(columns['ug_value'][rows], ug_steps[-1]),
+                np.minimum(columns['psi_value'][rows], psi_steps[-1]),
+            ) <= limits[rows]
+        rows, keys = rows[viable], keys[viable]
+
+        for ug_step, psi_step in itertools.product(range(len(ug_steps) + 1), range(len(psi_steps))):
+            if change == ug_step == psi_step == 0:
+                continue
+            select = np.flatnonzero(
+                np.isin(rows, pending)
+                & (first_ug[rows] + ug_step - 1 < len(ug_steps))
+                & (first_psi[rows] + psi_step - 1 < len(psi_steps))
+            )
+            if not len(select):
+                continue
+            step_rows, step_keys = rows[select], keys[select]
+            ug_value = step_values(ug_steps, first_ug, columns['ug_value'], step_rows, ug_step)
+            psi_value = step_values(psi_steps, first_psi, columns['psi_value'], step_rows, psi_step)
+            uw = candidate_uw(catalog, columns, step_rows, step_keys, ug_value, psi_value)
+            with np.errstate(invalid='ignore'):
+                passing = np.flatnonzero(uw <= limits[step_rows])
+            if not len(passing):
+                continue
+
+            # Lowest Uw of each row
+            passing = passing[np.lexsort((uw[passing], step_rows[passing]))]
+            _, first = np.unique(step_rows[passing], return_index=True)
+            for i in passing[first].tolist():
+                found[int(step_rows[i])] = (
+                    ConfigKey(*step_keys[i].tolist()),
+                    float(ug_value[i]),
+                    float(psi_value[i]),
+                    COMPLIANCE_CHANGES[change],
+                    float(uw[i]),
+                )
+            pending = pending[~np.isin(pending, step_rows[passing])]
+            if not len(pending):
+                return found
+    return found
+
+
+def alternative_dict(columns, row, limit, alternative):
+    key, ug_value, psi_value, change, uw = alternative
+    values = {**key._asdict(), "ug_value": ug_value, "psi_value": psi_value}
+    return {
+        **values,
+        "change": change,
+        "changed": [field for field, value in values.items() if value != columns[field][row]],
+        "Uw": uw,
+        "margin": round(limit - uw, 4),
+    }
+
+
+def run_compliance_screening(body, climate_zone=None, building_use=COMPLIANCE_BUILDING_USE,
+                             alternatives=True, catalog_version=None):
+    n, columns, invalid = parse_batch_columns(body)
+    catalog = get_catalog(catalog_version)
+    codes = batch_validation_codes(columns, invalid)
+    codes, config = gather_config_columns(catalog, columns, codes)
+    limits = compliance_limits(body, n, catalog, climate_zone, building_use)
+    codes = np.where((codes == 0) & np.isnan(limits), BATCH_ERROR_CODES.index('LIMIT_NOT_FOUND'), codes)
+    results = compute_uw_columns(config, columns)
+    codes = failed_calculation_codes(codes, results)
+    valid = codes == 0
+
+    uw = checked_uw(results)
+    with np.errstate(invalid='ignore'):
+        passed = valid & (uw <= limits)
+    failing = np.flatnonzero(valid & ~passed)
+    found = compliance_alternatives(catalog, columns, failing, limits) if alternatives and len(failing) else {}
+
+    return {
+        "count": n,
+        "valid": int(valid.sum()),
+        "passed": int(passed.sum()),
+        "failed": len(failing),
+        "catalog_version": catalog.version,
+        "errors": batch_errors(codes, valid),
+        "results": {
+            "Uw": rounded_list(results['Uw'], 4, valid),
+            "Uw_closed": rounded_list(results['Uw_closed'], 4, valid),
+            "max_uw": rounded_list(limits, 4, valid),
+            "pass": [bool(value) if ok else None for value, ok in zip(passed.tolist(), valid.tolist())],
+            "margin": rounded_list(limits - uw, 4, valid),
+        },
+        "alternatives": [
+            {
+                "index": row,
+                "alternative": alternative_dict(columns, row, limits[row], found[row]) if row in found else None,
+            }
+            for row in failing.tolist()
+        ] if alternatives else None,
+    }
+
+
+@app.post("/api/calculate/compliance")
+async def calculate_compliance(
+    request: Request,
+    climate_zone: Optional[str] = None,
+    building_use: str = COMPLIANCE_BUILDING_USE,
+    alternatives: bool = True,
+    catalog_version: Optional[int] = None,
+):
+    """Screen many openings against the Uw limits (KENAK).
+
+    Takes the /api/calculate/batch body; an opening may carry its own
+    `climate_zone` and `building_use`, else the query parameters apply
+    (openings without a known limit are errors). `results` holds Uw,
+    Uw_closed, the limit `max_uw`, `pass` and the `margin` (limit minus the
+    checked Uw, negative when failing) per opening. `alternatives` lists the
+    cheapest passing change of every failing opening: its configuration,
+    ug_value and psi_value, the kind of `change` and the fields `changed`,
+    or null when nothing in the catalog passes.
+    """
+    try:
+        body = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Batch body must be JSON")
+    return JSONResponse(await run_in_threadpool(
+        run_compliance_screening, body, climate_zone, building_use, alternatives, catalog_version,
+    ))
+
+
+def benchmark_compliance(count, climate_zone, building_use):
+    """Screen `count` benchmark_openings() and print the time and results"""
+    rows = benchmark_openings(count)
+    start = time.perf_counter()
+    result = run_compliance_screening(rows, climate_zone, building_use, alternatives=False)
+    screened = time.perf_counter()
+    result = run_compliance_screening(rows, climate_zone, building_use)
+    done = time.perf_counter()
+    found = sum(entry["alternative"] is not None for entry in result["alternatives"])
+    print(
+        f"{count} openings against zone {climate_zone} ({building_use}): "
+        f"screening {screened - start:.3f} s, with alternatives {done - screened:.3f} s"
+    )
+    print(f"{result['passed']} pass, {result['failed']} fail, {found} with a passing alternative")
+
+
+# ===================================
+# STATIC UW TABLES (precomputed for the CDN / offline use)
+# ===================================
+# `python backend.py tables` writes the rounded Uw of every valid
+# configuration over a grid of standard sizes, Ug and Psi values to
+# public/uw-tables: one content-hashed file per series plus manifest.json.
+# The Vite build ships them, the service worker precaches them and the
+# frontend answers on-grid openings from them when the API is unreachable.
+# `tables --check` recomputes every cell through compute_uw().
+
+UW_TABLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'public', 'uw-tables')
+UW_TABLE_FORMAT = 1
+# Uw is stored as round(Uw, 4) * UW_TABLE_SCALE (an integer)
+UW_TABLE_SCALE = 10_000
+# Cell index = ((width * len(heights) + height) * len(ug) + ug) * len(psi) + psi
+UW_TABLE_AXES = {
+    'plaisio_width': [600, 800, 1000, 1200, 1400, 1600, 1800, 2000, 2200, 2400, 2600, 2800, 3000],
+    'plaisio_height': [600, 800, 1000, 1200, 1400, 1600, 1800, 2000, 2200, 2400, 2600, 2800],
+    'ug_value': [0.5, 0.6, 0.7, 0.8, 0.9, 1.0, 1.1, 1.2, 1.4, 1.6],
+    'psi_value': list(PSI_VALUES),
+}
+
+
+def catalog_configurations(catalog):
+    """{series_id: {(category_id, sash_id): [driver_id, ...]}} of every
+    configuration the calculator offers and the catalog can resolve"""
+    driver_rows = sorted(
+        (catalog.drivers[link.driver_id].series_id, link.category_id, link.driver_id)
+        for link in catalog.driver_categories.values()
+        if link.driver_id in catalog.drivers
+    )
+
+    configurations = {}
+    for series_id, category_id, driver_id in driver_rows:
+        for sash in catalog.sashes.values():
+            if sash.series_id != series_id:
+                continue
+            try:
+                resolve_calculation(catalog, ConfigKey(series_id, category_id, driver_id, sash.id))
+            except HTTPException:
+                continue
+            drivers = configurations.setdefault(series_id, {}).setdefault((category_id, sash.id), [])
+            drivers.append(driver_id)
+    return configurations
+
+
+def uw_table_grid():
+    """Request columns for every cell of the grid, without rolo"""
+    grid = np.meshgrid(*[np.array(values, dtype=float) for values in UW_TABLE_AXES.values()], indexing='ij')
+    n = grid[0].size
+    columns = {axis: values.reshape(-1) for axis, values in zip(UW_TABLE_AXES, grid)}
+    columns['has_rolo'] = np.zeros(n, dtype=bool)
+    columns['rolo_height'] = np.full(n, np.nan)
+    columns['ur_value'] = np.full(n, np.nan)
+    return n, columns
+
+
+def uw_table_column(catalog, n, grid, key, is_narrow):
+    columns = dict(grid, is_narrow=np.full(n, is_narrow))
+    for field, value in key._asdict().items():
+        columns[field] = np.full(n, value, dtype=np.int64)
+    codes, config = gather_config_columns(catalog, columns, np.zeros(n, dtype=np.int64))
+    uw = rounded_list(compute_uw_columns(config, columns)['Uw'], 4, codes == 0)
+    if None in uw:
+        return None
+    return [round(value * UW_TABLE_SCALE) for value in uw]
+
+
+def build_uw_tables(catalog):
+    """{series_id: file content} for every series with valid configurations.
+
+    A configuration whose narrow variant gives the same table is stored once
+    with is_narrow null (valid for both).
+    """
+    n, grid = uw_table_grid()
+    files = {}
+    for series_id, configurations in catalog_configurations(catalog).items():
+        tables = []
+        for (category_id, sash_id), driver_ids in configurations.items():
+            key = ConfigKey(series_id, category_id, driver_ids[0], sash_id)
+            category, sash = catalog.categories[category_id], catalog.sashes[sash_id]
+            entry = {
+                "category_id": category_id,
+                "category_name": category.name,
+                "sash_id": sash_id,
+                "sash_name": sash.name,
+                "num_glasses": category.num_glasses,
+                "has_special": category.has_special_calculation,
+                "drivers": {str(driver_id): catalog.drivers[driver_id].name for driver_id in driver_ids},
+            }
+            normal = uw_table_column(catalog, n, grid, key, False)
+            narrow = uw_table_column(catalog, n, grid, key, True)
+            if normal is None or narrow is None:
+                # Left to the backend, which reports the error
+                continue
+            if narrow == normal:
+                tables.append({**entry, "is_narrow": None, "Uw": normal})
+            else:
+                tables.append({**entry, "is_narrow": False, "Uw": normal})
+                tables.append({**entry, "is_narrow": True, "Uw": narrow})
+        files[series_id] = {
+            "format": UW_TABLE_FORMAT,
+            "catalog_version": catalog.version,
+            "series_id": series_id,
+            "series_name": catalog.series[series_id].name,
+            "tables": tables,
+        }
+    return files
+
+
+def content_hash(body):
+    return hashlib.sha256(body).hexdigest()[:12]
+
+
+def write_uw_tables(out_dir=UW_TABLE_DIR):
+    """Write the tables of the current catalog; returns the manifest"""
+    catalog = get_catalog()
+    os.makedirs(out_dir, exist_ok=True)
+    names = {}
+    for series_id, content in build_uw_tables(catalog).items():
+        body = json.dumps(content, separators=(',', ':'), ensure_ascii=False).encode()
+        name = f"series-{series_id}.{content_hash(body)}.json"
+        path = os.path.join(out_dir, name)
+        if not os.path.exists(path):
+            with open(path, 'wb') as file:
+                file.write(body)
+        names[str(series_id)] = name
+
+    manifest = {
+        "format": UW_TABLE_FORMAT,
+        "catalog": current_catalog_name.get(),
+        "catalog_version": catalog.version,
+        "scale": UW_TABLE_SCALE,
+        "axes": UW_TABLE_AXES,
+        "files": names,
+    }
+    with open(os.path.join(out_dir, 'manifest.json'), 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+    for name in os.listdir(out_dir):
+        if name.startswith('series-') and name not in names.values():
+            os.remove(os.path.join(out_dir, name))
+    return manifest
+
+
+def check_uw_tables(out_dir=UW_TABLE_DIR):
+    """Compare the written tables with live /api/calculate results, cell by
+    cell through compute_uw(). Returns a list of problems (empty when exact)."""
+    catalog = get_catalog()
+    try:
+        with open(os.path.join(out_dir, 'manifest.json'), encoding='utf-8') as file:
+            manifest = json.load(file)
+    except (OSError, ValueError) as exc:
+        return [f"cannot read manifest: {exc}"]
+
+    problems = []
+    if manifest.get("catalog_version") != catalog.version:
+        problems.append(f"tables are for catalog version {manifest.get('catalog_version')}, live is {catalog.version}")
+    if manifest.get("axes") != UW_TABLE_AXES or manifest.get("scale") != UW_TABLE_SCALE:
+        problems.append("grid or scale differs from the generator")
+        return problems
+
+    configurations = catalog_configurations(catalog)
+    if set(manifest["files"]) != {str(series_id) for series_id in configurations}:
+        problems.append("series in the manifest differ from the catalog")
+    cells = [dict(zip(UW_TABLE_AXES, values)) for values in itertools.product(*UW_TABLE_AXES.values())]
+
+    for series_id, name in manifest["files"].items():
+        try:
+            with open(os.path.join(out_dir, name), 'rb') as file:
+                body = file.read()
+        except OSError as exc:
+            problems.append(f"{name}: {exc}")
+            continue
+        if not name.endswith(f".{content_hash(body)}.json"):
+            problems.append(f"{name}: content does not match its hash")
+
+        found = {}
+        for table in json.loads(body)["tables"]:
+            drivers = found.setdefault((table["category_id"], table["sash_id"]), set())
+            drivers.update(int(driver_id) for driver_id in table["drivers"])
+            variants = (False, True) if table["is_narrow"] is None else (table["is_narrow"],)
+            for driver_id, is_narrow in itertools.product(table["drivers"], variants):
+                for cell, stored in zip(cells, table["Uw"]):
+                    req = CalculationRequest(
+                        series_id=int(series_id), category_id=table["category_id"], driver_id=int(driver_id),
+                        sash_id=table["sash_id"], is_narrow=is_narrow, **cell,
+                    )
+                    live = compute_uw(req, *resolve_calculation(catalog, req))["Uw"]
+                    if stored / UW_TABLE_SCALE != live:
+                        problems.append(
+                            f"{name}: category {req.category_id} sash {req.sash_id} driver {req.driver_id} "
+                            f"narrow {is_narrow} {cell}: stored {stored / UW_TABLE_SCALE}, live {live}"
+                        )
+                        break
+
+        expected = {key: set(drivers) for key, drivers in configurations.get(int(series_id), {}).items()}
+        if found != expected:
+            problems.append(f"{name}: configurations differ from the catalog")
+    return problems
+
+
+# ===================================
+# COEFFICIENT BUNDLE (client-side calculation)
+# ===================================
+# Everything compute_uw() takes from the catalog, resolved per configuration
+# (b_override, the narrow fallbacks and l precomputed) so a client can run
+# the formulas offline; src/api/uwEvaluator.js is the reference evaluator.
+# /api/calculate/test-vectors gives inputs with the server's results to
+# check an evaluator against.
+
+BUNDLE_FORMAT = 2
+BUNDLE_FIELDS = [
+    'series_id', 'category_id', 'sash_id', 'driver_ids', 'method',
+    'l', 'uf1', 'uf2', 'akentrou', 'akentrou_narrow', 'afilitou', 'afilitou_narrow',
+    'gw_divisor', 'gw_offset', 'gw_offset_narrow', 'gh_offset', 'num_glasses', 'has_special',
+]
+TEST_VECTOR_COUNT = 500
+
+# catalog name -> (version, encoded bundle); one version per catalog
+coefficient_bundles = {}
+
+
+def build_coefficient_bundle(catalog):
+    rows = []
+    for series_id, configurations in catalog_configurations(catalog).items():
+        for (category_id, sash_id), driver_ids in configurations.items():
+            series, category, sash, driver, params, method = resolve_calculation(
+                catalog, ConfigKey(series_id, category_id, driver_ids[0], sash_id),
+            )
+            if not method.builtin:
+                # Formulas edited in the admin are only evaluated by the server
+                continue
+            b = sash.b_override if sash.b_override else series.b
+            rows.append([
+                series_id, category_id, sash_id, driver_ids, method.name,
+                (series.a + b - series.x) / 1000,
+                series.uf1, series.uf2,
+                series.e, series.e_narrow if series.e_narrow else series.e,
+                series.f, series.f_narrow if series.f_narrow else series.f,
+                params.gw_divisor if params else None,
+                params.gw_offset if params else None,
+                (params.narrow_gw_offset if params.narrow_gw_offset else params.gw_offset) if params else None,
+                params.gh_offset if params else None,
+                category.num_glasses, category.has_special_calculation,
+            ])
+
+    def names(records):
+        return {record.id: record.name for record in records.values()}
+
+    return {
+        "format": BUNDLE_FORMAT,
+        "catalog": current_catalog_name.get(),
+        "catalog_version": catalog.version,
+        "limits": CALCULATION_LIMITS,
+        "psi_values": PSI_VALUES,
+        "validation_errors": VALIDATION_ERRORS,
+        "fields": BUNDLE_FIELDS,
+        "configurations": rows,
+        "names": {
+            "series": names(catalog.series),
+            "categories": names(catalog.categories),
+            "sashes": names(catalog.sashes),
+            "drivers": names(catalog.drivers),
+        },
+    }
+
+
+def encoded_coefficient_bundle():
+    catalog = get_catalog()
+    name = current_catalog_name.get()
+    cached = coefficient_bundles.get(name)
+    if cached is None or cached[0] != catalog.version:
+        body = json.dumps(build_coefficient_bundle(catalog), separators=(',', ':'), ensure_ascii=False).encode()
+        cached = coefficient_bundles[name] = (catalog.version, body)
+    return cached
+
+
+def build_test_vectors(count):
+    """Deterministic inputs across all configurations (with and without
+    narrow/rolo, including the limits) and the /api/calculate results"""
+    catalog = get_catalog()
+    keys = [
+        (series_id, category_id, sash_id, driver_id)
+        for series_id, configurations in catalog_configurations(catalog).items()
+        for (category_id, sash_id), driver_ids in configurations.items()
+        for driver_id in driver_ids
+        if catalog.methods[category_id].builtin
+    ]
+    random = Random(catalog.version)
+    limits = CALCULATION_LIMITS
+    vectors = []
+    for i in range(count if keys else 0):
+        series_id, category_id, sash_id, driver_id = keys[i % len(keys)]
+        has_rolo = i % 3 == 0
+        inputs = {
+            "series_id": series_id,
+            "category_id": category_id,
+            "driver_id": driver_id,
+            "sash_id": sash_id,
+            "plaisio_width": random.choice([limits['plaisio_width'][0], random.randint(600, 4000), round(random.uniform(600, 4000), 1)]),
+            "plaisio_height": random.choice([limits['plaisio_height'][1], random.randint(900, 3000), round(random.uniform(900, 3000), 1)]),
+            "ug_value": round(random.uniform(*limits['ug_value']), 2),
+            "psi_value": random.choice(PSI_VALUES),
+            "is_narrow": i % 2 == 1,
+            "has_rolo": has_rolo,
+            "rolo_height": random.randint(100, 600) if has_rolo else None,
+            "ur_value": round(random.uniform(*limits['ur_value']), 2) if has_rolo else None,
+        }
+        req = CalculationRequest(**inputs)
+        result = compute_uw(req, *resolve_calculation(catalog, req))
+        del result["debug"]
+        vectors.append({"input": inputs, "expected": result})
+    return {"catalog_version": catalog.version, "vectors": vectors}
+
+
+@app.get("/api/calculate/bundle")
+async def get_coefficient_bundle(request: Request):
+    """Per-configuration coefficients for calculating Uw on the client.
+
+    Revalidated with the catalog version as ETag (304 when unchanged).
+    """
+    version, body = await run_in_threadpool(encoded_coefficient_bundle)
+    etag = f'"bundle-{current_catalog_name.get()}-{version}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "X-Catalog", "X-Catalog-Version": str(version)}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/api/calculate/test-vectors")
+async def get_test_vectors(count: int = TEST_VECTOR_COUNT):
+    """Reference inputs and expected results for checking a client evaluator"""
+    if not 1 <= count <= 10 * TEST_VECTOR_COUNT:
+        raise HTTPException(status_code=400, detail=f"count must be between 1 and {10 * TEST_VECTOR_COUNT}")
+    return await run_in_threadpool(build_test_vectors, count)
+
+
+# ===================================
+# CATALOG CHANGE FEED (server-sent events)
+# ===================================
+# Events {catalog, version, table, ids} are read from the change log, so every
+# worker process publishes every edit, whichever worker committed it. After
+# its own edits a worker polls at once; edits from other processes are picked
+# up by polling the catalog version of the catalogs with subscribers every
+# CATALOG_POLL_INTERVAL seconds. /api/catalog/events streams the events to
+# every subscriber of that catalog, so open calculators and service workers
+# drop exactly the stale entries. An idle subscriber costs one coroutine and
+# one small queue, no thread.
+
+CATALOG_EVENT_KEEPALIVE = 15  # seconds between comment lines on an idle stream
+CATALOG_EVENT_QUEUE_SIZE = 64
+CATALOG_POLL_INTERVAL = float(os.environ.get("CATALOG_POLL_INTERVAL", "1"))
+
+
+class CatalogEventBroker:
+    """Fan-out of catalog change events to one queue per connection.
+
+    Only used from the event loop. A subscriber that falls
+    CATALOG_EVENT_QUEUE_SIZE events behind gets a single `resync` event
+    instead of its backlog.
+    """
+
+    def __init__(self):
+        self.subscribers = {}  # catalog name -> set of queues
+        self.versions = {}  # catalog name -> last version published
+        self.poll_locks = {}
+        self.published = 0
+        self.resyncs = 0
+        self.polls = 0
+
+    def subscribe(self, name, version):
+        queue = asyncio.Queue(CATALOG_EVENT_QUEUE_SIZE)
+        self.subscribers.setdefault(name, set()).add(queue)
+        self.versions.setdefault(name, version)
+        return queue
+
+    def unsubscribe(self, name, queue):
+        queues = self.subscribers.get(name, set())
+        queues.discard(queue)
+        if not queues:
+            self.subscribers.pop(name, None)
+            self.versions.pop(name, None)
+
+    def publish(self, event):
+        self.published += 1
+        for queue in self.subscribers.get(event["catalog"], ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "resync", "catalog": event["catalog"], "version": event["version"]})
+                self.resyncs += 1
+
+    async def poll(self, name):
+        """Publish what was committed to catalog `name` since the last poll"""
+        async with self.poll_locks.setdefault(name, asyncio.Lock()):
+            since = self.versions.get(name)
+            if since is None:
+                return
+            self.polls += 1
+            version, events = await run_in_threadpool(load_change_events, name, since)
+            if version != since:
+                # an edit through another worker: do not wait for the TTL
+                expire_catalog(name)
+            if name in self.versions:
+                for event in events:
+                    self.publish(event)
+                self.versions[name] = version
+
+    async def watch(self):
+        """Poll every catalog with subscribers, for edits made by other workers"""
+        while True:
+            await asyncio.sleep(CATALOG_POLL_INTERVAL)
+            for name in list(self.subscribers):
+                try:
+                    await self.poll(name)
+                except Exception:
+                    logger.exception("Catalog change poll for %s failed", name)
+
+    def stats(self):
+        return {
+            "subscribers": sum(len(queues) for queues in self.subscribers.values()),
+            "catalogs": len(self.subscribers),
+            "published": self.published,
+            "resyncs": self.resyncs,
+            "polls": self.polls,
+        }
+
+
+catalog_events = CatalogEventBroker()
+
+
+def load_change_events(name, since):
+    """(version, events) for the changes to catalog `name` after `since`: one
+    catalog-change event per version and table, or a resync when the change
+    log no longer goes back that far"""
+    token = current_catalog_name.set(name)
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN")
+        version = get_catalog_version(cursor)
+        start = change_log_start(cursor)
+        events = []
+        if since < version and (start is None or since < start):
+            events.append({"type": "resync", "catalog": name, "version": version})
+        elif since < version:
+            # Rows logged by an edit whose version bump is not committed yet
+            # carry version + 1 and wait for the next poll
+            cursor.execute('''
+                SELECT version, table_name, row_id FROM catalog_changes
+                WHERE version > ? AND version <= ? ORDER BY id
+            ''', (since, version))
+            changed = {}
+            for row_version, table, row_id in cursor.fetchall():
+                ids = changed.setdefault((row_version, table), [])
+                if row_id not in ids:
+                    ids.append(row_id)
+            for (row_version, table), ids in changed.items():
+                event = {"type": "catalog-change", "catalog": name, "version": row_version, "table": table, "ids": ids}
+                if table == 'series_category_params' and len(ids) == 1:
+                    # lets clients find the cached /series/{id}/category/{id}/params
+                    cursor.execute("SELECT series_id, category_id FROM series_category_params WHERE id = ?", ids)
+                    row = cursor.fetchone()
+                    if row:
+                        event["series_id"], event["category_id"] = row
+                events.append(event)
+        conn.commit()
+    finally:
+        conn.close()
+        current_catalog_name.reset(token)
+    return version, events
+
+
+def sse_message(event):
+    return f"id: {event['version']}\nevent: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+@app.get("/api/catalog/events")
+async def catalog_event_stream(request: Request):
+    """Server-sent catalog change events.
+
+    The stream starts with a `version` event carrying the current catalog
+    version (`resync` instead when Last-Event-ID is an older version), then
+    one `catalog-change` event {catalog, version, table, ids} per admin edit.
+    """
+    name = current_catalog_name.get()
+    version = await run_in_threadpool(read_catalog_version)
+    last_seen = request.headers.get("last-event-id")
+    queue = catalog_events.subscribe(name, version)
+
+    async def stream():
+        try:
+            yield "retry: 5000\n\n"
+            kind = "resync" if last_seen and last_seen != str(version) else "version"
+            yield sse_message({"type": kind, "catalog": name, "version": version})
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), CATALOG_EVENT_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield sse_message(event)
+        finally:
+            catalog_events.unsubscribe(name, queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ===================================
+# LIVE CALCULATION (WebSocket)
+# ===================================
+# /api/calculate/live serves calculators that recalculate while the user drags
+# a dimension. A connection binds one configuration, whose records are
+# resolved once (and again after a catalog change event), then streams small
+# input deltas: a message costs a dict merge, the input checks and the
+# formulas, with no database access and no Pydantic model. Deltas that arrive
+# while a result is being computed or sent are merged into the pending inputs
+# and only the latest inputs are calculated (latest wins).
+
+LIVE_BIND_FIELDS = ['series_id', 'category_id', 'driver_id', 'sash_id', 'is_narrow', 'has_rolo']
+LIVE_INPUT_FIELDS = ['plaisio_width', 'plaisio_height', 'ug_value', 'psi_value', 'rolo_height', 'ur_value']
+
+# Since start: sessions, input messages, results sent (inputs - results
+# were superseded before they were calculated)
+live_stats = {"sessions": 0, "open": 0, "inputs": 0, "results": 0}
+
+
+def live_error(status, detail, seq=None):
+    return {"type": "error", "status": status, "detail": detail, "seq": seq}
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class LiveCalculation:
+    """Bound configuration and pending inputs of one live session"""
+
+    def __init__(self):
+        self.inputs = {}
+        self.records = None  # resolve_calculation() of the bound configuration
+        self.catalog_version = None
+        self.seq = None  # of the last message merged into `inputs`
+        self.outbox = []  # replies other than results, in order
+        self.dirty = False  # inputs changed since the last result
+        self.wake = asyncio.Event()
+
+    def reply(self, message):
+        self.outbox.append(message)
+        self.wake.set()
+
+    def merge(self, message):
+        """Merge an input delta; returns an error reply or None"""
+        delta = {field: message[field] for field in LIVE_INPUT_FIELDS if field in message}
+        if not all(value is None or is_number(value) for value in delta.values()):
+            return live_error(422, BATCH_ERRORS['INVALID_VALUE'][1], message.get('seq'))
+        self.inputs.update(delta)
+        self.seq = message.get('seq', self.seq)
+        self.dirty = True
+        self.wake.set()
+        return None
+
+    def resolve(self):
+        """Records of the bound configuration in the current catalog
+        (threadpool: may load the catalog)"""
+        catalog = get_catalog()
+        return catalog.version, resolve_calculation(catalog, ConfigKey(*(self.inputs[field] for field in ConfigKey._fields)))
+
+    def complete(self):
+        return all(is_number(self.inputs.get(field)) for field in LIVE_INPUT_FIELDS[:4])
+
+    def result(self):
+        """Result (or error) message for the current inputs"""
+        if not self.complete():
+            return live_error(422, BATCH_ERRORS['INVALID_VALUE'][1], self.seq)
+        req = CalculationRequest.model_construct(**self.inputs)
+        code = validation_error(req)
+        if code:
+            return {**live_error(400, VALIDATION_ERRORS[code], self.seq), "code": code}
+        try:
+            result = compute_uw(req, *self.records)
+        except HTTPException as exc:
+            return live_error(exc.status_code, exc.detail, self.seq)
+        except ArithmeticError:
+            return {**live_error(422, CALCULATION_FAILED, self.seq), "code": 'CALCULATION_FAILED'}
+        except Exception as exc:
+            # An error reply instead of ending the send task (and the socket)
+            logger.exception("Live calculation failed")
+            return live_error(500, f"Calculation failed: {type(exc).__name__}", self.seq)
+        del result["debug"]
+        return {"type": "result", "seq": self.seq, "catalog_version": self.catalog_version, "result": result}
+
+
+@app.websocket("/api/calculate/live")
+async def calculate_live(websocket: WebSocket):
+    """Live calculation for one configuration.
+
+    Send {"type": "bind", series_id, category_id, driver_id, sash_id,
+    is_narrow, has_rolo, ...inputs} once (again to switch configuration),
+    then {"type": "input", "seq": n, ...changed inputs} with any of
+    plaisio_width, plaisio_height, ug_value, psi_value, rolo_height and
+    ur_value. Replies are {"type": "bound", catalog_version}, {"type":
+    "result", seq, catalog_version, result} (the /api/calculate body without
+    debug) and {"type": "error", status, detail, seq}; `seq` is that of the
+    latest input included, earlier superseded inputs get no result. After a
+    catalog edit the configuration is resolved again and the result resent.
+    """
+    await websocket.accept()
+    name = current_catalog_name.get()
+    session = LiveCalculation()
+    events = None
+    live_stats["sessions"] += 1
+    live_stats["open"] += 1
+
+    async def rebind():
+        try:
+            session.catalog_version, session.records = await run_in_threadpool(session.resolve)
+        except HTTPException as exc:
+            session.records = None
+            session.reply(live_error(exc.status_code, exc.detail, session.seq))
+            return False
+        return True
+
+    async def receive():
+        nonlocal events
+        while True:
+            try:
+                message = await websocket.receive_json()
+            except ValueError:
+                session.reply(live_error(400, "Messages must be JSON objects"))
+                continue
+            if not isinstance(message, dict):
+                session.reply(live_error(400, "Messages must be JSON objects"))
+                continue
+
+            kind = message.get('type', 'input')
+            if kind == 'bind':
+                ids = [message.get(field) for field in ConfigKey._fields]
+                if not all(isinstance(value, int) and not isinstance(value, bool) for value in ids):
+                    session.reply(live_error(422, "series_id, category_id, driver_id and sash_id must be integers"))
+                    continue
+                inputs = {field: message.get(field) for field in LIVE_BIND_FIELDS}
+                flags = ('is_narrow', 'has_rolo')
+                # The rule of bool_column(): true/false, 0/1 or missing
+                if not all(inputs[field] is None or (isinstance(inputs[field], (bool, int, float)) and inputs[field] in (0, 1)) for field in flags):
+                    session.reply(live_error(422, "is_narrow and has_rolo must be true or false", message.get('seq')))
+                    continue
+                session.inputs = {**inputs, **{field: bool(inputs[field]) for field in flags}}
+                session.seq = message.get('seq')
+                session.dirty = False
+                if not await rebind():
+                    continue
+                if events is None:
+                    events = catalog_events.subscribe(name, session.catalog_version)
+                session.reply({"type": "bound", "catalog_version": session.catalog_version})
+                if any(field in message for field in LIVE_INPUT_FIELDS):
+                    session.merge(message)
+            elif kind == 'input':
+                live_stats["inputs"] += 1
+                if session.records is None:
+                    session.reply(live_error(400, "Bind a configuration first", message.get('seq')))
+                    continue
+                error = session.merge(message)
+                if error:
+                    session.reply(error)
+            else:
+                session.reply(live_error(400, f"Unknown message type {kind!r}"))
+
+    async def send():
+        while True:
+            await session.wake.wait()
+            session.wake.clear()
+            while session.outbox:
+                await websocket.send_json(session.outbox.pop(0))
+            if session.dirty and session.records is not None:
+                session.dirty = False
+                await websocket.send_json(session.result())
+                live_stats["results"] += 1
+
+    async def follow_catalog():
+        while True:
+            if events is None:
+                await asyncio.sleep(CATALOG_POLL_INTERVAL)
+                continue
+            await events.get()
+            if session.records is not None and await rebind() and session.complete():
+                session.dirty = True
+                session.wake.set()
+
+    tasks = [asyncio.ensure_future(task()) for task in (receive, send, follow_catalog)]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if not isinstance(task.exception(), WebSocketDisconnect):
+                task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+        if events is not None:
+            catalog_events.unsubscribe(name, events)
+        live_stats["open"] -= 1
+
+
+# ===================================
+# PROJECTS (saved quotes)
+# ===================================
+
+# Projects per page of /api/projects when no limit is asked for
+PROJECTS_PAGE_SIZE = 100
+
+# Openings recalculated per transaction by the background job
+RECALC_BATCH_SIZE = 500
+
+# Only one background recalculation walks the stale openings at a time
+recalc_lock = threading.Lock()
+
+
+class OpeningRequest(CalculationRequest):
+    label: Optional[str] = None
+    quantity: int = Field(1, ge=1, le=MAX_QUANTITY)
+
+
+class CreateProjectRequest(BaseModel):
+    name: str
+    openings: List[OpeningRequest] = []
+
+
+def opening_to_dict(row):
+    opening = dict(row)
+    opening['result'] = json.loads(opening['result']) if opening['result'] else None
+    opening['results_current'] = opening.pop('stale') == 0
+    return opening
+
+
+def get_project_or_404(cursor, project_id):
+    cursor.execute('''
+        SELECT p.*, COUNT(o.id) AS opening_count, COALESCE(SUM(o.stale > 0), 0) AS stale_openings
+        FROM projects p
+        LEFT JOIN openings o ON o.project_id = p.id
+        WHERE p.id = ?
+        GROUP BY p.id
+    ''', (project_id,))
+    project = row_to_dict(cursor.fetchone())
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    project['results_current'] = project['stale_openings'] == 0
+    return project
+
+
+def insert_opening(cursor, project_id, req):
+    """Calculate an opening and store its inputs together with the result"""
+    validate_calculation(req)
+    catalog = get_catalog()
+    series, category, sash, driver, params, method = resolve_calculation(catalog, req)
+    try:
+        result = compute_uw(req, series, category, sash, driver, params, method)
+    except ArithmeticError:
+        raise HTTPException(status_code=422, detail=CALCULATION_FAILED)
+
+    columns = ['project_id', 'label', 'quantity', 'params_id'] + CALCULATION_FIELDS + ['result', 'stale', 'catalog_version', 'computed_at']
+    values = [project_id, req.label, req.quantity, params.id if params else None]
+    values += [getattr(req, field) for field in CALCULATION_FIELDS]
+    values += [json.dumps(result), 0, catalog.version]
+    cursor.execute(f'''
+        INSERT INTO openings ({', '.join(columns)})
+        VALUES ({', '.join('?' * (len(columns) - 1))}, CURRENT_TIMESTAMP)
+    ''', values)
+    return cursor.lastrowid
+
+
+def mark_openings_stale(cursor, column, row_id):
+    """Invalidate the openings that depend on a changed catalog row.
+
+    `column` is one of the indexed dependency columns of `openings`
+    (series_id, category_id, sash_id, params_id, project_id). Returns the
+    number of openings that need recalculation.
+    """
+    cursor.execute(f"UPDATE openings SET stale = stale + 1 WHERE {column} = ?", (row_id,))
+    return cursor.rowcount
+
+
+def recalculate_stale_openings():
+    """Recompute all stale openings, RECALC_BATCH_SIZE per transaction.
+
+    Runs as a background task after admin edits. Each batch is computed
+    against the in-memory catalog, and a result is only written back if the
+    opening was not invalidated again while it was being computed.
+    """
+    with recalc_lock:
+        conn = get_db()
+        cursor = conn.cursor()
+        try:
+            while True:
+                cursor.execute(f'''
+                    SELECT id, stale, {', '.join(CALCULATION_FIELDS)} FROM openings
+                    WHERE stale > 0 ORDER BY id LIMIT ?
+                ''', (RECALC_BATCH_SIZE,))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+
+                catalog = get_catalog()
+                updates = []
+                for row in rows:
+                    req = CalculationRequest(**{field: row[field] for field in CALCULATION_FIELDS})
+                    try:
+                        records = resolve_calculation(catalog, req)
+                        result = compute_uw(req, *records)
+                    except HTTPException as exc:
+                        updates.append((None, exc.detail, None, catalog.version, row['id'], row['stale']))
+                        continue
+                    except ArithmeticError:
+                        updates.append((None, CALCULATION_FAILED, None, catalog.version, row['id'], row['stale']))
+                        continue
+                    except Exception as exc:
+                        # e.g. a catalog value the formulas cannot use: only
+                        # this opening keeps the error, the run goes on
+                        logger.warning("Recalculating opening %s failed: %r", row['id'], exc)
+                        updates.append((
+                            None, f"Calculation failed: {type(exc).__name__}", None, catalog.version, row['id'], row['stale'],
+                        ))
+                        continue
+                    params = records[4]
+                    updates.append((
+                        json.dumps(result), None, params.id if params else None, catalog.version, row['id'], row['stale'],
+                    ))
+
+                cursor.executemany('''
+                    UPDATE openings
+                    SET result = ?, error = ?, params_id = COALESCE(?, params_id),
+                        catalog_version = ?, stale = 0, computed_at = CURRENT_TIMESTAMP
+                    WHERE id = ? AND stale = ?
+                ''', updates)
+                conn.commit()
+        finally:
+            conn.close()
+
+
+def record_catalog_change(cursor, background_tasks, column, *row_ids):
+    """Bookkeeping for an admin edit, inside its transaction: bump the catalog
+    version, schedule recalculation of the openings that depend on the rows
+    and the change event poll (background tasks run after the commit)"""
+    name = current_catalog_name.get()
+    bump_catalog_version(cursor)
+    prune_catalog_changes(cursor)
+    # Now for the rest of the handler, again once the edit is committed
+    expire_catalog(name)
+    background_tasks.add_task(expire_catalog, name)
+    if sum([mark_openings_stale(cursor, column, row_id) for row_id in row_ids]):
+        background_tasks.add_task(recalculate_stale_openings)
+    background_tasks.add_task(catalog_events.poll, name)
+
+
+@app.get("/api/projects")
+async def get_projects(query: ListQuery = Depends()):
+    """Projects with their opening counts, PROJECTS_PAGE_SIZE per page unless
+    `limit` says otherwise (see LIST PROJECTION AND PAGINATION)"""
+    limit = query.limit or PROJECTS_PAGE_SIZE
+    columns = ', '.join(f"p.{column}" for column in selected_columns('projects', query.fields))
+    conn = get_db()
+    cursor = conn.cursor()
+    # Counted per project of the page, through idx_openings_project
+    cursor.execute(f'''
+        SELECT {columns},
+            (SELECT COUNT(*) FROM openings o WHERE o.project_id = p.id) AS opening_count,
+            (SELECT COUNT(*) FROM openings o WHERE o.project_id = p.id AND o.stale > 0) AS stale_openings
+        FROM projects p
+        WHERE p.id > ?
+        ORDER BY p.id
+        LIMIT ?
+    ''', (query.after_id or 0, limit + 1))
+    result = rows_to_list(cursor.fetchall())
+    conn.close()
+    for project in result:
+        project['results_current'] = project['stale_openings'] == 0
+    return list_page(query, result, limit)
+
+
+@app.post("/api/projects")
+async def create_project(req: CreateProjectRequest):
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("INSERT INTO projects (name) VALUES (?)", (req.name,))
+        project_id = cursor.lastrowid
+        for opening in req.openings:
+            insert_opening(cursor, project_id, opening)
+        conn.commit()
+        result = get_project_or_404(cursor, project_id)
+    finally:
+        conn.close()
+    return result
+
+
+@app.get("/api/projects/{project_id}")
+async def get_project(project_id: int):
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        project = get_project_or_404(cursor, project_id)
+        cursor.execute("SELECT * FROM openings WHERE project_id = ? ORDER BY id", (project_id,))
+        project['openings'] = [opening_to_dict(row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+    return project
+
+
+@app.delete("/api/projects/{project_id}")
+async def delete_project(project_id: int):
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        get_project_or_404(cursor, project_id)
+        cursor.execute("DELETE FROM openings WHERE project_id = ?", (project_id,))
+        cursor.execute("DELETE FROM projects WHERE id = ?", (project_id,))
+        conn.commit()
+    finally:
+        conn.close()
+    return {"deleted": project_id}
+
+
+@app.post("/api/projects/{project_id}/openings")
+async def add_opening(project_id: int, req: OpeningRequest):
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        get_project_or_404(cursor, project_id)
+        opening_id = insert_opening(cursor, project_id, req)
+        cursor.execute("UPDATE projects SET updated_at = CURRENT_TIMESTAMP WHERE id = ?", (project_id,))
+        conn.commit()
+        cursor.execute("SELECT * FROM openings WHERE id = ?", (opening_id,))
+        result = opening_to_dict(cursor.fetchone())
+    finally:
+        conn.close()
+    return result
+
+
+@app.delete("/api/projects/{project_id}/openings/{opening_id}")
+async def delete_opening(project_id: int, opening_id: int):
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM openings WHERE id = ? AND project_id = ?", (opening_id, project_id))
+        if cursor.rowcount == 0:
+            raise HTTPException(status_code=404, detail="Opening not found")
+        cursor.execute("UPDATE projects SET updated_at = CURRENT_TIMESTAMP WHERE id = ?", (project_id,))
+        conn.commit()
+    finally:
+        conn.close()
+    return {"deleted": opening_id}
+
+
+@app.post("/api/projects/{project_id}/recalculate")
+async def recalculate_project(project_id: int, background_tasks: BackgroundTasks):
+    """Force a background recalculation of every opening in a project"""
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        get_project_or_404(cursor, project_id)
+        stale = mark_openings_stale(cursor, 'project_id', project_id)
+        conn.commit()
+        result = get_project_or_404(cursor, project_id)
+    finally:
+        conn.close()
+    if stale:
+        background_tasks.add_task(recalculate_stale_openings)
+    return result
+
+
+def load_project_openings(cursor, project_id):
+    """Stored inputs of a project's openings as batch rows (with quantity)"""
+    cursor.execute(
+        f"SELECT quantity, {', '.join(CALCULATION_FIELDS)} FROM openings WHERE project_id = ? ORDER BY id",
+        (project_id,),
+    )
+    return [dict(row) for row in cursor.fetchall()]
+
+
+@app.get("/api/projects/{project_id}/glass")
+async def get_project_glass(
+    project_id: int,
+    sheet_width: float = GLASS_SHEET_WIDTH,
+    sheet_height: float = GLASS_SHEET_HEIGHT,
+    trim: float = 0,
+    gap: float = 0,
+    rotate: bool = True,
+):
+    """Glass order and cutting layouts of a project (see /api/calculate/glass),
+    from the stored inputs against the current catalog"""
+    sheet = glass_sheet(sheet_width, sheet_height, trim, gap, rotate)
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        get_project_or_404(cursor, project_id)
+        openings = load_project_openings(cursor, project_id)
+    finally:
+        conn.close()
+    return JSONResponse(await run_in_threadpool(glass_cutting_plan, openings, sheet))
+
+
+@app.get("/api/projects/{project_id}/profiles")
+async def get_project_profiles(
+    project_id: int,
+    bar_length: float = PROFILE_BAR_LENGTH,
+    kerf: float = PROFILE_SAW_KERF,
+    trim: float = 0,
+):
+    """Profile cutting list of a project (see /api/calculate/profiles), from
+    the stored inputs against the current catalog"""
+    bar = profile_bar(bar_length, kerf, trim)
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        get_project_or_404(cursor, project_id)
+        openings = load_project_openings(cursor, project_id)
+    finally:
+        conn.close()
+    return JSONResponse(await run_in_threadpool(profile_cutting_plan, openings, bar))
+
+
+@app.get("/api/projects/{project_id}/compliance")
+async def get_project_compliance(
+    project_id: int,
+    climate_zone: str,
+    building_use: str = COMPLIANCE_BUILDING_USE,
+    alternatives: bool = True,
+):
+    """Uw limit screening of a project (see /api/calculate/compliance), from
+    the stored inputs against the current catalog"""
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        get_project_or_404(cursor, project_id)
+        openings = load_project_openings(cursor, project_id)
+    finally:
+        conn.close()
+    return JSONResponse(await run_in_threadpool(
+        run_compliance_screening, openings, climate_zone, building_use, alternatives,
+    ))
+
+
+# ===================================
+# ADMIN API - GET ALL DATA
+# ===================================
+
+# Tables served by /api/admin/all-data, in response order
+CATALOG_TABLES = [
+    'types', 'categories', 'series', 'drivers',
+    'driver_categories', 'sashes', 'series_category_params', 'formulas', 'uw_limits',
+]
+
+# Bodies smaller than this are sent uncompressed
+COMPRESSION_MIN_SIZE = 1024
+
+CATALOG_MEDIA_TYPES = {
+    'json': 'application/json',
+    'columnar': 'application/json',
+    'msgpack': 'application/msgpack',
+}
+
+# (catalog name, version, format) -> {content-coding: body}; only the newest
+# version of each resident catalog is kept
+encoded_catalog = {}
+encoded_catalog_lock = threading.Lock()
+
+
+def load_catalog_tables(names=CATALOG_TABLES, selected=None, after_id=None, limit=None):
+    """Read catalog tables and the catalog version in one snapshot.
+
+    `selected` ({table: [column, ...]}) projects tables; `after_id` and
+    `limit` page every table by id. Returns (version, {table: (columns,
+    rows)}) with rows as plain tuples.
+    """
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN")
+        version = get_catalog_version(cursor)
+        tables = {}
+        for table in names:
+            columns = (selected or {}).get(table)
+            sql = f"SELECT {', '.join(columns) if columns else '*'} FROM {table}"
+            params = []
+            if after_id is not None:
+                sql += " WHERE id > ?"
+                params.append(after_id)
+            sql += " ORDER BY id"
+            if limit is not None:
+                sql += " LIMIT ?"
+                params.append(limit)
+            cursor.execute(sql, params)
+            columns = [column[0] for column in cursor.description]
+            tables[table] = (columns, [tuple(row) for row in cursor.fetchall()])
+        conn.commit()
+    finally:
+        conn.close()
+    return version, tables
+
+
+def encode_catalog(tables, fmt):
+    """Serialize catalog tables as `json` (rows as dicts, the original shape),
+    `columnar` (column names once, one value array per column) or `msgpack`
+    (the columnar structure, MessagePack encoded)"""
+    if fmt == 'json':
+        data = {
+            table: [dict(zip(columns, row)) for row in rows]
+            for table, (columns, rows) in tables.items()
+        }
+    else:
+        data = {
+            table: {column: [row[i] for row in rows] for i, column in enumerate(columns)}
+            for table, (columns, rows) in tables.items()
+        }
+        if fmt == 'msgpack':
+            return msgpack.packb(data, use_bin_type=True)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def compress_body(body, coding):
+    if coding == 'br':
+        return brotli.compress(body, quality=11)
+    if coding == 'gzip':
+        return gzip.compress(body, compresslevel=9, mtime=0)
+    return body
+
+
+def negotiate_content_coding(accept_encoding):
+    """Pick br (if the brotli module is installed) or gzip from Accept-Encoding"""
+    accepted = {}
+    for part in accept_encoding.lower().split(','):
+        coding, _, param = part.strip().partition(';')
+        quality = 1.0
+        param = param.strip()
+        if param.startswith('q='):
+            try:
+                quality = float(param[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip()] = quality
+    for coding in ('br', 'gzip'):
+        if coding == 'br' and brotli is None:
+            continue
+        if accepted.get(coding, accepted.get('*', 0.0)) > 0:
+            return coding
+    return 'identity'
+
+
+def drop_encoded_catalog(name):
+    with encoded_catalog_lock:
+        for key in [key for key in encoded_catalog if key[0] == name]:
+            del encoded_catalog[key]
+
+
+def build_encoded_catalog(fmt):
+    """Encode the current catalog once, plus its gzip/brotli variants.
+
+    Compressed variants are only produced for bodies of at least
+    COMPRESSION_MIN_SIZE bytes. Returns (version, {coding: body}).
+    """
+    version, tables = load_catalog_tables()
+    plain = encode_catalog(tables, fmt)
+    bodies = {'identity': plain}
+    if len(plain) >= COMPRESSION_MIN_SIZE:
+        bodies['gzip'] = compress_body(plain, 'gzip')
+        if brotli is not None:
+            bodies['br'] = compress_body(plain, 'br')
+
+    name = current_catalog_name.get()
+    with encoded_catalog_lock:
+        for key in [key for key in encoded_catalog if key[0] == name and key[1] < version]:
+            del encoded_catalog[key]
+        encoded_catalog[(name, version, fmt)] = bodies
+        # bounded like the resident catalogs: drop the oldest-built catalog
+        while len({key[0] for key in encoded_catalog}) > MAX_RESIDENT_CATALOGS:
+            oldest = next(iter(encoded_catalog))[0]
+            for key in [key for key in encoded_catalog if key[0] == oldest]:
+                del encoded_catalog[key]
+    return version, bodies
+
+
+def catalog_selection(tables, fields):
+    """Tables named by `tables` (all by default) and the columns `fields`
+    (`table.column` items) selects from them; 400 for unknown names"""
+    names = CATALOG_TABLES
+    if tables:
+        names = [table.strip() for table in tables.split(',') if table.strip()]
+        unknown = [table for table in names if table not in CATALOG_TABLES]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown table(s): {', '.join(unknown)}")
+    selected = {}
+    for field in (fields or '').split(','):
+        table, _, column = field.strip().rpartition('.')
+        if not field.strip():
+            continue
+        if table not in names:
+            raise HTTPException(status_code=400, detail=f"Field {field.strip()} must be table.column of a requested table")
+        selected.setdefault(table, []).append(column)
+    return names, {table: selected_columns(table, ','.join(columns)) for table, columns in selected.items()}
+
+
+def build_catalog_selection(fmt, names, selected, after_id, limit):
+    """Encoded catalog tables for a projection/page of all-data (not cached).
+    Returns (version, body, id to continue after or None)."""
+    version, tables = load_catalog_tables(names, selected, after_id, None if limit is None else limit + 1)
+    next_id = None
+    if limit is not None:
+        for table, (columns, rows) in tables.items():
+            if len(rows) > limit:
+                tables[table] = (columns, rows[:limit])
+                next_id = rows[limit - 1][columns.index('id')]
+    return version, encode_catalog(tables, fmt), next_id
+
+
+@app.get("/api/admin/all-data")
+async def get_all_data(
+    request: Request,
+    format: str = 'json',
+    tables: Optional[str] = None,
+    fields: Optional[str] = None,
+    after_id: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIST_LIMIT),
+):
+    """All catalog tables, pre-encoded once per catalog version.
+
+    `format` is json (default), columnar or msgpack (an Accept of
+    application/msgpack selects it too). Bodies are gzip/brotli compressed
+    when the client accepts it, and the ETag lets clients revalidate for free.
+    `tables` (comma separated) and `fields` (`table.column`, id is always
+    included) narrow the response; `after_id` and `limit` page a single
+    table by id, with a Link rel="next" while more rows follow. Such
+    responses are built per request.
+    """
+    if format == 'json' and 'application/msgpack' in request.headers.get('accept', ''):
+        format = 'msgpack'
+    if format not in CATALOG_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Format must be json, columnar or msgpack")
+    if format == 'msgpack' and msgpack is None:
+        raise HTTPException(status_code=406, detail="MessagePack encoding is not available")
+
+    if tables or fields or after_id is not None or limit is not None:
+        names, selected = await run_in_threadpool(catalog_selection, tables, fields)
+        if (after_id is not None or limit is not None) and len(names) != 1:
+            raise HTTPException(status_code=400, detail="after_id and limit page one table: pass tables=<name>")
+        version, body, next_id = await run_in_threadpool(build_catalog_selection, format, names, selected, after_id, limit)
+        coding = negotiate_content_coding(request.headers.get('accept-encoding', ''))
+        headers = {"Vary": "Accept, Accept-Encoding, X-Catalog", "X-Catalog-Version": str(version)}
+        if coding != 'identity' and len(body) >= COMPRESSION_MIN_SIZE:
+            body = compress_body(body, coding)
+            headers["Content-Encoding"] = coding
+        if next_id is not None:
+            headers["Link"] = f'<?{urlencode({**request.query_params, "after_id": next_id})}>; rel="next"'
+        return Response(content=body, media_type=CATALOG_MEDIA_TYPES[format], headers=headers)
+
+    name = current_catalog_name.get()
+    version = await run_in_threadpool(read_catalog_version)
+    # The catalog name is in the ETag: the same version number of another
+    # catalog is other data
+    if request.headers.get('if-none-match') == f'"catalog-{name}-{version}-{format}"':
+        return Response(
+            status_code=304,
+            headers={"ETag": f'"catalog-{name}-{version}-{format}"', "Vary": "Accept, Accept-Encoding, X-Catalog"},
+        )
+
+    bodies = encoded_catalog.get((name, version, format))
+    if bodies is None:
+        version, bodies = await catalog_flight.do(('all-data', name, version, format), build_encoded_catalog, format)
+
+    coding = negotiate_content_coding(request.headers.get('accept-encoding', ''))
+    if coding not in bodies:
+        coding = 'identity'
+    headers = {
+        "ETag": f'"catalog-{name}-{version}-{format}"',
+        "Vary": "Accept, Accept-Encoding, X-Catalog",
+        "X-Catalog-Version": str(version),
+    }
+    if coding != 'identity':
+        headers["Content-Encoding"] = coding
+    return Response(content=bodies[coding], media_type=CATALOG_MEDIA_TYPES[format], headers=headers)
+
+
+# ===================================
+# ADMIN API - CATALOG CHANGE LOG (delta sync)
+# ===================================
+# Triggers on every catalog table record (version, table, row id, op) into
+# catalog_changes. Rows are stamped with the version the edit's
+# bump_catalog_version() produces, so /api/admin/changes?since=<version>
+# returns what a replica at <version> is missing: the current content of
+# inserted/updated rows and the ids of deleted ones. Updates and deletes
+# also keep the old row as JSON (`before`) for get_catalog(version).
+
+# Versions of history kept at least; a replica further behind reloads
+# all-data. History a stored opening result needs is kept longer.
+CHANGE_LOG_RETENTION = 1000
+
+
+def create_change_log_triggers(cursor):
+    cursor.execute("PRAGMA table_info(catalog_changes)")
+    if 'before' not in [column[1] for column in cursor.fetchall()]:
+        cursor.execute("ALTER TABLE catalog_changes ADD COLUMN before TEXT")
+
+    for table in CATALOG_TABLES:
+        cursor.execute(f"PRAGMA table_info({table})")
+        before = ', '.join(f"'{column[1]}', OLD.{column[1]}" for column in cursor.fetchall())
+        for op, row in (('insert', 'NEW'), ('update', 'NEW'), ('delete', 'OLD')):
+            # Updates and deletes keep the old row so earlier versions can be rebuilt
+            image = 'NULL' if op == 'insert' else f'json_object({before})'
+            cursor.execute(f"DROP TRIGGER IF EXISTS log_{table}_{op}")
+            cursor.execute(f'''
+                CREATE TRIGGER log_{table}_{op} AFTER {op.upper()} ON {table}
+                BEGIN
+                    INSERT INTO catalog_changes (version, table_name, row_id, op, before)
+                    SELECT CAST(value AS INTEGER) + 1, '{table}', {row}.id, '{op}', {image}
+                    FROM metadata WHERE key = 'catalog_version';
+                END
+            ''')
+    # History starts now: a replica older than this has to reload all-data
+    cursor.execute('''
+        INSERT OR IGNORE INTO metadata (key, value)
+        SELECT 'change_log_start', value FROM metadata WHERE key = 'catalog_version'
+    ''')
+
+
+def prune_catalog_changes(cursor):
+    """Drop history older than CHANGE_LOG_RETENTION versions (with the bump),
+    but none after the oldest catalog_version of a stored opening, so
+    get_catalog(version) can still reproduce every stored result"""
+    oldest = get_catalog_version(cursor) - CHANGE_LOG_RETENTION
+    cursor.execute("SELECT MIN(catalog_version) FROM openings")
+    referenced = cursor.fetchone()[0]
+    if referenced is not None:
+        oldest = min(oldest, referenced)
+    cursor.execute("DELETE FROM catalog_changes WHERE version <= ?", (oldest,))
+    if cursor.rowcount:
+        cursor.execute('''
+            UPDATE metadata SET value = CAST(MAX(CAST(value AS INTEGER), ?) AS TEXT)
+            WHERE key = 'change_log_start'
+        ''', (oldest,))
+
+
+def load_catalog_changes(since):
+    """Changes after version `since`, coalesced per row, in one snapshot"""
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN")
+        version = get_catalog_version(cursor)
+        cursor.execute("SELECT CAST(value AS INTEGER) FROM metadata WHERE key = 'change_log_start'")
+        start = cursor.fetchone()[0]
+        if since < start:
+            raise HTTPException(
+                status_code=410,
+                detail=f"Changes before catalog version {start} are not kept; reload /api/admin/all-data",
+            )
+
+        # Last operation per row wins
+        cursor.execute('''
+            SELECT table_name, row_id, op FROM catalog_changes
+            WHERE version > ? ORDER BY id
+        ''', (since,))
+        last_op = {}
+        for table, row_id, op in cursor.fetchall():
+            last_op[(table, row_id)] = op
+
+        changes = {}
+        for table in CATALOG_TABLES:
+            upserted = [row_id for (name, row_id), op in last_op.items() if name == table and op != 'delete']
+            deleted = [row_id for (name, row_id), op in last_op.items() if name == table and op == 'delete']
+            if not upserted and not deleted:
+                continue
+            rows = []
+            for i in range(0, len(upserted), 500):
+                chunk = upserted[i:i + 500]
+                cursor.execute(
+                    f"SELECT * FROM {table} WHERE id IN ({', '.join('?' * len(chunk))}) ORDER BY id", chunk,
+                )
+                rows += rows_to_list(cursor.fetchall())
+            changes[table] = {"upserted": rows, "deleted": sorted(deleted)}
+        conn.commit()
+    finally:
+        conn.close()
+    return {"since": since, "version": version, "changes": changes}
+
+
+@app.get("/api/admin/changes")
+async def get_catalog_changes(since: int):
+    """Catalog rows inserted, updated or deleted after version `since`.
+
+    Returns {since, version, changes: {table: {upserted: [rows], deleted:
+    [ids]}}}; apply it to a replica of /api/admin/all-data taken at `since`
+    (its X-Catalog-Version) and continue from `version`. 410 when `since`
+    is older than the kept history.
+    """
+    return await run_in_threadpool(load_catalog_changes, since)
+
+
+# ===================================
+# ADMIN API - UPDATE ENDPOINTS
+# ===================================
+
+def check_type_id(cursor, type_id):
+    """400 unless `type_id` is a row of types (it picks the calculation method)"""
+    cursor.execute("SELECT 1 FROM types WHERE id = ?", (type_id,))
+    if not cursor.fetchone():
+        raise HTTPException(status_code=400, detail=f"Type {type_id} not found")
+
+
+class UpdateSeriesRequest(BaseModel):
+    type_id: Optional[int] = None
+    name: Optional[str] = None
+    code: Optional[str] = None
+    a: Optional[float] = None
+    b: Optional[float] = None
+    x: Optional[float] = None
+    uf1: Optional[float] = None
+    uf2: Optional[float] = None
+    e: Optional[float] = None
+    f: Optional[float] = None
+    e_narrow: Optional[float] = None
+    f_narrow: Optional[float] = None
+    image_url: Optional[str] = None
+
+
+@app.put("/api/admin/series/{series_id}")
+async def update_series(series_id: int, req: UpdateSeriesRequest, background_tasks: BackgroundTasks):
+    conn = get_db()
+    cursor = conn.cursor()
+    if req.type_id is not None:
+        try:
+            check_type_id(cursor, req.type_id)
+        except HTTPException:
+            conn.close()
+            raise
+    
+    updates = []
+    values = []
+    
+    for field in ['type_id', 'name', 'code', 'a', 'b', 'x', 'uf1', 'uf2', 'e', 'f', 'e_narrow', 'f_narrow', 'image_url']:
+        val = getattr(req, field)
+        if val is not None:
+            updates.append(f"{field} = ?")
+            values.append(val)
+    
+    if updates:
+        values.append(series_id)
+        cursor.execute(f"UPDATE series SET {', '.join(updates)} WHERE id = ?", values)
+        record_catalog_change(cursor, background_tasks, 'series_id', series_id)
+        conn.commit()
+    
+    cursor.execute("SELECT * FROM series WHERE id = ?", (series_id,))
+    result = row_to_dict(cursor.fetchone())
+    conn.close()
+    return result
+
+
+class UpdateCategoryRequest(BaseModel):
+    # moves the category to the calculation method of that type
+    type_id: Optional[int] = None
+    name: Optional[str] = None
+    num_glasses: Optional[int] = None
+    has_special_calculation: Optional[bool] = None
+    image_url: Optional[str] = None
+
+
+@app.put("/api/admin/categories/{category_id}")
+async def update_category(category_id: int, req: UpdateCategoryRequest, background_tasks: BackgroundTasks):
+    conn = get_db()
+    cursor = conn.cursor()
+    if req.type_id is not None:
+        try:
+            check_type_id(cursor, req.type_id)
+        except HTTPException:
+            conn.close()
+            raise
+    
+    updates = []
+    values = []
+    
+    for field in ['type_id', 'name', 'num_glasses', 'has_special_calculation', 'image_url']:
+        val = getattr(req, field)
+        if val is not None:
+            updates.append(f"{field} = ?")
+            values.append(val)
+    
+    if updates:
+        values.append(category_id)
+        cursor.execute(f"UPDATE categories SET {', '.join(updates)} WHERE id = ?", values)
+        record_catalog_change(cursor, background_tasks, 'category_id', category_id)
+        conn.commit()
+    
+    cursor.execute("SELECT * FROM categories WHERE id = ?", (category_id,))
+    result = row_to_dict(cursor.fetchone())
+    conn.close()
+    return result
+
+
+class UpdateParamsRequest(BaseModel):
+    gw_divisor: Optional[float] = None
+    gw_offset: Optional[float] = None
+    gh_offset: Optional[float] = None
+    narrow_gw_offset: Optional[float] = None
+
+
+@app.put("/api/admin/series-category-params/{param_id}")
+async def update_params(param_id: int, req: UpdateParamsRequest, background_tasks: BackgroundTasks):
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    updates = []
+    values = []
+    
+    for field in ['gw_divisor', 'gw_offset', 'gh_offset', 'narrow_gw_offset']:
+        val = getattr(req, field)
+        if val is not None:
+            updates.append(f"{field} = ?")
+            values.append(val)
+    
+    if updates:
+        values.append(param_id)
+        cursor.execute(f"UPDATE series_category_params SET {', '.join(updates)} WHERE id = ?", values)
+        record_catalog_change(cursor, background_tasks, 'params_id', param_id)
+        conn.commit()
+    
+    cursor.execute("SELECT * FROM series_category_params WHERE id = ?", (param_id,))
+    result = row_to_dict(cursor.fetchone())
+    conn.close()
+    return result
+
+
+# ===================================
+# ADMIN API - CREATE ENDPOINTS
+# ===================================
+# New categories and driver/category links, e.g. the opening (casement)
+# configurations the seed does not have: a category of type 2 is calculated
+# by OPENING_METHOD once drivers of a series are linked to it.
+
+class CreateCategoryRequest(BaseModel):
+    type_id: int
+    name: str
+    num_glasses: int = Field(ge=1)
+    has_special_calculation: bool = False
+    image_url: Optional[str] = None
+
+
+@app.post("/api/admin/categories")
+async def create_category(req: CreateCategoryRequest, background_tasks: BackgroundTasks):
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        check_type_id(cursor, req.type_id)
+        cursor.execute('''
+            INSERT INTO categories (type_id, name, num_glasses, has_special_calculation, image_url)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (req.type_id, req.name, req.num_glasses, req.has_special_calculation, req.image_url))
+        category_id = cursor.lastrowid
+        # No opening uses the new category yet
+        record_catalog_change(cursor, background_tasks, 'category_id')
+        conn.commit()
+        cursor.execute("SELECT * FROM categories WHERE id = ?", (category_id,))
+        return row_to_dict(cursor.fetchone())
+    finally:
+        conn.close()
+
+
+class CreateDriverCategoryRequest(BaseModel):
+    driver_id: int
+    category_id: int
+
+
+@app.post("/api/admin/driver-categories")
+async def create_driver_category(req: CreateDriverCategoryRequest, background_tasks: BackgroundTasks):
+    """Offer the driver (and so its series) with the category"""
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        for table, row_id, detail in (
+            ('drivers', req.driver_id, "Driver not found"), ('categories', req.category_id, "Category not found"),
+        ):
+            cursor.execute(f"SELECT 1 FROM {table} WHERE id = ?", (row_id,))
+            if not cursor.fetchone():
+                raise HTTPException(status_code=404, detail=detail)
+        try:
+            cursor.execute(
+                "INSERT INTO driver_categories (driver_id, category_id) VALUES (?, ?)", (req.driver_id, req.category_id),
+            )
+        except sqlite3.IntegrityError:
+            conn.rollback()
+            raise HTTPException(status_code=409, detail="The driver is already linked to this category")
+        link_id = cursor.lastrowid
+        record_catalog_change(cursor, background_tasks, 'category_id')
+        conn.commit()
+        cursor.execute("SELECT * FROM driver_categories WHERE id = ?", (link_id,))
+        return row_to_dict(cursor.fetchone())
+    finally:
+        conn.close()
+
+
+@app.delete("/api/admin/driver-categories/{link_id}")
+async def delete_driver_category(link_id: int, background_tasks: BackgroundTasks):
+    """Stop offering the driver with the category; stored openings keep
+    their results"""
+    conn = get_db()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM driver_categories WHERE id = ?", (link_id,))
+        if not cursor.rowcount:
+            raise HTTPException(status_code=404, detail="Driver category not found")
+        record_catalog_change(cursor, background_tasks, 'category_id')
+        conn.commit()
+        return {"deleted": link_id}
+    finally:
+        conn.close()
+
+
+class FormulaDefinition(BaseModel):
+    name: str
+    expression: str
+
+
+class UpdateFormulasRequest(BaseModel):
+    formulas: List[FormulaDefinition]
+
+
+def builtin_method_or_404(method_name):
+    if method_name not in DEFAULT_FORMULAS:
+        raise HTTPException(status_code=404, detail="Calculation method not found")
+    return method_name
+
+
+def method_formulas(catalog, method_name):
+    rows = sorted(
+        (formula for formula in catalog.formulas.values() if formula.method == method_name),
+        key=lambda formula: (formula.position, formula.id),
+    )
+    definitions = [(formula.name, formula.expression) for formula in rows] or DEFAULT_FORMULAS[method_name]
+    return {
+        "method": method_name,
+        "custom": bool(rows),
+        "formulas": [{"name": name, "expression": expression} for name, expression in definitions],
+    }
+
+
+def replace_method_formulas(cursor, background_tasks, method_name, definitions):
+    """Store the formulas of a method (none: back to the built-in ones) and
+    invalidate the openings of the categories it calculates"""
+    cursor.execute("DELETE FROM formulas WHERE method = ?", (method_name,))
+    cursor.executemany(
+        "INSERT INTO formulas (method, position, name, expression) VALUES (?, ?, ?, ?)",
+        [(method_name, position, name, expression) for position, (name, expression) in enumerate(definitions)],
+    )
+    type_ids = [type_id for type_id, method in TYPE_METHODS.items() if method.name == method_name]
+    cursor.execute(
+        f"SELECT id FROM categories WHERE type_id IN ({', '.join('?' * len(type_ids))})", type_ids,
+    )
+    record_catalog_change(cursor, background_tasks, 'category_id', *[row[0] for row in cursor.fetchall()])
+
+
+def formula_trial_problem(catalog, method_name, definitions):
+    """Run a formula set before it is stored: every configuration of the
+    categories of the method, at the corners of CALCULATION_LIMITS with and
+    without narrow and rolo. The first one without a finite result (e.g. a
+    division by Aw - Aw) as a message, or None."""
+    method = formula_method(method_name, definitions)
+    type_ids = {type_id for type_id, builtin in TYPE_METHODS.items() if builtin.name == method_name}
+    limits = CALCULATION_LIMITS
+    corners = list(itertools.product(
+        limits['plaisio_width'], limits['plaisio_height'], limits['ug_value'], (min(PSI_VALUES), max(PSI_VALUES)),
+        (False, True), (None, limits['rolo_height'][0]),
+    ))
+    tried = set()
+    for link in catalog.driver_categories.values():
+        driver = catalog.drivers.get(link.driver_id)
+        category = catalog.categories.get(link.category_id)
+        if driver is None or category is None or category.type_id not in type_ids:
+            continue
+        if category.has_special_calculation and not method.special:
+            continue
+        series = catalog.series.get(driver.series_id)
+        for sash in catalog.sashes.values():
+            if series is None or sash.series_id != series.id or (series.id, category.id, sash.id) in tried:
+                continue
+            tried.add((series.id, category.id, sash.id))
+            params = catalog.params.get((series.id, category.id, sash.id)) or catalog.params.get((series.id, category.id, None))
+            if params is None and method.uses_params:
+                continue
+            for width, height, ug_value, psi_value, is_narrow, rolo_height in corners:
+                req = CalculationRequest(
+                    series_id=series.id, category_id=category.id, driver_id=driver.id, sash_id=sash.id,
+                    plaisio_width=width, plaisio_height=height, ug_value=ug_value, psi_value=psi_value,
+                    is_narrow=is_narrow, has_rolo=rolo_height is not None, rolo_height=rolo_height,
+                    ur_value=limits['ur_value'][1] if rolo_height else None,
+                )
+                try:
+                    if finite_result(method.compute(req, series, category, sash, driver, params)):
+                        continue
+                    reason = "no finite result"
+                except ArithmeticError as exc:
+                    reason = "a division by zero" if isinstance(exc, ZeroDivisionError) else "no finite result"
+                return (
+                    f"The formulas give {reason} for {series.name} / {category.name} / {sash.name} "
+                    f"at {width:g}×{height:g} mm, Ug {ug_value:g}, Psi {psi_value:g}"
+                    f"{', narrow' if is_narrow else ''}{f', rolo {rolo_height:g} mm' if rolo_height else ''}"
+                )
+    return None
+
+
+@app.get("/api/admin/formulas")
+async def get_formulas():
+    """Formulas of every calculation method, the built-in ones where not replaced"""
+    catalog = await run_in_threadpool(get_catalog)
+    return {
+        "inputs": FORMULA_INPUTS,
+        "outputs": FORMULA_OUTPUTS,
+        "methods": [method_formulas(catalog, method_name) for method_name in DEFAULT_FORMULAS],
+    }
+
+
+@app.put("/api/admin/formulas/{method_name}")
+async def update_formulas(method_name: str, req: UpdateFormulasRequest, background_tasks: BackgroundTasks):
+    """Replace the formulas of a method; they are checked, compiled and run
+    against the catalog's configurations first (400 on a problem)"""
+    builtin_method_or_404(method_name)
+    definitions = [(formula.name.strip(), formula.expression) for formula in req.formulas]
+    try:
+        compile_formulas(method_name, definitions)
+    except FormulaError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    catalog = await run_in_threadpool(get_catalog)
+    problem = await run_in_threadpool(formula_trial_problem, catalog, method_name, definitions)
+    if problem:
+        raise HTTPException(status_code=400, detail=problem)
+
+    conn = get_db()
+    cursor = conn.cursor()
+    replace_method_formulas(cursor, background_tasks, method_name, definitions)
+    conn.commit()
+    conn.close()
+    return method_formulas(await run_in_threadpool(get_catalog), method_name)
+
+
+@app.delete("/api/admin/formulas/{method_name}")
+async def reset_formulas(method_name: str, background_tasks: BackgroundTasks):
+    """Go back to the built-in formulas of a method"""
+    builtin_method_or_404(method_name)
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM formulas WHERE method = ?", (method_name,))
+    if cursor.fetchone()[0]:
+        replace_method_formulas(cursor, background_tasks, method_name, [])
+        conn.commit()
+    conn.close()
+    return method_formulas(await run_in_threadpool(get_catalog), method_name)
+
+
+class UwLimitDefinition(BaseModel):
+    climate_zone: str
+    building_use: str
+    max_uw: float
+
+
+class UpdateUwLimitsRequest(BaseModel):
+    limits: List[UwLimitDefinition]
+
+
+def uw_limit_list(catalog):
+    return [
+        {"climate_zone": zone, "building_use": use, "max_uw": max_uw}
+        for (zone, use), max_uw in sorted(catalog.uw_limits.items())
+    ]
+
+
+@app.get("/api/admin/uw-limits")
+async def get_uw_limits():
+    """Maximum Uw per climate zone and building use (compliance screening)"""
+    return uw_limit_list(await run_in_threadpool(get_catalog))
+
+
+@app.put("/api/admin/uw-limits")
+async def update_uw_limits(req: UpdateUwLimitsRequest, background_tasks: BackgroundTasks):
+    """Replace the Uw limit table"""
+    rows = [(limit.climate_zone.strip(), limit.building_use.strip(), limit.max_uw) for limit in req.limits]
+    if not all(zone and use for zone, use, _ in rows):
+        raise HTTPException(status_code=400, detail="Climate zone and building use must not be empty")
+    if not all(max_uw > 0 for _, _, max_uw in rows):
+        raise HTTPException(status_code=400, detail="max_uw must be positive")
+    if len({(zone, use) for zone, use, _ in rows}) < len(rows):
+        raise HTTPException(status_code=400, detail="Duplicate climate zone and building use")
+
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM uw_limits")
+    cursor.executemany("INSERT INTO uw_limits (climate_zone, building_use, max_uw) VALUES (?, ?, ?)", rows)
+    # Limits are not stored with the openings: nothing to recalculate
+    record_catalog_change(cursor, background_tasks, 'category_id')
+    conn.commit()
+    conn.close()
+    return uw_limit_list(await run_in_threadpool(get_catalog))
+
+
+# ===================================
+# ADMIN API - IMAGES (uploads and resized variants)
+# ===================================
+# PUT /api/admin/<types|categories|series>/<id>/image takes the image file
+# as the request body. The upload is stored in MEDIA_DIR under its content
+# hash and a worker thread writes IMAGE_WIDTHS-wide WebP variants, each
+# with a JPEG of the same name on white for browsers without WebP (never
+# wider than the original), then points the row's image_url at the
+# IMAGE_URL_WIDTH WebP. /media/<file> serves them as immutable: a new image
+# has a new name. Resizing needs Pillow; without it the original itself is
+# served and the row points to it right away. Bodies over IMAGE_MAX_BYTES
+# are refused on their Content-Length, or once the streamed body is over.
+
+MEDIA_DIR = os.environ.get("MEDIA_DIR", "media")
+MEDIA_URL = "/media"
+IMAGE_WIDTHS = (320, 640, 1280)
+IMAGE_URL_WIDTH = 640
+IMAGE_MAX_BYTES = 15 * 1024 * 1024
+# Larger images are refused (Pillow's decompression bomb check); a
+# decoded 25 megapixel image is about 100 MB as RGBA
+IMAGE_MAX_PIXELS = 25_000_000
+IMAGE_TABLES = ('types', 'categories', 'series')
+
+# Content-Type -> extension of the stored original
+IMAGE_TYPES = {'image/jpeg': 'jpg', 'image/png': 'png', 'image/webp': 'webp', 'image/gif': 'gif'}
+MEDIA_TYPES = {'jpg': 'image/jpeg', 'png': 'image/png', 'webp': 'image/webp', 'gif': 'image/gif'}
+MEDIA_FILE_RE = re.compile(r'^[0-9a-f]{16}(-\d+w)?\.(jpg|png|webp|gif)$')
+# Leading bytes of each type, checked when Pillow is not there to open it
+IMAGE_SIGNATURES = {'jpg': (b'\xff\xd8\xff',), 'png': (b'\x89PNG',), 'gif': (b'GIF87a', b'GIF89a'), 'webp': (b'RIFF',)}
+
+if Image is not None:
+    Image.MAX_IMAGE_PIXELS = IMAGE_MAX_PIXELS
+
+image_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='images')
+
+# content hash -> {"status": processing/done/failed, "variants": [url, ...]},
+# kept by the worker process that received the upload
+image_jobs = {}
+# content hash -> rows [(catalog name, table, id)] waiting for its variants
+image_targets = {}
+# (catalog name, table, row id) -> hash of its latest upload; an older job
+# finishing late does not overwrite a newer image
+latest_images = {}
+image_jobs_lock = threading.Lock()
+
+
+def media_url(filename):
+    return f"{MEDIA_URL}/{filename}"
+
+
+def variant_url(digest, variants):
+    """The variant image_url points to: the IMAGE_URL_WIDTH WebP, the widest
+    WebP of a smaller original, or the original without Pillow"""
+    preferred = media_url(f"{digest}-{IMAGE_URL_WIDTH}w.webp")
+    if preferred in variants:
+        return preferred
+    webp = [url for url in variants if url.endswith('.webp')]
+    return webp[-1] if webp else variants[-1]
+
+
+def write_media_file(filename, data):
+    os.makedirs(MEDIA_DIR, exist_ok=True)
+    path = os.path.join(MEDIA_DIR, filename)
+    temp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def image_variants(data):
+    """Encoded (filename suffix, bytes) of every resized variant, narrowest
+    first, WebP then JPEG. The image is decoded (JPEG: at a reduced scale)
+    and shrunk to the widest variant before it is converted, so a large
+    upload never exists in memory at full size in RGBA; the JPEG is the
+    resized variant laid on white."""
+    image = Image.open(io.BytesIO(data))
+    widest = max(IMAGE_WIDTHS)
+    # Either side may become the width after the EXIF rotation
+    image.draft('RGB', (widest, widest))
+    image = ImageOps.exif_transpose(image)
+    widths = [width for width in IMAGE_WIDTHS if width < image.width] or [image.width]
+    if image.mode in ('1', 'P'):
+        # Pillow resizes palette images without filtering
+        image = image.convert('RGBA')
+    image.thumbnail((widths[-1], image.height), Image.LANCZOS)
+    image = image.convert('RGBA')
+    variants = []
+    for width in widths:
+        size = (width, max(1, round(image.height * width / image.width)))
+        resized = image if size == image.size else image.resize(size, Image.LANCZOS)
+        opaque = Image.new('RGB', size, (255, 255, 255))
+        opaque.paste(resized, mask=resized.getchannel('A'))
+        webp, jpeg = io.BytesIO(), io.BytesIO()
+        resized.save(webp, 'WEBP', quality=80, method=4)
+        opaque.save(jpeg, 'JPEG', quality=82, optimize=True, progressive=True)
+        variants += [(f"-{width}w.webp", webp.getvalue()), (f"-{width}w.jpg", jpeg.getvalue())]
+    return variants
+
+
+def set_image_url(name, table, row_id, digest, url, loop):
+    """Point the row at its image (worker thread) unless a newer upload replaced it"""
+    with image_jobs_lock:
+        if latest_images.get((name, table, row_id)) != digest:
+            return
+    token = current_catalog_name.set(name)
+    try:
+        conn = get_db()
+        cursor = conn.cursor()
+        cursor.execute(f"UPDATE {table} SET image_url = ? WHERE id = ?", (url, row_id))
+        if cursor.rowcount:
+            # record_catalog_change() without the openings: images do not
+            # change results
+            bump_catalog_version(cursor)
+            prune_catalog_changes(cursor)
+        conn.commit()
+        conn.close()
+    finally:
+        current_catalog_name.reset(token)
+    expire_catalog(name)
+    asyncio.run_coroutine_threadsafe(catalog_events.poll(name), loop)
+
+
+def process_image(digest, data, loop):
+    """Write the variants of an upload and point the waiting rows at them
+    (worker thread)"""
+    try:
+        variants = image_variants(data)
+        for suffix, body in variants:
+            write_media_file(f"{digest}{suffix}", body)
+    except Exception as exc:
+        with image_jobs_lock:
+            image_jobs[digest] = {"status": "failed", "variants": [], "detail": str(exc)}
+            image_targets.pop(digest, None)
+        logger.warning("Image %s could not be resized: %s", digest, exc)
+        return
+    urls = [media_url(f"{digest}{suffix}") for suffix, _ in variants]
+    with image_jobs_lock:
+        image_jobs[digest] = {"status": "done", "variants": urls}
+        targets = image_targets.pop(digest, [])
+    for name, table, row_id in targets:
+        set_image_url(name, table, row_id, digest, variant_url(digest, urls), loop)
+
+
+async def read_image_body(request):
+    """The request body; 413 past IMAGE_MAX_BYTES, before reading when the
+    Content-Length says so, else as soon as the streamed body goes over"""
+    too_large = HTTPException(status_code=413, detail=f"Images are limited to {IMAGE_MAX_BYTES // (1024 * 1024)} MB")
+    length = request.headers.get('content-length', '')
+    if length.isdigit() and int(length) > IMAGE_MAX_BYTES:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > IMAGE_MAX_BYTES:
+            raise too_large
+    return bytes(body)
+
+
+def check_image(data, ext):
+    """400 unless `data` is an image of its declared type"""
+    if Image is None:
+        if not data.startswith(IMAGE_SIGNATURES[ext]):
+            raise HTTPException(status_code=400, detail="Upload is not a valid image")
+        return
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.verify()
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+        raise HTTPException(status_code=400, detail="Upload is not a valid image")
+
+
+@app.put("/api/admin/{table}/{row_id}/image")
+async def upload_image(table: str, row_id: int, request: Request):
+    """Store an uploaded image (the request body) for a type, category or
+    series. Returns the content `hash`, the job `status` and the variant
+    URLs; with Pillow the variants are made in the background (poll
+    /api/admin/images/{hash}) and image_url is set when they are written."""
+    if table not in IMAGE_TABLES:
+        raise HTTPException(status_code=404, detail="Images are kept for types, categories and series")
+    ext = IMAGE_TYPES.get(request.headers.get('content-type', '').split(';')[0].strip().lower())
+    if ext is None:
+        raise HTTPException(status_code=415, detail=f"Image must be one of {', '.join(IMAGE_TYPES)}")
+    data = await read_image_body(request)
+    await run_in_threadpool(check_image, data, ext)
+
+    name = current_catalog_name.get()
+    if await catalog_query(f"SELECT id FROM {table} WHERE id = ?", (row_id,), one=True) is None:
+        raise HTTPException(status_code=404, detail="Record not found")
+
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    await run_in_threadpool(write_media_file, f"{digest}.{ext}", data)
+    target = (name, table, row_id)
+    with image_jobs_lock:
+        latest_images[target] = digest
+        job = image_jobs.get(digest)
+        if Image is None:
+            job = image_jobs[digest] = {"status": "done", "variants": [media_url(f"{digest}.{ext}")]}
+        elif job is None or job["status"] == "failed":
+            job = image_jobs[digest] = {"status": "processing", "variants": []}
+            image_targets[digest] = [target]
+            image_executor.submit(process_image, digest, data, asyncio.get_running_loop())
+        elif job["status"] == "processing":
+            image_targets[digest].append(target)
+
+    if job["status"] == "done":
+        # Without Pillow, or the same content as an earlier upload
+        await run_in_threadpool(
+            set_image_url, name, table, row_id, digest, variant_url(digest, job["variants"]), asyncio.get_running_loop(),
+        )
+        return {"hash": digest, **job}
+    return JSONResponse({"hash": digest, **job}, status_code=202)
+
+
+@app.get("/api/admin/images/{digest}")
+async def get_image_job(digest: str):
+    job = image_jobs.get(digest)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return {"hash": digest, **job}
+
+
+@app.get("/media/{filename}")
+async def get_media(filename: str):
+    """Uploaded images and their variants; names change with the content"""
+    path = os.path.join(MEDIA_DIR, filename)
+    if not MEDIA_FILE_RE.match(filename) or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="File not found")
+    return FileResponse(
+        path,
+        media_type=MEDIA_TYPES[filename.rsplit('.', 1)[1]],
+        headers={"Cache-Control": "public, max-age=31536000, immutable"},
+    )
+
+
+# ===================================
+# WARM-UP AND READINESS
+# ===================================
+# A fresh worker warms the default catalog in the background at startup:
+# it loads the snapshot, compiles the configuration table, builds the
+# cached responses (all-data, the coefficient bundle, the list columns) and
+# calculates a sample opening of every configuration, once through
+# compute_uw() and once through the batch path. /api/health only says the
+# process is up; /api/ready answers 503 until the warm-up has finished, so
+# a load balancer sends traffic to warm workers only. POST
+# /api/admin/warm-up warms the request's catalog again (e.g. after a large
+# import). WARM_UP=0 skips the startup warm-up (ready at once).
+
+WARM_UP = os.environ.get("WARM_UP", "1") not in ("", "0")
+
+# Inputs of the sample opening of each configuration
+WARM_UP_OPENING = {'plaisio_width': 1500, 'plaisio_height': 1500, 'ug_value': 1.6, 'psi_value': 0.08}
+
+# Configurations whose sample calculation failed, listed in the state
+MAX_WARM_UP_ERRORS = 10
+
+# catalog name -> state of its last finished warm-up, kept by this worker
+warm_up_states = {}
+# catalogs being warmed; a warm catalog stays ready meanwhile
+warming_catalogs = set()
+warm_up_flight = SingleFlight("warm-up")
+
+
+def warm_up(name):
+    """Warm catalog `name` (worker thread); returns and keeps its state"""
+    state = {"status": "warming", "catalog_version": None, "timings_ms": {}}
+    timings = state["timings_ms"]
+    warming_catalogs.add(name)
+    token = current_catalog_name.set(name)
+    start = time.perf_counter()
+
+    def step(label, fn, *args):
+        step_start = time.perf_counter()
+        result = fn(*args)
+        timings[label] = round((time.perf_counter() - step_start) * 1000, 3)
+        return result
+
+    try:
+        catalog = step('catalog', get_catalog)
+        step('compile', compiled_catalog, catalog)
+        step('all_data', build_encoded_catalog, 'json')
+        step('bundle', encoded_coefficient_bundle)
+        step('columns', lambda: [table_columns(table) for table in ('types', 'series', 'categories', 'drivers', 'sashes')])
+
+        keys = step('configurations', catalog_configurations, catalog)
+        openings = [
+            {
+                **WARM_UP_OPENING,
+                "series_id": series_id,
+                "category_id": category_id,
+                "driver_id": driver_ids[0],
+                "sash_id": sash_id,
+            }
+            for series_id, configurations in keys.items()
+            for (category_id, sash_id), driver_ids in configurations.items()
+        ]
+
+        def calculate_openings():
+            # A configuration that cannot be calculated is reported, it
+            # does not keep the worker out of rotation
+            errors = []
+            for opening in openings:
+                try:
+                    run_calculation(CalculationRequest(**opening))
+                except Exception as exc:
+                    detail = exc.detail if isinstance(exc, HTTPException) else f"{type(exc).__name__}: {exc}"
+                    errors.append({**{field: opening[field] for field in ConfigKey._fields}, "detail": detail})
+            return errors
+
+        errors = step('calculate', calculate_openings)
+        state["failed"] = len(errors)
+        state["errors"] = errors[:MAX_WARM_UP_ERRORS]
+        if errors:
+            logger.warning("Warm-up of catalog %s: %d configurations failed, e.g. %s", name, len(errors), errors[0])
+        if openings:
+            step('batch', run_batch_calculation, openings)
+        state["configurations"] = len(openings)
+        state["catalog_version"] = catalog.version
+        state["status"] = "ready"
+    except HTTPException:
+        # No such catalog
+        raise
+    except Exception as exc:
+        state["status"] = "failed"
+        state["detail"] = str(exc)
+        logger.exception("Warm-up of catalog %s failed", name)
+    finally:
+        current_catalog_name.reset(token)
+        warming_catalogs.discard(name)
+    timings["total"] = round((time.perf_counter() - start) * 1000, 3)
+    state["warmed_at"] = time.time()
+    warm_up_states[name] = state
+    return state
+
+
+@app.get("/api/ready")
+async def readiness_check():
+    """200 once this worker has warmed the default catalog, else 503. A
+    warm-up started later reports the earlier state meanwhile."""
+    state = warm_up_states.get(DEFAULT_CATALOG)
+    if state is None:
+        if DEFAULT_CATALOG in warming_catalogs:
+            state = {"status": "warming"}
+        else:
+            state = {"status": "ready" if not WARM_UP else "pending"}
+    state = {**state, "warming": DEFAULT_CATALOG in warming_catalogs}
+    return JSONResponse(state, status_code=200 if state["status"] == "ready" else 503)
+
+
+@app.post("/api/admin/warm-up")
+async def trigger_warm_up():
+    """Warm the request's catalog now and return the timings"""
+    name = current_catalog_name.get()
+    return await warm_up_flight.do(name, warm_up, name)
+
+
+@app.get("/api/health")
+async def health_check():
+    return {"status": "healthy", "database": DB_PATH}
+
+
+@app.get("/api/catalogs")
+async def get_catalogs():
+    """Available catalogs and which of them are resident in memory"""
+    names = [DEFAULT_CATALOG]
+    if os.path.isdir(CATALOG_DIR):
+        names += sorted(
+            file[:-3] for file in os.listdir(CATALOG_DIR)
+            if file.endswith('.db') and CATALOG_NAME_RE.match(file[:-3])
+        )
+    resident = dict(resident_catalogs)
+    return [
+        {
+            "name": name,
+            "resident": name in resident,
+            "version": resident[name].version if name in resident else None,
+        }
+        for name in names
+    ]
+
+
+@app.get("/api/metrics")
+async def get_metrics():
+    return {
+        "singleflight": {
+            flight.name: flight.stats() for flight in (calculation_flight, catalog_flight)
+        },
+        "catalog_events": catalog_events.stats(),
+        "live": live_stats,
+        "admission": {name: lane.stats() for name, lane in admission_lanes.items()},
+        "sql": sql_trace_stats() if SQL_TRACE else None,
+    }
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Window Uw calculator")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("serve", help="run the API server (default)")
+    aggregate = commands.add_parser("aggregate", help="building totals for an NDJSON file of openings")
+    aggregate.add_argument("file", nargs="?", default="-", help="NDJSON openings, '-' for stdin")
+    aggregate.add_argument("--group-by", default="", help=f"comma separated: {', '.join(AGGREGATE_GROUP_FIELDS)}")
+    aggregate.add_argument("--catalog", default=DEFAULT_CATALOG)
+    tables = commands.add_parser("tables", help="write the precomputed Uw tables for the frontend")
+    tables.add_argument("--out", default=UW_TABLE_DIR)
+    tables.add_argument("--check", action="store_true", help="verify the written tables against live results")
+    tables.add_argument("--catalog", default=DEFAULT_CATALOG)
+    glass = commands.add_parser("glass", help="glass order and cutting layouts for an NDJSON file of openings")
+    glass.add_argument("file", nargs="?", default="-", help="NDJSON openings, '-' for stdin")
+    glass.add_argument("--sheet", default=f"{GLASS_SHEET_WIDTH}x{GLASS_SHEET_HEIGHT}", help="sheet size in mm, WIDTHxHEIGHT")
+    glass.add_argument("--trim", type=float, default=0, help="edge trim of the sheet (mm)")
+    glass.add_argument("--gap", type=float, default=0, help="cutting allowance between panes (mm)")
+    glass.add_argument("--no-rotate", action="store_true", help="keep panes upright (patterned glass)")
+    glass.add_argument("--bench", type=int, metavar="N", help="time the nesting of N random openings instead")
+    glass.add_argument("--catalog", default=DEFAULT_CATALOG)
+    profiles = commands.add_parser("profiles", help="profile cutting list for an NDJSON file of openings")
+    profiles.add_argument("file", nargs="?", default="-", help="NDJSON openings, '-' for stdin")
+    profiles.add_argument("--bar", type=float, default=PROFILE_BAR_LENGTH, help="stock bar length (mm)")
+    profiles.add_argument("--kerf", type=float, default=PROFILE_SAW_KERF, help="saw kerf (mm)")
+    profiles.add_argument("--trim", type=float, default=0, help="cut off each end of a bar (mm)")
+    profiles.add_argument("--bench", type=int, metavar="N", help="time the cutting list of N random openings instead")
+    profiles.add_argument("--catalog", default=DEFAULT_CATALOG)
+    compliance = commands.add_parser("compliance", help="Uw limit screening of an NDJSON file of openings")
+    compliance.add_argument("file", nargs="?", default="-", help="NDJSON openings, '-' for stdin")
+    compliance.add_argument("--zone", help="climate zone of openings without `climate_zone`")
+    compliance.add_argument("--use", default=COMPLIANCE_BUILDING_USE, help="building use of openings without `building_use`")
+    compliance.add_argument("--bench", type=int, metavar="N", help="time the screening of N random openings instead")
+    compliance.add_argument("--catalog", default=DEFAULT_CATALOG)
+    formulas = commands.add_parser("formulas", help="check the built-in formulas compiled against the hand-written methods")
+    formulas.add_argument("--bench", action="store_true", help="also print the time per calculation of both")
+    formulas.add_argument("--rows", type=int, default=2000)
+    formulas.add_argument("--catalog", default=DEFAULT_CATALOG)
+    args = parser.parse_args(argv)
+
+    if args.command == "glass":
+        current_catalog_name.set(args.catalog)
+        try:
+            sheet_width, sheet_height = (float(size) for size in args.sheet.lower().split('x'))
+            sheet = glass_sheet(sheet_width, sheet_height, args.trim, args.gap, not args.no_rotate)
+            if args.bench:
+                benchmark_glass_nesting(args.bench, sheet)
+                return
+            if args.file == "-":
+                openings = [parse_ndjson_line(line) for line in sys.stdin if line.strip()]
+            else:
+                with open(args.file, encoding="utf-8") as lines:
+                    openings = [parse_ndjson_line(line) for line in lines if line.strip()]
+            result = glass_cutting_plan(openings, sheet)
+        except ValueError:
+            parser.error("--sheet must be WIDTHxHEIGHT")
+        except HTTPException as exc:
+            parser.error(exc.detail)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        return
+
+    if args.command == "profiles":
+        current_catalog_name.set(args.catalog)
+        try:
+            bar = profile_bar(args.bar, args.kerf, args.trim)
+            if args.bench:
+                benchmark_profile_cutting(args.bench, bar)
+                return
+            if args.file == "-":
+                openings = [parse_ndjson_line(line) for line in sys.stdin if line.strip()]
+            else:
+                with open(args.file, encoding="utf-8") as lines:
+                    openings = [parse_ndjson_line(line) for line in lines if line.strip()]
+            result = profile_cutting_plan(openings, bar)
+        except HTTPException as exc:
+            parser.error(exc.detail)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        return
+
+    if args.command == "compliance":
+        current_catalog_name.set(args.catalog)
+        if args.bench:
+            benchmark_compliance(args.bench, args.zone or 'D', args.use)
+            return
+        try:
+            if args.file == "-":
+                openings = [parse_ndjson_line(line) for line in sys.stdin if line.strip()]
+            else:
+                with open(args.file, encoding="utf-8") as lines:
+                    openings = [parse_ndjson_line(line) for line in lines if line.strip()]
+            result = run_compliance_screening(openings, args.zone, args.use)
+        except HTTPException as exc:
+            parser.error(exc.detail)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        return
+
+    if args.command == "formulas":
+        current_catalog_name.set(args.catalog)
+        problems = check_default_formulas(args.rows, args.bench)
+        for problem in problems[:20]:
+            print(problem, file=sys.stderr)
+        print(f"{len(problems)} problem(s)" if problems else "Compiled formulas match the hand-written methods")
+        sys.exit(1 if problems else 0)
+
+    if args.command == "tables":
+        current_catalog_name.set(args.catalog)
+        if args.check:
+            problems = check_uw_tables(args.out)
+            for problem in problems:
+                print(problem, file=sys.stderr)
+            print(f"{len(problems)} problem(s)" if problems else "Uw tables match live results")
+            sys.exit(1 if problems else 0)
+        manifest = write_uw_tables(args.out)
+        print(f"Wrote {len(manifest['files'])} table file(s) for catalog version {manifest['catalog_version']} to {args.out}")
+        return
+
+    if args.command == "aggregate":
+        current_catalog_name.set(args.catalog)
+        group_by = [field for field in args.group_by.split(',') if field]
+        try:
+            if args.file == "-":
+                result = aggregate_lines(sys.stdin, group_by)
+            else:
+                with open(args.file, encoding="utf-8") as lines:
+                    result = aggregate_lines(lines, group_by)
+        except HTTPException as exc:
+            parser.error(exc.detail)
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        return
+
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=8000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# benchmarks/bench_catalog_records.py
+"""Dict-per-row vs slotted catalog records.
+
+Builds a synthetic catalog (thousands of series and params rows) in a
+temporary database and compares the old representation (`rows_to_list`,
+one dict per sqlite3.Row) with the slotted records of the in-memory catalog:
+memory held, load time, field access as done by compute_uw(), and the
+per-request lookup of a calculation's rows.
+
+Usage: python benchmarks/bench_catalog_records.py [num_series]
+"""
+import os
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import backend  # noqa: E402
+
+
+def build_catalog(num_series):
+    backend.init_db()
+    conn = backend.get_db()
+    cursor = conn.cursor()
+    for i in range(num_series):
+        cursor.execute('''
+            INSERT INTO series (type_id, name, code, a, b, x, uf1, uf2, e, f, e_narrow, f_narrow)
+            VALUES (1, ?, ?, 83, 51, 4.5, 4.2, 4.5, 99, 99, NULL, NULL)
+        ''', (f'BENCH{i}', str(i)))
+        series_id = cursor.lastrowid
+        cursor.execute("INSERT INTO sashes (series_id, name, b_override) VALUES (?, ?, NULL)", (series_id, f'{i}-301'))
+        cursor.execute("INSERT INTO drivers (series_id, name) VALUES (?, ?)", (series_id, f'{i}-201'))
+        for category_id in (1, 2, 3, 4):
+            cursor.execute('''
+                INSERT INTO series_category_params (series_id, category_id, sash_id, gw_divisor, gw_offset, gh_offset, narrow_gw_offset)
+                VALUES (?, ?, NULL, ?, 151, 226, NULL)
+            ''', (series_id, category_id, category_id + 1))
+    conn.commit()
+    conn.close()
+
+
+def load_dicts():
+    conn = backend.get_db()
+    cursor = conn.cursor()
+    data = {}
+    for table in ('series', 'categories', 'sashes', 'drivers', 'series_category_params'):
+        cursor.execute(f"SELECT * FROM {table}")
+        data[table] = backend.rows_to_list(cursor.fetchall())
+    conn.close()
+    return data
+
+
+def measure(fn):
+    tracemalloc.start()
+    result = fn()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def lookup_dicts(req):
+    """The pre-catalog request path: one connection and five queries"""
+    conn = backend.get_db()
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM series WHERE id = ?", (req.series_id,))
+    series = backend.row_to_dict(cursor.fetchone())
+    cursor.execute("SELECT * FROM categories WHERE id = ?", (req.category_id,))
+    category = backend.row_to_dict(cursor.fetchone())
+    cursor.execute("SELECT * FROM sashes WHERE id = ?", (req.sash_id,))
+    sash = backend.row_to_dict(cursor.fetchone())
+    cursor.execute("SELECT * FROM drivers WHERE id = ?", (req.driver_id,))
+    driver = backend.row_to_dict(cursor.fetchone())
+    cursor.execute('''
+        SELECT * FROM series_category_params
+        WHERE series_id = ? AND category_id = ? AND sash_id IS NULL
+    ''', (req.series_id, req.category_id))
+    params = backend.row_to_dict(cursor.fetchone())
+    conn.close()
+    return series, category, sash, driver, params
+
+
+def main():
+    num_series = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    with tempfile.TemporaryDirectory() as tmp:
+        backend.DB_PATH = os.path.join(tmp, 'bench.db')
+        build_catalog(num_series)
+
+        dicts, dict_bytes = measure(load_dicts)
+        catalog, record_bytes = measure(backend.Catalog.load)
+        rows = sum(len(rows) for rows in dicts.values())
+        print(f"catalog rows: {rows}")
+        print(f"memory   dicts:   {dict_bytes / 1024:10.1f} KiB  ({dict_bytes / rows:.0f} B/row)")
+        print(f"memory   records: {record_bytes / 1024:10.1f} KiB  ({record_bytes / rows:.0f} B/row)")
+
+        n = 5
+        print(f"load     dicts:   {timeit.timeit(load_dicts, number=n) / n * 1000:10.2f} ms")
+        print(f"load     records: {timeit.timeit(backend.Catalog.load, number=n) / n * 1000:10.2f} ms")
+
+        series_dicts = dicts['series']
+        params_dicts = dicts['series_category_params']
+        series_records = list(catalog.series.values())
+        params_records = list(catalog.params.values())
+
+        def read_records():
+            for s in series_records:
+                s.a, s.b, s.x, s.uf1, s.uf2, s.e, s.f, s.e_narrow, s.f_narrow, s.name
+            for p in params_records:
+                p.gw_divisor, p.gw_offset, p.gh_offset, p.narrow_gw_offset
+
+        def read_dicts():
+            for s in series_dicts:
+                s['a'], s['b'], s['x'], s['uf1'], s['uf2'], s['e'], s['f'], s['e_narrow'], s['f_narrow'], s['name']
+            for p in params_dicts:
+                p['gw_divisor'], p['gw_offset'], p['gh_offset'], p['narrow_gw_offset']
+
+        n = 20
+        print(f"access   dicts:   {timeit.timeit(read_dicts, number=n) / n * 1000:10.2f} ms per full pass")
+        print(f"access   records: {timeit.timeit(read_records, number=n) / n * 1000:10.2f} ms per full pass")
+
+        req = backend.CalculationRequest(
+            series_id=max(catalog.series), category_id=1, driver_id=max(catalog.drivers), sash_id=max(catalog.sashes),
+            plaisio_width=2000, plaisio_height=1500, ug_value=1.1, psi_value=0.08,
+        )
+        n = 2000
+        print(f"lookup   SQLite+dicts:      {timeit.timeit(lambda: lookup_dicts(req), number=n) / n * 1e6:8.1f} us per request")
+        print(f"lookup   catalog:           {timeit.timeit(lambda: backend.resolve_calculation(catalog, req), number=n) / n * 1e6:8.1f} us per request")
+        print(f"lookup   catalog+version:   {timeit.timeit(lambda: backend.resolve_calculation(backend.get_catalog(), req), number=n) / n * 1e6:8.1f} us per request")
+        print(f"compute_uw on records:      {timeit.timeit(lambda: backend.compute_uw(req, *backend.resolve_calculation(catalog, req)), number=n) / n * 1e6:8.1f} us per request")
+
+
+if __name__ == "__main__":
+    main()
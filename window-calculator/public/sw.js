@@ -2,6 +2,8 @@
 const CACHE_NAME = 'profilco-calculator-v1';
 const STATIC_CACHE = 'static-v1';
 const DYNAMIC_CACHE = 'dynamic-v1';
+const UW_TABLE_CACHE = 'uw-tables-v1';
+const UW_TABLE_MANIFEST = '/uw-tables/manifest.json';
 
 // Static assets to cache immediately
 const STATIC_ASSETS = [
@@ -15,6 +17,38 @@ const STATIC_ASSETS = [
   '/images/series-placeholder.jpg'
 ];
 
+// Precomputed Uw tables (generated by `python backend.py tables`):
+// cache the manifest and every file it lists, drop files it no longer lists.
+// The files are content-hashed, so a cached file never goes stale.
+function precacheUwTables(manifestResponse) {
+  return caches.open(UW_TABLE_CACHE).then((cache) => {
+    return manifestResponse.clone().json().then((manifest) => {
+      const files = Object.values(manifest.files).map((name) => `/uw-tables/${name}`);
+      return cache.put(UW_TABLE_MANIFEST, manifestResponse)
+        .then(() => Promise.all(files.map((file) => {
+          return cache.match(file).then((cached) => cached || cache.add(file));
+        })))
+        .then(() => cache.keys())
+        .then((requests) => Promise.all(
+          requests
+            .filter((request) => {
+              const path = new URL(request.url).pathname;
+              return path !== UW_TABLE_MANIFEST && !files.includes(path);
+            })
+            .map((request) => cache.delete(request))
+        ));
+    });
+  });
+}
+
+function fetchUwTables() {
+  return fetch(UW_TABLE_MANIFEST)
+    .then((response) => (response.ok ? precacheUwTables(response) : null))
+    .catch(() => {
+      console.log('[SW] Uw tables not available');
+    });
+}
+
 // Install event - cache static assets
 self.addEventListener('install', (event) => {
   console.log('[SW] Installing service worker...');
@@ -24,6 +58,7 @@ self.addEventListener('install', (event) => {
         console.log('[SW] Caching static assets');
         return cache.addAll(STATIC_ASSETS);
       })
+      .then(() => fetchUwTables())
       .then(() => self.skipWaiting())
   );
 });
@@ -35,7 +70,7 @@ self.addEventListener('activate', (event) => {
     caches.keys().then((cacheNames) => {
       return Promise.all(
         cacheNames
-          .filter((name) => name !== STATIC_CACHE && name !== DYNAMIC_CACHE)
+          .filter((name) => name !== STATIC_CACHE && name !== DYNAMIC_CACHE && name !== UW_TABLE_CACHE)
           .map((name) => {
             console.log('[SW] Deleting old cache:', name);
             return caches.delete(name);
@@ -55,6 +90,29 @@ self.addEventListener('fetch', (event) => {
     return;
   }
 
+  // Uw table manifest - network first, refreshing the precached tables
+  if (url.pathname === UW_TABLE_MANIFEST) {
+    event.respondWith(
+      fetch(request)
+        .then((response) => {
+          if (response.ok) {
+            event.waitUntil(precacheUwTables(response.clone()));
+          }
+          return response;
+        })
+        .catch(() => caches.match(UW_TABLE_MANIFEST))
+    );
+    return;
+  }
+
+  // Uw table files - content-hashed, cache first
+  if (url.pathname.startsWith('/uw-tables/')) {
+    event.respondWith(
+      caches.match(request).then((cached) => cached || fetch(request))
+    );
+    return;
+  }
+
   // API requests - network first, then cache
   if (url.pathname.startsWith('/api/')) {
     event.respondWith(
@@ -111,9 +169,51 @@ self.addEventListener('fetch', (event) => {
   );
 });
 
+// Whether a cached API path depends on the rows of a catalog change
+// (anything, for a resync)
+function isStaleAfter(change, path) {
+  if (change.type !== 'catalog-change') {
+    return path.startsWith('/api/');
+  }
+  if (path === '/api/admin/all-data' || path === '/api/calculate/bundle') {
+    return true;
+  }
+  const ids = change.ids.map(String);
+  const parts = path.split('/'); // ['', 'api', ...]
+  switch (change.table) {
+    case 'series':
+      return path === '/api/series' ||
+        (parts[2] === 'types' && parts[4] === 'series') ||
+        (parts[2] === 'series' && ids.includes(parts[3]));
+    case 'categories':
+      return path === '/api/categories' ||
+        path.endsWith('/categories') ||
+        (parts[4] === 'category' && ids.includes(parts[5]));
+    case 'series_category_params':
+      return path.endsWith('/params') &&
+        (change.series_id === undefined ||
+          (parts[3] === String(change.series_id) && parts[5] === String(change.category_id)));
+    default:
+      return path.startsWith('/api/');
+  }
+}
+
+function purgeCatalogChange(change) {
+  return caches.open(DYNAMIC_CACHE).then((cache) => {
+    return cache.keys().then((requests) => Promise.all(
+      requests
+        .filter((request) => isStaleAfter(change, new URL(request.url).pathname))
+        .map((request) => cache.delete(request))
+    ));
+  });
+}
+
 // Handle messages from the app
 self.addEventListener('message', (event) => {
   if (event.data && event.data.type === 'SKIP_WAITING') {
     self.skipWaiting();
   }
+  if (event.data && event.data.type === 'CATALOG_CHANGED') {
+    event.waitUntil(purgeCatalogChange(event.data.change));
+  }
 });
@@ -0,0 +1,29 @@
+// Check src/api/uwEvaluator.js against a running backend:
+//   node scripts/check-evaluator.mjs [http://localhost:8000] [count]
+import { evaluateUw } from '../src/api/uwEvaluator.js';
+
+const base = process.argv[2] || 'http://localhost:8000';
+const count = process.argv[3] || 500;
+
+const bundle = await (await fetch(`${base}/api/calculate/bundle`)).json();
+const { catalog_version: version, vectors } = await (await fetch(`${base}/api/calculate/test-vectors?count=${count}`)).json();
+if (version !== bundle.catalog_version) {
+  console.error(`Catalog changed while fetching (bundle ${bundle.catalog_version}, vectors ${version}); run again`);
+  process.exit(1);
+}
+
+let failures = 0;
+for (const { input, expected } of vectors) {
+  const result = evaluateUw(bundle, input);
+  const wrong = result
+    ? Object.keys(expected).filter((key) => (result[key] ?? null) !== expected[key])
+    : ['(configuration missing from bundle)'];
+  if (wrong.length) {
+    failures += 1;
+    if (failures <= 10) {
+      console.error(`${JSON.stringify(input)}: ${wrong.join(', ')}`);
+    }
+  }
+}
+console.log(`${vectors.length - failures}/${vectors.length} test vectors match (catalog version ${version})`);
+process.exit(failures ? 1 : 0);
@@ -2,6 +2,7 @@ import { Routes, Route, Link, useLocation, useNavigate } from 'react-router-dom'
 import { useState, useEffect, createContext, useContext } from 'react'
 import AdminInterface from './pages/AdminInterface'
 import Calculator from './pages/Calculator'
+import { subscribeCatalogChanges } from './api'
 
 // Language Context
 const LanguageContext = createContext()
@@ -353,6 +354,12 @@ function ResultsProvider({ children }) {
   )
 }
 
+// Keeps cached catalog data in sync with admin edits (server-sent events)
+function CatalogSync() {
+  useEffect(() => subscribeCatalogChanges(), [])
+  return null
+}
+
 // Main App Component
 function App() {
   return (
@@ -360,6 +367,7 @@ function App() {
       <ResultsProvider>
         <div className="min-h-screen bg-gray-50">
           <OfflineIndicator />
+          <CatalogSync />
           <Header />
           <Routes>
             <Route path="/" element={<Calculator />} />
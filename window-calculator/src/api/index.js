@@ -1,3 +1,5 @@
+import { evaluateUw } from './uwEvaluator';
+
 // API base - works on both local (with proxy) and Vercel (serverless)
 const API_BASE = '/api';
 
@@ -5,18 +7,24 @@ const API_BASE = '/api';
 // PUBLIC API (for calculator)
 // ===================================
 
+// Columns the calculator steps show; the step endpoints leave image_url out
+// unless it is asked for
+const TYPE_FIELDS = 'name,name_gr,image_url';
+const SERIES_FIELDS = 'type_id,name,code,image_url';
+const CATEGORY_FIELDS = 'type_id,name,num_glasses,has_special_calculation,image_url';
+
 export async function getTypes() {
-  const res = await fetch(`${API_BASE}/types`);
+  const res = await fetch(`${API_BASE}/types?fields=${TYPE_FIELDS}`);
   return res.json();
 }
 
 export async function getSeriesByType(typeId) {
-  const res = await fetch(`${API_BASE}/types/${typeId}/series`);
+  const res = await fetch(`${API_BASE}/types/${typeId}/series?fields=${SERIES_FIELDS}`);
   return res.json();
 }
 
 export async function getCategoriesByType(typeId) {
-  const res = await fetch(`${API_BASE}/types/${typeId}/categories`);
+  const res = await fetch(`${API_BASE}/types/${typeId}/categories?fields=${CATEGORY_FIELDS}`);
   return res.json();
 }
 
@@ -31,7 +39,7 @@ export async function getSeries() {
 }
 
 export async function getCategoriesForSeries(seriesId) {
-  const res = await fetch(`${API_BASE}/series/${seriesId}/categories`);
+  const res = await fetch(`${API_BASE}/series/${seriesId}/categories?fields=${CATEGORY_FIELDS}`);
   return res.json();
 }
 
@@ -54,12 +62,47 @@ export async function getCategoryParams(seriesId, categoryId, sashId = null) {
   return res.json();
 }
 
+// Calculate locally from the cached coefficient bundle; null when it cannot
+async function calculateLocally(data) {
+  const bundle = await loadCoefficientBundle();
+  const local = bundle && evaluateUw(bundle, data);
+  if (!local) {
+    return null;
+  }
+  return { ...local, catalog_version: bundle.catalog_version, calculated_locally: true };
+}
+
 export async function calculateWindow(data) {
-  const res = await fetch(`${API_BASE}/calculate`, {
-    method: 'POST',
-    headers: { 'Content-Type': 'application/json' },
-    body: JSON.stringify(data)
-  });
+  // Openings on the grid of the precomputed tables never reach the backend,
+  // as long as the tables are for the current catalog version
+  const fromTable = await lookupUwTable(data);
+  if (fromTable) {
+    return fromTable;
+  }
+  let res;
+  try {
+    res = await fetch(`${API_BASE}/calculate`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(data)
+    });
+  } catch (err) {
+    // Offline
+    const local = await calculateLocally(data);
+    if (local) {
+      return local;
+    }
+    throw err;
+  }
+  // Busy server (429/503 from admission control): answer locally if possible
+  if (res.status === 429 || res.status === 503) {
+    const local = await calculateLocally(data);
+    if (local) {
+      return local;
+    }
+  }
+  // Keep the bundle cached (by the service worker) for the next offline use
+  loadCoefficientBundle();
   if (!res.ok) {
     const error = await res.json();
     throw new Error(error.detail || 'Calculation failed');
@@ -67,6 +110,201 @@ export async function calculateWindow(data) {
   return res.json();
 }
 
+// ===================================
+// LIVE CALCULATION (WebSocket, for dragging dimensions)
+// ===================================
+
+// Open a live session for one configuration (ids, is_narrow, has_rolo and
+// the first inputs); returns { update(inputs), close() }. Send every slider
+// move with update(): the server only calculates the latest inputs.
+// `onMessage` gets the result/error messages and { type: 'closed' } when the
+// socket ends (the Vercel functions have no WebSockets), after which callers
+// fall back to calculateWindow(). Calculator.jsx calculates on submit and
+// does not open live sessions.
+export function openLiveCalculation(configuration, onMessage = () => {}) {
+  const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+  const socket = new WebSocket(`${protocol}//${window.location.host}${API_BASE}/calculate/live`);
+  let seq = 0;
+  let pending = null;
+
+  socket.addEventListener('open', () => {
+    socket.send(JSON.stringify({ type: 'bind', ...configuration }));
+    if (pending) {
+      socket.send(JSON.stringify(pending));
+      pending = null;
+    }
+  });
+  socket.addEventListener('message', (event) => onMessage(JSON.parse(event.data)));
+  socket.addEventListener('close', () => onMessage({ type: 'closed' }));
+
+  return {
+    update(inputs) {
+      seq += 1;
+      if (socket.readyState === WebSocket.OPEN) {
+        socket.send(JSON.stringify({ type: 'input', seq, ...inputs }));
+      } else {
+        // Not connected yet: keep merging into one delta
+        pending = { ...pending, type: 'input', seq, ...inputs };
+      }
+    },
+    close() {
+      socket.close();
+    },
+  };
+}
+
+// ===================================
+// COEFFICIENT BUNDLE (client-side calculation, see uwEvaluator.js)
+// ===================================
+
+let coefficientBundle = null;
+
+export function loadCoefficientBundle() {
+  if (!coefficientBundle) {
+    coefficientBundle = fetch(`${API_BASE}/calculate/bundle`)
+      .then((res) => (res.ok ? res.json() : null))
+      .catch(() => null)
+      .then((bundle) => {
+        if (!bundle) {
+          coefficientBundle = null;  // retry on the next call
+        }
+        return bundle;
+      });
+  }
+  return coefficientBundle;
+}
+
+// ===================================
+// PRECOMPUTED UW TABLES (public/uw-tables, `python backend.py tables`)
+// ===================================
+
+const UW_TABLE_AXES = ['plaisio_width', 'plaisio_height', 'ug_value', 'psi_value'];
+let uwTableManifest = null;
+const uwTableFiles = {};
+
+function fetchJsonOrNull(url) {
+  return fetch(url)
+    .then((res) => (res.ok ? res.json() : null))
+    .catch(() => null);
+}
+
+// Catalog version of the backend, from the change feed or, until it has
+// answered, the coefficient bundle; null while neither is known
+let catalogVersion = null;
+
+async function currentCatalogVersion() {
+  if (catalogVersion === null) {
+    const bundle = await loadCoefficientBundle();
+    if (bundle && catalogVersion === null) {
+      catalogVersion = bundle.catalog_version;
+    }
+  }
+  return catalogVersion;
+}
+
+// Uw of a standard opening (no rolo, sizes/Ug/Psi on the table grid) without
+// calling the backend; null when the tables do not cover it, or were built
+// for another catalog version than the current one (an edit since the
+// build, or a version that cannot be told)
+export async function lookupUwTable(data) {
+  if (data.has_rolo) {
+    return null;
+  }
+  if (!uwTableManifest) {
+    uwTableManifest = fetchJsonOrNull('/uw-tables/manifest.json');
+  }
+  const manifest = await uwTableManifest;
+  const file = manifest?.files[data.series_id];
+  if (!file) {
+    return null;
+  }
+  const version = await currentCatalogVersion();
+  if (version === null || manifest.catalog_version !== version) {
+    return null;
+  }
+
+  let index = 0;
+  for (const axis of UW_TABLE_AXES) {
+    const position = manifest.axes[axis].indexOf(Number(data[axis]));
+    if (position === -1) {
+      return null;
+    }
+    index = index * manifest.axes[axis].length + position;
+  }
+
+  if (!uwTableFiles[file]) {
+    uwTableFiles[file] = fetchJsonOrNull(`/uw-tables/${file}`);
+  }
+  const series = await uwTableFiles[file];
+  if (series?.catalog_version !== version) {
+    return null;
+  }
+  const table = series.tables.find((t) => (
+    t.category_id === data.category_id &&
+    t.sash_id === data.sash_id &&
+    (t.is_narrow === null || t.is_narrow === Boolean(data.is_narrow)) &&
+    t.drivers[data.driver_id] !== undefined
+  ));
+  if (!table) {
+    return null;
+  }
+
+  return {
+    Uw: table.Uw[index] / manifest.scale,
+    Uw_open: null,
+    Uw_closed: null,
+    series_name: series.series_name,
+    category_name: table.category_name,
+    driver_name: table.drivers[data.driver_id],
+    sash_name: table.sash_name,
+    num_glasses: table.num_glasses,
+    has_rolo: false,
+    is_narrow: Boolean(data.is_narrow),
+    has_special: table.has_special,
+    catalog_version: series.catalog_version,
+    from_table: true
+  };
+}
+
+// ===================================
+// CATALOG CHANGE FEED (server-sent events)
+// ===================================
+
+// Drop what a catalog change makes stale: the in-memory bundle/tables and,
+// through the service worker, the cached API responses for the changed rows
+function invalidateCatalogCaches(change) {
+  coefficientBundle = null;
+  uwTableManifest = null;
+  Object.keys(uwTableFiles).forEach((file) => delete uwTableFiles[file]);
+  navigator.serviceWorker?.controller?.postMessage({ type: 'CATALOG_CHANGED', change });
+}
+
+// Listen for catalog edits; returns the unsubscribe function. `onChange`
+// gets every change (or resync) event after the caches were invalidated.
+export function subscribeCatalogChanges(onChange = () => {}) {
+  if (typeof EventSource === 'undefined') {
+    return () => {};
+  }
+  const source = new EventSource(`${API_BASE}/catalog/events`);
+  let version = null;
+
+  const handle = (event) => {
+    const change = JSON.parse(event.data);
+    // A version different from the one seen before a reconnect means
+    // changes were missed: invalidate everything
+    const missed = change.type === 'version' && version !== null && change.version !== version;
+    version = change.version;
+    catalogVersion = change.version;
+    if (change.type === 'version' && !missed) {
+      return;
+    }
+    invalidateCatalogCaches(missed ? { ...change, type: 'resync' } : change);
+    onChange(change);
+  };
+  ['version', 'catalog-change', 'resync'].forEach((type) => source.addEventListener(type, handle));
+  return () => source.close();
+}
+
 // ===================================
 // ADMIN API
 // ===================================
@@ -76,6 +314,34 @@ export async function getAllData() {
   return res.json();
 }
 
+// All-data plus the catalog version it was read at (for getCatalogChanges)
+export async function getAllDataWithVersion() {
+  const res = await fetch(`${API_BASE}/admin/all-data`);
+  return { data: await res.json(), version: Number(res.headers.get('X-Catalog-Version')) };
+}
+
+// Rows changed since `version`, or null when the server no longer has that
+// history (reload all-data instead)
+export async function getCatalogChanges(version) {
+  const res = await fetch(`${API_BASE}/admin/changes?since=${version}`, { cache: 'no-store' });
+  if (res.status === 410) {
+    return null;
+  }
+  return res.json();
+}
+
+// Apply a getCatalogChanges() result to all-data shaped tables
+export function applyCatalogChanges(data, { changes }) {
+  const next = { ...data };
+  for (const [table, { upserted, deleted }] of Object.entries(changes)) {
+    const rows = new Map((next[table] || []).map((row) => [row.id, row]));
+    upserted.forEach((row) => rows.set(row.id, row));
+    deleted.forEach((id) => rows.delete(id));
+    next[table] = [...rows.values()].sort((a, b) => a.id - b.id);
+  }
+  return next;
+}
+
 export async function updateRecord(table, id, data) {
   const endpointMap = {
     'categories': 'categories',
@@ -127,3 +393,21 @@ export async function deleteRecord(table, id) {
   });
   return res.json();
 }
+
+// Upload an image (File/Blob) for a type, category or series. The response
+// has the content `hash` and `status`; while it is 'processing' the resized
+// variants are being written and image_url is set once they are done
+// (poll getImageJob(hash) or wait for the catalog change event).
+export async function uploadImage(table, id, file) {
+  const res = await fetch(`${API_BASE}/admin/${table}/${id}/image`, {
+    method: 'PUT',
+    headers: { 'Content-Type': file.type },
+    body: file
+  });
+  return res.json();
+}
+
+export async function getImageJob(hash) {
+  const res = await fetch(`${API_BASE}/admin/images/${hash}`);
+  return res.json();
+}
@@ -0,0 +1,169 @@
+// Client-side Uw calculation from the coefficient bundle (/api/calculate/bundle).
+// Mirrors compute_uw() in backend.py operation by operation, so results are
+// identical to /api/calculate (checked with /api/calculate/test-vectors).
+
+// Python's round(value, digits): nearest to the exact binary value, ties to even
+export function pyRound(value, digits) {
+  const rounded = Number(value.toFixed(digits));
+  const exact = Math.abs(value).toFixed(100);
+  const point = exact.indexOf('.');
+  if (!/^50*$/.test(exact.slice(point + 1 + digits))) {
+    return rounded;
+  }
+  // Exact tie: toFixed rounded away from zero, Python keeps the even digit
+  const lastDigit = Number(exact[point + digits] === '.' ? exact[point - 1] : exact[point + digits]);
+  if (lastDigit % 2 === 1) {
+    return rounded;
+  }
+  const truncated = Number(exact.slice(0, point + 1 + digits));
+  return value < 0 ? -truncated : truncated;
+}
+
+function validationError(bundle, data) {
+  const inLimits = (value, field) => {
+    const [low, high] = bundle.limits[field];
+    return low <= value && value <= high;
+  };
+  if (!inLimits(data.plaisio_height, 'plaisio_height')) return 'HEIGHT_RANGE';
+  if (!inLimits(data.plaisio_width, 'plaisio_width')) return 'WIDTH_RANGE';
+  if (!inLimits(data.ug_value, 'ug_value')) return 'UG_RANGE';
+  if (!bundle.psi_values.includes(data.psi_value)) return 'PSI_VALUE';
+  if (data.has_rolo) {
+    if (!data.rolo_height || !inLimits(data.rolo_height, 'rolo_height')) return 'ROLO_HEIGHT_RANGE';
+    if (!data.ur_value || !inLimits(data.ur_value, 'ur_value')) return 'UR_RANGE';
+  }
+  return null;
+}
+
+function findConfiguration(bundle, data) {
+  const index = (bundle._index ??= Object.fromEntries(
+    bundle.configurations.map((row) => {
+      const configuration = Object.fromEntries(bundle.fields.map((field, i) => [field, row[i]]));
+      return [`${configuration.series_id}:${configuration.category_id}:${configuration.sash_id}`, configuration];
+    })
+  ));
+  const configuration = index[`${data.series_id}:${data.category_id}:${data.sash_id}`];
+  return configuration && configuration.driver_ids.includes(data.driver_id) ? configuration : null;
+}
+
+// Areas and perimeter of compute_sliding_uw()
+function slidingAreas(configuration, FW, FH, isNarrow) {
+  const { l, uf1, uf2, num_glasses: numGlasses, has_special: hasSpecial } = configuration;
+  const gwOffset = isNarrow ? configuration.gw_offset_narrow : configuration.gw_offset;
+  const GW = (FW / configuration.gw_divisor) - gwOffset;
+  const GH = FH - configuration.gh_offset;
+  const Kentro_height = FH - (2 * l * 1000);
+  const akentrou = isNarrow ? configuration.akentrou_narrow : configuration.akentrou;
+
+  const Akoufomatos = (FH * FW) / 1_000_000;
+  const Af1 = Akoufomatos - ((FH / 1000 - 2 * l) * (FW / 1000 - 2 * l));
+  const Af2 = (numGlasses - 1) * (Kentro_height * akentrou) / 1_000_000;
+  const Aff2 = (numGlasses - 2) * (Kentro_height * akentrou) / 1_000_000;
+  const Af = Af1 + Af2;
+  const Ag = Akoufomatos - Af;
+  const Ig = (2 * GH + 2 * GW) * numGlasses / 1000;
+
+  let Afilitou = null;
+  let Af_Uf;
+  if (hasSpecial) {
+    const afilitou = isNarrow ? configuration.afilitou_narrow : configuration.afilitou;
+    Afilitou = afilitou ? (Kentro_height * afilitou) / 1_000_000 : 0;
+    Af_Uf = (Af1 * uf1) + (Aff2 * uf2) + (Afilitou * uf1);
+  } else {
+    Af_Uf = (Af1 * uf1) + (Af2 * uf2);
+  }
+  return { GW, GH, Akoufomatos, Af1, Af2, Aff2, Af, Ag, Ig, Afilitou, Af_Uf };
+}
+
+// Areas and perimeter of compute_opening_uw()
+function openingAreas(configuration, FW, FH, isNarrow) {
+  const { l, uf1, num_glasses: numGlasses } = configuration;
+  const uf2 = configuration.uf2 ? configuration.uf2 : uf1;
+  const akentrou = (isNarrow ? configuration.akentrou_narrow : configuration.akentrou) || 0;
+  const Kentro_height = FH - (2 * l * 1000);
+  const GW = (FW - (2 * l * 1000) - (numGlasses - 1) * akentrou) / numGlasses;
+  const GH = Kentro_height;
+
+  const Akoufomatos = (FH * FW) / 1_000_000;
+  const Af1 = Akoufomatos - ((FH / 1000 - 2 * l) * (FW / 1000 - 2 * l));
+  const Af2 = (numGlasses - 1) * (Kentro_height * akentrou) / 1_000_000;
+  const Af = Af1 + Af2;
+  const Ag = Akoufomatos - Af;
+  const Ig = (2 * GH + 2 * GW) * numGlasses / 1000;
+  const Af_Uf = (Af1 * uf1) + (Af2 * uf2);
+  return { GW, GH, Akoufomatos, Af1, Af2, Aff2: null, Af, Ag, Ig, Afilitou: null, Af_Uf };
+}
+
+// Calculation method of a configuration (CALCULATION_METHODS in backend.py)
+const METHODS = { sliding: slidingAreas, opening: openingAreas };
+
+// Same result as /api/calculate (without `debug`). Returns null when the
+// bundle does not cover the configuration; throws the server's message on
+// invalid input.
+export function evaluateUw(bundle, data) {
+  const configuration = findConfiguration(bundle, data);
+  // Bundles before format 2 only had sliding configurations
+  const methodAreas = configuration && METHODS[configuration.method ?? 'sliding'];
+  if (!methodAreas) {
+    return null;
+  }
+  const error = validationError(bundle, data);
+  if (error) {
+    throw new Error(bundle.validation_errors[error]);
+  }
+
+  const isNarrow = Boolean(data.is_narrow);
+  const hasRolo = Boolean(data.has_rolo);
+  const FW = data.plaisio_width;
+  const FH_original = data.plaisio_height;
+  const Ug = data.ug_value;
+  const Psi = data.psi_value;
+
+  let Ar = null;
+  let Uw_open = null;
+  let Uw_closed = null;
+  let FH = FH_original;
+  if (hasRolo && data.rolo_height) {
+    FH = FH_original - data.rolo_height;
+    Ar = (FW * data.rolo_height) / 1_000_000;
+  }
+
+  const areas = methodAreas(configuration, FW, FH, isNarrow);
+  const Aw = areas.Akoufomatos;
+  const Uw = (areas.Af_Uf + (areas.Ag * Ug) + (areas.Ig * Psi)) / Aw;
+
+  if (hasRolo && data.rolo_height && data.ur_value) {
+    Uw_open = (Uw * Aw + Ar * data.ur_value) / (Aw + Ar);
+    Uw_closed = 1 / ((1 / Uw_open) + 0.15);
+  }
+
+  return {
+    Uw: pyRound(Uw, 4),
+    Uw_open: Uw_open ? pyRound(Uw_open, 4) : null,
+    Uw_closed: Uw_closed ? pyRound(Uw_closed, 4) : null,
+    l: pyRound(configuration.l, 4),
+    GW: pyRound(areas.GW, 2),
+    GH: pyRound(areas.GH, 2),
+    Akoufomatos: pyRound(areas.Akoufomatos, 4),
+    Af1: pyRound(areas.Af1, 4),
+    Af2: pyRound(areas.Af2, 4),
+    Aff2: areas.Aff2 === null ? null : pyRound(areas.Aff2, 4),
+    Af: pyRound(areas.Af, 4),
+    Ag: pyRound(areas.Ag, 4),
+    Ig: pyRound(areas.Ig, 4),
+    Af_Uf: pyRound(areas.Af_Uf, 4),
+    Afilitou: areas.Afilitou ? pyRound(areas.Afilitou, 4) : null,
+    Ar: Ar ? pyRound(Ar, 4) : null,
+    FH_original,
+    FH_effective: hasRolo ? FH : null,
+    rolo_height: hasRolo ? data.rolo_height : null,
+    series_name: bundle.names.series[data.series_id],
+    category_name: bundle.names.categories[data.category_id],
+    driver_name: bundle.names.drivers[data.driver_id],
+    sash_name: bundle.names.sashes[data.sash_id],
+    num_glasses: configuration.num_glasses,
+    has_rolo: hasRolo,
+    is_narrow: isNarrow,
+    has_special: configuration.has_special
+  };
+}
@@ -1,6 +1,14 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useLanguage } from '../App';
-import { getAllData, updateRecord, createRecord, deleteRecord } from '../api';
+import {
+  getAllDataWithVersion,
+  getCatalogChanges,
+  applyCatalogChanges,
+  subscribeCatalogChanges,
+  updateRecord,
+  createRecord,
+  deleteRecord
+} from '../api';
 
 const tabs = [
   { id: 'series', label: 'Series', labelEl: 'Σειρές' },
@@ -27,11 +35,29 @@ export default function AdminInterface() {
   const [filterSeries, setFilterSeries] = useState('all');
   const [notification, setNotification] = useState(null);
 
+  // Catalog version the local tables are at (delta sync via /admin/changes)
+  const versionRef = useRef(null);
+
   useEffect(() => { fetchAllData(); }, []);
 
+  // Apply edits made elsewhere (other admins, other tabs) as row deltas
+  useEffect(() => subscribeCatalogChanges(async () => {
+    if (versionRef.current === null) return;
+    try {
+      const changes = await getCatalogChanges(versionRef.current);
+      if (!changes) return fetchAllData();
+      versionRef.current = changes.version;
+      setData(prev => applyCatalogChanges(prev, changes));
+    } catch { /* the next change event retries */ }
+  }), []);
+
   const fetchAllData = async () => {
     setLoading(true);
-    try { setData(await getAllData()); } 
+    try {
+      const { data, version } = await getAllDataWithVersion();
+      versionRef.current = version;
+      setData(data);
+    }
     catch (error) { showNotification('Error loading data', 'error'); }
     setLoading(false);
   };
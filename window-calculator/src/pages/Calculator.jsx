@@ -15,6 +15,29 @@ const TYPE_IMAGE = '/images/type-placeholder.jpg';
 const SERIES_IMAGE = '/images/series-placeholder.jpg';
 const CATEGORY_IMAGE = '/images/category-placeholder.jpg';
 
+// Resized uploads (<hash>-640w.webp) come with a JPEG of the same name for
+// browsers without WebP
+const RESIZED_WEBP = /-\d+w\.webp$/;
+
+function CatalogImage({ url, placeholder, alt }) {
+  const resized = Boolean(url) && RESIZED_WEBP.test(url);
+  const image = (
+    <img
+      src={resized ? url.replace(/\.webp$/, '.jpg') : url || placeholder}
+      alt={alt}
+      className="w-full h-full object-cover"
+    />
+  );
+  if (!resized) return image;
+  // display: contents keeps the img sized by the card
+  return (
+    <picture className="contents">
+      <source srcSet={url} type="image/webp" />
+      {image}
+    </picture>
+  );
+}
+
 // Validation limits
 const LIMITS = {
   plaisioHeight: { min: 300, max: 5000 },
@@ -281,11 +304,7 @@ export default function Calculator() {
                 }`}
               >
                 <div className="aspect-video bg-gray-100 overflow-hidden">
-                  <img 
-                    src={type.image_url || TYPE_IMAGE}
-                    alt={type.name}
-                    className="w-full h-full object-cover"
-                  />
+                  <CatalogImage url={type.image_url} placeholder={TYPE_IMAGE} alt={type.name} />
                 </div>
                 <div className="p-4 bg-white">
                   <div className="font-semibold text-lg text-gray-800">{type.name}</div>
@@ -311,11 +330,7 @@ export default function Calculator() {
                 }`}
               >
                 <div className="aspect-video bg-gray-100 overflow-hidden">
-                  <img 
-                    src={series.image_url || SERIES_IMAGE}
-                    alt={series.name}
-                    className="w-full h-full object-cover"
-                  />
+                  <CatalogImage url={series.image_url} placeholder={SERIES_IMAGE} alt={series.name} />
                 </div>
                 <div className="p-4 bg-white">
                   <div className="font-semibold text-lg text-gray-800">{series.name}</div>
@@ -341,11 +356,7 @@ export default function Calculator() {
                 }`}
               >
                 <div className="aspect-video bg-gray-100 overflow-hidden">
-                  <img 
-                    src={cat.image_url || CATEGORY_IMAGE}
-                    alt={cat.name}
-                    className="w-full h-full object-cover"
-                  />
+                  <CatalogImage url={cat.image_url} placeholder={CATEGORY_IMAGE} alt={cat.name} />
                 </div>
                 <div className="p-4 bg-white">
                   <div className="font-semibold text-gray-800">{cat.name}</div>
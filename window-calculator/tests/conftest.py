@@ -0,0 +1,48 @@
+"""The app against a freshly seeded catalog in a temporary directory.
+
+One database serves the whole session, as one does a worker: catalog
+versions only move forward, so the in-memory caches stay valid. Tests that
+edit the catalog put it back.
+"""
+import os
+import sys
+
+import pytest
+
+# Read when backend is imported
+os.environ['WARM_UP'] = '0'
+os.environ['ADMISSION_CONTROL'] = '0'
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import backend  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def client(tmp_path_factory):
+    backend.DB_PATH = str(tmp_path_factory.mktemp('catalog') / 'window_calculator.db')
+    with TestClient(backend.app) as client:
+        yield client
+
+
+@pytest.fixture(scope='session')
+def configurations(client):
+    """ConfigKey of every configuration the seeded catalog can calculate"""
+    catalog = backend.get_catalog()
+    return [
+        backend.ConfigKey(series_id, category_id, driver_ids[0], sash_id)
+        for series_id, configurations in backend.catalog_configurations(catalog).items()
+        for (category_id, sash_id), driver_ids in configurations.items()
+    ]
+
+
+@pytest.fixture
+def opening(configurations):
+    """A valid /api/calculate body"""
+    return {
+        **configurations[0]._asdict(),
+        'plaisio_width': 1500,
+        'plaisio_height': 1400,
+        'ug_value': 1.1,
+        'psi_value': 0.08,
+    }
@@ -0,0 +1,50 @@
+"""Admission control: 429 over the client's rate, 503 when the lane is full."""
+import pytest
+
+import backend
+
+
+@pytest.fixture
+def bulk_lane(monkeypatch):
+    """Admission on, with a bulk lane of one slot, no queue and one request per client"""
+    lane = backend.AdmissionLane('bulk', concurrency=1, queue=0, queue_timeout=1.0, rate=0.01, burst=1)
+    monkeypatch.setattr(backend, 'ADMISSION_CONTROL', True)
+    monkeypatch.setitem(backend.admission_lanes, 'bulk', lane)
+    return lane
+
+
+def test_rate_limit(client, opening, bulk_lane):
+    assert client.post('/api/calculate/batch', json=[opening]).status_code == 200
+    response = client.post('/api/calculate/batch', json=[opening])
+    assert response.status_code == 429
+    assert int(response.headers['retry-after']) >= 1
+    assert bulk_lane.rejected_rate == 1
+    # The interactive lane is not affected
+    assert client.post('/api/calculate', json=opening).status_code == 200
+
+
+def test_full_lane(client, opening, bulk_lane):
+    bulk_lane.buckets = backend.TokenBuckets(rate=100.0, burst=100)
+    bulk_lane.active = 1  # the one slot is taken
+    response = client.post('/api/calculate/batch', json=[opening])
+    assert response.status_code == 503
+    assert int(response.headers['retry-after']) >= 1
+    assert bulk_lane.rejected_full == 1
+    bulk_lane.release()
+    assert client.post('/api/calculate/batch', json=[opening]).status_code == 200
+    assert bulk_lane.active == 0
+
+
+def test_catalog_prefix_is_admitted_by_the_same_lane(client, opening, bulk_lane):
+    bulk_lane.active = 1
+    response = client.post(f'/api/catalogs/{backend.DEFAULT_CATALOG}/calculate/batch', json=[opening])
+    assert response.status_code == 503
+
+
+def test_forwarded_client_behind_trusted_proxy(monkeypatch):
+    scope = {'client': ('10.0.0.2', 5000), 'headers': [(b'x-forwarded-for', b'203.0.113.7, 10.0.0.1')]}
+    assert backend.admission_client(scope) == '10.0.0.2'
+    monkeypatch.setattr(backend, 'TRUSTED_PROXIES', {'10.0.0.1', '10.0.0.2'})
+    assert backend.admission_client(scope) == '203.0.113.7'
+    # Not from a trusted proxy: the header is ignored
+    assert backend.admission_client({**scope, 'client': ('198.51.100.9', 5000)}) == '198.51.100.9'
@@ -0,0 +1,75 @@
+"""/api/calculate/aggregate: quantity-weighted building totals of an NDJSON stream."""
+import json
+
+import pytest
+
+import backend
+
+
+@pytest.fixture
+def rows(opening, configurations):
+    return [
+        {**opening, **key._asdict(), 'quantity': i % 3 + 1, 'facade': 'north' if i % 2 else 'south'}
+        for i, key in enumerate(configurations)
+    ]
+
+
+def ndjson(rows):
+    return '\n'.join(json.dumps(row) for row in rows)
+
+
+def aggregate(client, body, **params):
+    response = client.post('/api/calculate/aggregate', content=body, params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_totals_match_the_batch_results(client, rows):
+    batch = client.post('/api/calculate/batch', json=rows).json()['results']
+    result = aggregate(client, ndjson(rows))
+    assert (result['openings'], result['valid'], result['errors']) == (len(rows), len(rows), {})
+    Aw = sum(row['quantity'] * aw for row, aw in zip(rows, batch['Aw']))
+    UwAw = sum(row['quantity'] * uw * aw for row, uw, aw in zip(rows, batch['Uw'], batch['Aw']))
+    totals = result['totals']
+    assert totals['quantity'] == sum(row['quantity'] for row in rows)
+    assert totals['Aw'] == pytest.approx(Aw, abs=1e-3)
+    assert totals['Ag'] == pytest.approx(sum(row['quantity'] * ag for row, ag in zip(rows, batch['Ag'])), abs=1e-3)
+    assert totals['Uw_mean'] == pytest.approx(UwAw / Aw, abs=1e-3)
+    assert result['catalog_version'] == backend.get_catalog().version
+
+
+def test_groups_add_up_to_the_totals(client, rows):
+    result = aggregate(client, ndjson(rows), group_by='series_id,facade')
+    assert result['group_by'] == ['series_id', 'facade']
+    assert {group['key']['facade'] for group in result['groups']} == {'north', 'south'}
+    for name in ('quantity', 'Aw', 'Ag', 'UwAw'):
+        assert sum(group[name] for group in result['groups']) == pytest.approx(result['totals'][name], abs=1e-3)
+    north = [row for row in rows if row['facade'] == 'north']
+    assert sum(group['quantity'] for group in result['groups'] if group['key']['facade'] == 'north') == \
+        sum(row['quantity'] for row in north)
+
+
+def test_chunks_do_not_change_the_result(client, rows, monkeypatch):
+    whole = aggregate(client, ndjson(rows), group_by='facade')
+    monkeypatch.setattr(backend, 'AGGREGATE_CHUNK_ROWS', 2)
+    assert aggregate(client, ndjson(rows), group_by='facade') == whole
+
+
+@pytest.mark.parametrize('quantity', [0, -1, 1.5, 'two', None, backend.MAX_QUANTITY + 1, 1e19])
+def test_invalid_quantity_is_an_error(client, opening, quantity):
+    result = aggregate(client, ndjson([opening, {**opening, 'quantity': quantity}]))
+    assert (result['openings'], result['valid']) == (2, 1)
+    assert result['errors'] == {'INVALID_VALUE': 1}
+    assert result['totals']['quantity'] == 1
+
+
+def test_errors_are_counted(client, opening):
+    body = ndjson([opening, {**opening, 'psi_value': 0.07}]) + '\nnot json\n'
+    result = aggregate(client, body)
+    assert (result['openings'], result['valid']) == (3, 1)
+    assert result['errors'] == {'INVALID_VALUE': 1, 'PSI_VALUE': 1}
+
+
+def test_unknown_group(client, opening):
+    response = client.post('/api/calculate/aggregate', content=ndjson([opening]), params={'group_by': 'colour'})
+    assert response.status_code == 400
@@ -0,0 +1,86 @@
+"""Coefficient bundle and test vectors: the client evaluator gives /api/calculate's results."""
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+
+import backend
+
+EVALUATOR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'api', 'uwEvaluator.js')
+
+# Prints the vectors evaluateUw() gets wrong, as JSON
+CHECK = '''
+import { readFileSync } from 'node:fs';
+import { pathToFileURL } from 'node:url';
+const [evaluator, bundlePath, vectorsPath] = process.argv.slice(1);
+const { evaluateUw } = await import(pathToFileURL(evaluator));
+const bundle = JSON.parse(readFileSync(bundlePath, 'utf8'));
+const { vectors } = JSON.parse(readFileSync(vectorsPath, 'utf8'));
+const wrong = vectors.filter(({ input, expected }) => {
+  const result = evaluateUw(bundle, input);
+  return !result || Object.keys(expected).some((key) => (result[key] ?? null) !== expected[key]);
+});
+console.log(JSON.stringify(wrong));
+'''
+
+
+def test_vectors_are_calculate_results(client):
+    vectors = client.get('/api/calculate/test-vectors', params={'count': 60}).json()
+    assert vectors['catalog_version'] == backend.get_catalog().version
+    assert len(vectors['vectors']) == 60
+    for vector in vectors['vectors']:
+        result = client.post('/api/calculate', json=vector['input']).json()
+        del result['debug']
+        assert result == vector['expected']
+
+
+@pytest.mark.parametrize('count', [0, 10 * backend.TEST_VECTOR_COUNT + 1])
+def test_vector_count_limits(client, count):
+    assert client.get('/api/calculate/test-vectors', params={'count': count}).status_code == 400
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='needs node')
+def test_evaluator_reproduces_the_vectors(client, tmp_path):
+    bundle = client.get('/api/calculate/bundle').json()
+    vectors = client.get('/api/calculate/test-vectors').json()
+    assert bundle['catalog_version'] == vectors['catalog_version']
+    (tmp_path / 'bundle.json').write_text(json.dumps(bundle))
+    (tmp_path / 'vectors.json').write_text(json.dumps(vectors))
+    output = subprocess.run(
+        ['node', '--input-type=module', '-e', CHECK, EVALUATOR, str(tmp_path / 'bundle.json'), str(tmp_path / 'vectors.json')],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    assert json.loads(output) == []
+
+
+def test_bundle_is_revalidated_by_version(client, opening):
+    response = client.get('/api/calculate/bundle')
+    etag = response.headers['etag']
+    assert response.headers['x-catalog-version'] == str(backend.get_catalog().version)
+    assert client.get('/api/calculate/bundle', headers={'If-None-Match': etag}).status_code == 304
+
+    series = backend.get_catalog().series[opening['series_id']]
+    client.put(f"/api/admin/series/{series.id}", json={'uf1': series.uf1 + 1})
+    try:
+        response = client.get('/api/calculate/bundle', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        row = next(row for row in response.json()['configurations'] if row[0] == series.id)
+        assert row[backend.BUNDLE_FIELDS.index('uf1')] == series.uf1 + 1
+    finally:
+        client.put(f"/api/admin/series/{series.id}", json={'uf1': series.uf1})
+
+
+def test_edited_formulas_are_left_to_the_server(client):
+    formulas = [{'name': name, 'expression': expression} for name, expression in backend.DEFAULT_FORMULAS['sliding']]
+    client.put('/api/admin/formulas/sliding', json={'formulas': formulas})
+    try:
+        bundle = client.get('/api/calculate/bundle').json()
+        vectors = client.get('/api/calculate/test-vectors', params={'count': 10}).json()['vectors']
+    finally:
+        client.delete('/api/admin/formulas/sliding')
+    method = backend.BUNDLE_FIELDS.index('method')
+    assert all(row[method] != 'sliding' for row in bundle['configurations'])
+    catalog = backend.get_catalog()
+    assert all(catalog.categories[vector['input']['category_id']].type_id != 1 for vector in vectors)
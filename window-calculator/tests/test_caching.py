@@ -0,0 +1,49 @@
+"""Catalog responses revalidate with ETags that change with every edit."""
+import pytest
+
+import backend
+
+
+def touch_catalog(client):
+    """An admin edit that changes nothing but the catalog version"""
+    series = client.get('/api/admin/all-data').json()['series'][0]
+    assert client.put(f"/api/admin/series/{series['id']}", json={'a': series['a']}).status_code == 200
+
+
+@pytest.mark.parametrize('path', ['/api/admin/all-data', '/api/admin/all-data?format=columnar', '/api/calculate/bundle'])
+def test_etag_revalidation(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    etag = response.headers['etag']
+    assert 'X-Catalog' in response.headers['vary']
+    assert f'-{backend.DEFAULT_CATALOG}-' in etag
+
+    cached = client.get(path, headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.headers['etag'] == etag
+    assert not cached.content
+
+    touch_catalog(client)
+    changed = client.get(path, headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['etag'] != etag
+    assert changed.headers['x-catalog-version'] == str(backend.read_catalog_version())
+
+
+def test_selection_is_not_served_from_the_full_etag(client):
+    etag = client.get('/api/admin/all-data').headers['etag']
+    response = client.get('/api/admin/all-data?tables=series', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert list(response.json()) == ['series']
+    assert 'X-Catalog' in response.headers['vary']
+
+
+def test_all_data_follows_the_edit(client):
+    before = client.get('/api/admin/all-data').json()
+    series = before['series'][0]
+    assert client.put(f"/api/admin/series/{series['id']}", json={'a': series['a'] + 1}).status_code == 200
+    try:
+        after = client.get('/api/admin/all-data').json()
+        assert after['series'][0]['a'] == series['a'] + 1
+    finally:
+        client.put(f"/api/admin/series/{series['id']}", json={'a': series['a']})
@@ -0,0 +1,95 @@
+"""/api/calculate/batch answers every row as /api/calculate would."""
+import pytest
+
+import backend
+
+
+def openings(opening, configurations):
+    """Valid rows across the configurations and one row per kind of error"""
+    rows = [{**opening, **key._asdict()} for key in configurations]
+    rows += [
+        {**opening, 'plaisio_width': 10000},
+        {**opening, 'has_rolo': True, 'rolo_height': 250, 'ur_value': 1.2},
+        {**opening, 'is_narrow': True},
+        {**opening, 'plaisio_height': 200},
+        {**opening, 'plaisio_width': 10001},
+        {**opening, 'ug_value': 0.2},
+        {**opening, 'psi_value': 0.07},
+        {**opening, 'has_rolo': True, 'rolo_height': None, 'ur_value': 1.2},
+        {**opening, 'has_rolo': True, 'rolo_height': 250, 'ur_value': 11},
+        {**opening, 'series_id': 999},
+        {**opening, 'category_id': 999},
+        {**opening, 'driver_id': 999},
+        {**opening, 'sash_id': 999},
+    ]
+    return rows
+
+
+def test_batch_matches_single_calculations(client, opening, configurations):
+    rows = openings(opening, configurations)
+    batch = client.post('/api/calculate/batch', json=rows).json()
+    errors = {error['index']: error for error in batch['errors']}
+    assert batch['count'] == len(rows)
+    assert batch['valid'] == len(rows) - len(errors)
+
+    for i, row in enumerate(rows):
+        response = client.post('/api/calculate', json=row)
+        if response.status_code == 200:
+            assert i not in errors, row
+            single = response.json()
+            for name in ('Uw', 'Uw_open', 'Uw_closed', 'GW', 'GH'):
+                expected = single[name]
+                assert batch['results'][name][i] == (None if expected is None else pytest.approx(expected, abs=1e-4)), name
+        else:
+            assert errors[i]['status'] == response.status_code, row
+            assert errors[i]['detail'] == response.json()['detail'], row
+            assert batch['results']['Uw'][i] is None
+
+
+def test_batch_columns_match_rows(client, opening, configurations):
+    rows = openings(opening, configurations)
+    columns = {field: [row.get(field) for row in rows] for field in backend.CALCULATION_FIELDS}
+    assert client.post('/api/calculate/batch', json=columns).json() == client.post('/api/calculate/batch', json=rows).json()
+
+
+def test_non_numeric_input_is_a_row_error(client, opening):
+    batch = client.post('/api/calculate/batch', json=[opening, {**opening, 'ug_value': 'thick'}]).json()
+    assert batch['valid'] == 1
+    assert batch['errors'] == [{
+        'index': 1, 'code': 'INVALID_VALUE', 'status': 422, 'detail': backend.BATCH_ERRORS['INVALID_VALUE'][1],
+    }]
+    assert client.post('/api/calculate', json={**opening, 'ug_value': 'thick'}).status_code == 422
+
+
+@pytest.mark.parametrize('field, value', [
+    ('plaisio_width', [1500, 1600]),
+    ('plaisio_width', {'mm': 1500}),
+    ('series_id', [1]),
+    ('is_narrow', 'false'),
+    ('is_narrow', '0'),
+    ('has_rolo', 2),
+    ('has_rolo', [True]),
+])
+def test_malformed_cell_is_a_row_error(client, opening, field, value):
+    rows = [opening, {**opening, field: value}, opening]
+    batch = client.post('/api/calculate/batch', json=rows).json()
+    assert batch['valid'] == 2
+    assert [(error['index'], error['code']) for error in batch['errors']] == [(1, 'INVALID_VALUE')]
+    assert batch['results']['Uw'][0] == batch['results']['Uw'][2] is not None
+
+
+def test_nested_column_is_a_row_error(client, opening):
+    columns = {**opening, 'plaisio_width': [[1, 2], 1500]}
+    batch = client.post('/api/calculate/batch', json=columns).json()
+    assert [(error['index'], error['code']) for error in batch['errors']] == [(0, 'INVALID_VALUE')]
+    assert batch['valid'] == 1
+
+
+def test_flags_take_bools_and_zero_or_one(client, opening):
+    rows = [{**opening, 'is_narrow': flag} for flag in (False, True, 0, 1, 0.0, 1.0, None)]
+    batch = client.post('/api/calculate/batch', json=rows).json()
+    assert batch['errors'] == []
+    uw = batch['results']['Uw']
+    assert uw[0] == uw[2] == uw[4] == uw[6]
+    assert uw[1] == uw[3] == uw[5]
+    assert uw[1] == client.post('/api/calculate', json={**opening, 'is_narrow': True}).json()['Uw']
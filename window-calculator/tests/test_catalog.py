@@ -0,0 +1,53 @@
+"""The in-memory catalog: slotted, immutable records of every catalog table."""
+import dataclasses
+import sqlite3
+
+import pytest
+
+import backend
+
+
+def test_records_match_the_database(client):
+    catalog = backend.get_catalog()
+    conn = sqlite3.connect(backend.DB_PATH)
+    conn.row_factory = sqlite3.Row
+    try:
+        for table, records in catalog.tables().items():
+            rows = conn.execute(f"SELECT * FROM {table} ORDER BY id").fetchall()
+            assert list(records) == [row['id'] for row in rows]
+            for row in rows:
+                record = records[row['id']]
+                assert {field.name: getattr(record, field.name) for field in dataclasses.fields(record)} == \
+                    {name: row[name] for name in row.keys()}
+    finally:
+        conn.close()
+
+
+def test_records_are_slotted_and_frozen(client):
+    series = next(iter(backend.get_catalog().series.values()))
+    assert not hasattr(series, '__dict__')
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        series.a = 0
+
+
+def test_sash_specific_params_come_first(client, configurations):
+    catalog = backend.get_catalog()
+    # A series with several sashes, one of them given its own params
+    key = next(key for key in configurations if sum(sash.series_id == key.series_id for sash in catalog.sashes.values()) > 1)
+    other = next(sash for sash in catalog.sashes.values() if sash.series_id == key.series_id and sash.id != key.sash_id)
+    shared = backend.resolve_calculation(catalog, key)[4]
+    assert shared.sash_id is None
+    specific = dataclasses.replace(shared, id=max(catalog.params_by_id) + 1, sash_id=key.sash_id, gw_offset=0)
+    changed = catalog.evolve(catalog.version + 1, {'series_category_params': {specific.id: specific}})
+    assert backend.resolve_calculation(changed, key)[4] == specific
+    assert backend.resolve_calculation(changed, key._replace(sash_id=other.id))[4] is shared
+
+
+def test_evolve_copies_only_changed_tables(client):
+    catalog = backend.get_catalog()
+    series = next(iter(catalog.series.values()))
+    changed = catalog.evolve(catalog.version + 1, {'series': {series.id: dataclasses.replace(series, a=series.a + 1)}})
+    assert changed.series[series.id].a == series.a + 1
+    assert catalog.series[series.id] is series
+    assert changed.categories is catalog.categories
+    assert changed.params is catalog.params
@@ -0,0 +1,80 @@
+"""Several catalogs: one SQLite file each, resident snapshots checked every
+CATALOG_VERSION_TTL seconds."""
+import sqlite3
+
+import pytest
+
+import backend
+
+
+@pytest.fixture
+def other(client, tmp_path, monkeypatch):
+    """A second seeded catalog, `other`, in a temporary CATALOG_DIR"""
+    monkeypatch.setattr(backend, 'CATALOG_DIR', str(tmp_path))
+    backend.init_db(str(tmp_path / 'other.db'))
+    yield 'other'
+    backend.initialized_catalogs.discard('other')
+    for state in (backend.resident_catalogs, backend.catalog_checked, backend.catalog_expired):
+        state.pop('other', None)
+
+
+def edit_series(path, series_id, uf1):
+    """An admin edit made through another worker"""
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE series SET uf1 = ? WHERE id = ?", (uf1, series_id))
+    backend.bump_catalog_version(conn.cursor())
+    conn.commit()
+    conn.close()
+
+
+def test_catalog_prefix(client, opening, other, tmp_path):
+    series = backend.get_catalog().series[opening['series_id']]
+    response = client.put(f"/api/catalogs/{other}/admin/series/{series.id}", json={'uf1': series.uf1 + 1})
+    assert response.status_code == 200
+    default = client.post('/api/calculate', json=opening).json()['Uw']
+    assert client.post(f'/api/catalogs/{other}/calculate', json=opening).json()['Uw'] > default
+    assert client.post('/api/calculate', json=opening, headers={'X-Catalog': other}).json()['Uw'] > default
+    assert other in [catalog['name'] for catalog in client.get('/api/catalogs').json()]
+
+
+def test_unknown_catalog(client, opening):
+    assert client.post('/api/catalogs/nothing/calculate', json=opening).status_code == 404
+    assert client.post('/api/calculate', json=opening, headers={'X-Catalog': '../x'}).status_code == 404
+    assert 'nothing' not in backend.catalog_refresh_locks
+
+
+def test_version_is_read_once_per_ttl(client, opening, other, tmp_path, monkeypatch):
+    monkeypatch.setattr(backend, 'CATALOG_VERSION_TTL', 3600)
+    reads = []
+    read_catalog_version = backend.read_catalog_version
+    monkeypatch.setattr(backend, 'read_catalog_version', lambda: reads.append(1) or read_catalog_version())
+    before = client.post(f'/api/catalogs/{other}/calculate', json=opening).json()['Uw']
+    for _ in range(5):
+        assert client.post(f'/api/catalogs/{other}/calculate', json=opening).json()['Uw'] == before
+    assert len(reads) <= 1
+
+    # Another worker's edit waits for the TTL, or the change event poll
+    series = backend.get_catalog().series[opening['series_id']]
+    edit_series(tmp_path / 'other.db', series.id, series.uf1 + 1)
+    assert client.post(f'/api/catalogs/{other}/calculate', json=opening).json()['Uw'] == before
+    backend.expire_catalog(other)
+    assert client.post(f'/api/catalogs/{other}/calculate', json=opening).json()['Uw'] > before
+
+
+def test_own_edits_are_seen_at_once(client, opening, other, monkeypatch):
+    monkeypatch.setattr(backend, 'CATALOG_VERSION_TTL', 3600)
+    series = backend.get_catalog().series[opening['series_id']]
+    before = client.post(f'/api/catalogs/{other}/calculate', json=opening).json()['Uw']
+    client.put(f"/api/catalogs/{other}/admin/series/{series.id}", json={'uf1': series.uf1 + 1})
+    assert client.post(f'/api/catalogs/{other}/calculate', json=opening).json()['Uw'] > before
+
+
+def test_least_recently_used_catalog_is_evicted(client, opening, other, monkeypatch):
+    monkeypatch.setattr(backend, 'MAX_RESIDENT_CATALOGS', 1)
+    client.post('/api/calculate', json=opening)
+    assert list(backend.resident_catalogs) == [backend.DEFAULT_CATALOG]
+    client.post(f'/api/catalogs/{other}/calculate', json=opening)
+    assert list(backend.resident_catalogs) == [other]
+    assert backend.DEFAULT_CATALOG not in backend.catalog_checked
+    assert client.post('/api/calculate', json=opening).status_code == 200
+    assert list(backend.resident_catalogs) == [backend.DEFAULT_CATALOG]
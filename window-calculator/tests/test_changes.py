@@ -0,0 +1,82 @@
+"""/api/admin/changes?since=: what a replica of all-data at `since` is missing."""
+import sqlite3
+
+import pytest
+
+import backend
+
+
+def all_data(client):
+    response = client.get('/api/admin/all-data')
+    return response.json(), int(response.headers['x-catalog-version'])
+
+
+def apply_changes(data, changes):
+    """applyCatalogChanges() of src/api/index.js"""
+    data = dict(data)
+    for table, change in changes['changes'].items():
+        rows = {row['id']: row for row in data.get(table, [])}
+        rows.update((row['id'], row) for row in change['upserted'])
+        for row_id in change['deleted']:
+            rows.pop(row_id, None)
+        data[table] = sorted(rows.values(), key=lambda row: row['id'])
+    return data
+
+
+def committed_elsewhere(statements):
+    """Statements committed as one catalog edit by another process"""
+    conn = sqlite3.connect(backend.DB_PATH)
+    for sql, values in statements:
+        conn.execute(sql, values)
+    backend.bump_catalog_version(conn.cursor())
+    conn.commit()
+    conn.close()
+    backend.expire_catalog(backend.DEFAULT_CATALOG)
+
+
+def test_replica_catches_up(client, opening):
+    replica, since = all_data(client)
+    series = backend.get_catalog().series[opening['series_id']]
+    client.put(f"/api/admin/series/{series.id}", json={'name': 'Renamed'})
+    committed_elsewhere([
+        ("INSERT INTO driver_categories (id, driver_id, category_id) VALUES (9000, 1, 2)", ()),
+        ("INSERT INTO driver_categories (id, driver_id, category_id) VALUES (9001, 1, 3)", ()),
+    ])
+    committed_elsewhere([("DELETE FROM driver_categories WHERE id = 9001", ())])
+    try:
+        changes = client.get('/api/admin/changes', params={'since': since}).json()
+        current, version = all_data(client)
+        assert (changes['since'], changes['version']) == (since, version) == (since, since + 3)
+        assert changes['changes']['series']['upserted'] == [row for row in current['series'] if row['id'] == series.id]
+        # Inserted and deleted since: only reported as deleted
+        assert changes['changes']['driver_categories'] == {
+            'upserted': [{'id': 9000, 'driver_id': 1, 'category_id': 2}], 'deleted': [9001],
+        }
+        assert apply_changes(replica, changes) == current
+    finally:
+        client.put(f"/api/admin/series/{series.id}", json={'name': series.name})
+        committed_elsewhere([("DELETE FROM driver_categories WHERE id = 9000", ())])
+
+
+def test_nothing_missing(client):
+    _, version = all_data(client)
+    assert client.get('/api/admin/changes', params={'since': version}).json() == {
+        'since': version, 'version': version, 'changes': {},
+    }
+
+
+def test_pruned_history_is_gone(client, opening, monkeypatch):
+    _, since = all_data(client)
+    series = backend.get_catalog().series[opening['series_id']]
+    monkeypatch.setattr(backend, 'CHANGE_LOG_RETENTION', 1)
+    client.put(f"/api/admin/series/{series.id}", json={'uf2': series.uf2 + 1})
+    client.put(f"/api/admin/series/{series.id}", json={'uf2': series.uf2})
+    response = client.get('/api/admin/changes', params={'since': since})
+    assert response.status_code == 410
+    assert 'reload /api/admin/all-data' in response.json()['detail']
+    assert client.get('/api/admin/changes', params={'since': since + 1}).status_code == 200
+
+
+@pytest.mark.parametrize('since', ['', 'latest'])
+def test_since_is_a_version(client, since):
+    assert client.get('/api/admin/changes', params={'since': since}).status_code == 422
@@ -0,0 +1,73 @@
+"""The compiled catalog table, shared between workers through CATALOG_SHARE_DIR."""
+import numpy as np
+import pytest
+
+import backend
+
+
+@pytest.fixture
+def share_dir(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(backend, 'CATALOG_SHARE_DIR', str(tmp_path))
+    monkeypatch.setattr(backend, 'compiled_catalogs', {})
+    return tmp_path
+
+
+def another_worker(monkeypatch):
+    """Forget this worker's compiled table, as a fresh worker has none"""
+    monkeypatch.setattr(backend, 'compiled_catalogs', {})
+
+
+def test_shared_table_gives_the_same_results(client, opening, configurations, share_dir, monkeypatch):
+    rows = [{**opening, **key._asdict()} for key in configurations]
+    backend.CATALOG_SHARE_DIR = None
+    local = client.post('/api/calculate/batch', json=rows).json()
+    backend.CATALOG_SHARE_DIR = str(share_dir)
+    another_worker(monkeypatch)
+    assert client.post('/api/calculate/batch', json=rows).json() == local
+
+    version = backend.get_catalog().version
+    assert [path.name for path in share_dir.iterdir()] == [f'default-{version}.npy']
+    compiled = backend.compiled_catalogs[backend.DEFAULT_CATALOG]
+    assert isinstance(compiled.table, np.memmap)
+    np.testing.assert_array_equal(compiled.table, backend.compile_catalog(backend.get_catalog()))
+
+
+def test_other_workers_map_the_written_table(client, opening, share_dir, monkeypatch):
+    expected = client.post('/api/calculate/batch', json=[opening]).json()
+    another_worker(monkeypatch)
+
+    def compile_catalog(catalog):
+        raise AssertionError('compiled again')
+
+    monkeypatch.setattr(backend, 'compile_catalog', compile_catalog)
+    assert client.post('/api/calculate/batch', json=[opening]).json() == expected
+
+
+def test_new_version_replaces_the_file(client, opening, share_dir):
+    client.post('/api/calculate/batch', json=[opening])
+    series = backend.get_catalog().series[opening['series_id']]
+    client.put(f"/api/admin/series/{series.id}", json={'uf1': series.uf1 + 1})
+    try:
+        version = backend.get_catalog().version
+        uw = client.post('/api/calculate/batch', json=[opening]).json()['results']['Uw']
+        assert uw == [client.post('/api/calculate', json=opening).json()['Uw']]
+        assert [path.name for path in share_dir.iterdir()] == [f'default-{version}.npy']
+    finally:
+        client.put(f"/api/admin/series/{series.id}", json={'uf1': series.uf1})
+
+
+def test_file_of_another_layout_is_rewritten(client, opening, share_dir):
+    version = backend.get_catalog().version
+    np.save(share_dir / f'default-{version}.npy', np.zeros((3, 2)))
+    client.post('/api/calculate/batch', json=[opening])
+    table = np.load(share_dir / f'default-{version}.npy')
+    assert table.shape[1] == len(backend.ConfigKey._fields) + len(backend.CONFIG_COLUMNS)
+
+
+def test_newer_files_are_left_alone(client, opening, share_dir):
+    version = backend.get_catalog().version
+    newer = share_dir / f'default-{version + 1}.npy'
+    np.save(newer, np.zeros((0, len(backend.ConfigKey._fields) + len(backend.CONFIG_COLUMNS))))
+    np.save(share_dir / f'default-{version - 1}.npy', np.zeros((0, 2)))
+    client.post('/api/calculate/batch', json=[opening])
+    assert sorted(path.name for path in share_dir.iterdir()) == sorted([f'default-{version}.npy', newer.name])
@@ -0,0 +1,123 @@
+"""/api/calculate/compliance: Uw limits per climate zone and the cheapest passing alternative."""
+import pytest
+
+import backend
+
+BEST_GLAZING = {'ug_value': min(backend.COMPLIANCE_UG_STEPS), 'psi_value': min(backend.PSI_VALUES)}
+
+
+def screen(client, rows, **params):
+    response = client.post('/api/calculate/compliance', params=params, json=rows)
+    assert response.status_code == 200
+    return response.json()
+
+
+def checked(client, body):
+    result = client.post('/api/calculate', json=body).json()
+    return result['Uw_closed'] if result['Uw_closed'] is not None else result['Uw']
+
+
+@pytest.fixture
+def rows(opening, configurations):
+    """Every configuration with good and poor glazing"""
+    return [
+        {**opening, **key._asdict(), 'ug_value': ug_value, 'psi_value': psi_value}
+        for key in configurations for ug_value in (1.1, 2.8, 5.0) for psi_value in (0.08, 0.11)
+    ]
+
+
+def test_results_follow_the_limits(client, rows):
+    result = screen(client, rows, climate_zone='D')
+    limit = backend.get_catalog().uw_limits[('D', backend.COMPLIANCE_BUILDING_USE)]
+    assert result['errors'] == []
+    assert result['valid'] == len(rows) == result['passed'] + result['failed']
+    for i, row in enumerate(rows):
+        uw = client.post('/api/calculate', json=row).json()['Uw']
+        assert result['results']['Uw'][i] == uw
+        assert result['results']['max_uw'][i] == limit
+        assert result['results']['pass'][i] == (uw <= limit)
+        assert result['results']['margin'][i] == pytest.approx(limit - uw, abs=1e-4)
+    assert [entry['index'] for entry in result['alternatives']] == [
+        i for i, passed in enumerate(result['results']['pass']) if not passed
+    ]
+
+
+def test_alternatives_pass_and_are_cheapest(client, rows, configurations):
+    result = screen(client, rows, climate_zone='D')
+    limit = backend.get_catalog().uw_limits[('D', backend.COMPLIANCE_BUILDING_USE)]
+    assert result['failed'] and any(entry['alternative'] is None for entry in result['alternatives'])
+    for entry in result['alternatives']:
+        row = rows[entry['index']]
+        own_best = checked(client, {**row, **BEST_GLAZING})
+        alternative = entry['alternative']
+        if alternative is None:
+            # Nothing of the category passes, even with the best glazing
+            for key in configurations:
+                if key.category_id == row['category_id']:
+                    assert checked(client, {**row, **key._asdict(), **BEST_GLAZING}) > limit
+            continue
+
+        values = {field: alternative[field] for field in (*backend.ConfigKey._fields, 'ug_value', 'psi_value')}
+        assert alternative['changed'] == [field for field, value in values.items() if value != row[field]]
+        assert checked(client, {**row, **values}) == alternative['Uw'] <= limit
+        assert alternative['margin'] == pytest.approx(limit - alternative['Uw'], abs=1e-4)
+        if alternative['change'] == 'glazing':
+            assert set(alternative['changed']) <= {'ug_value', 'psi_value'}
+        else:
+            # Better glazing alone was not enough
+            assert own_best > limit
+            assert (values['series_id'] == row['series_id']) == (alternative['change'] == 'driver_sash')
+
+
+def test_limits_per_opening(client, opening):
+    rows = [
+        {**opening, 'climate_zone': 'A'},
+        {**opening, 'climate_zone': 'D', 'building_use': 'non_residential'},
+        {**opening, 'climate_zone': 'Z'},
+        {**opening, 'building_use': 7},
+        opening,
+    ]
+    result = screen(client, rows, climate_zone='B')
+    limits = backend.get_catalog().uw_limits
+    assert result['results']['max_uw'] == [
+        limits[('A', 'residential')], limits[('D', 'non_residential')], None, None, limits[('B', 'residential')],
+    ]
+    assert [(error['index'], error['code'], error['status']) for error in result['errors']] == [
+        (2, 'LIMIT_NOT_FOUND', 404), (3, 'LIMIT_NOT_FOUND', 404),
+    ]
+    # Without a zone no opening has a limit
+    assert screen(client, [opening])['errors'][0]['code'] == 'LIMIT_NOT_FOUND'
+
+
+def test_rolo_openings_are_checked_closed(client, opening):
+    row = {**opening, 'has_rolo': True, 'rolo_height': 250, 'ur_value': 1.2}
+    single = client.post('/api/calculate', json=row).json()
+    result = screen(client, [row], climate_zone='A', alternatives='false')
+    limit = backend.get_catalog().uw_limits[('A', 'residential')]
+    assert result['results']['Uw_closed'] == [single['Uw_closed']]
+    assert result['results']['margin'] == [pytest.approx(limit - single['Uw_closed'], abs=1e-4)]
+    assert result['alternatives'] is None
+
+
+def test_edited_limits_apply(client, opening):
+    limits = client.get('/api/admin/uw-limits').json()
+    uw = client.post('/api/calculate', json=opening).json()['Uw']
+    edited = [{**limit, 'max_uw': uw - 0.01} if limit['climate_zone'] == 'A' else limit for limit in limits]
+    assert client.put('/api/admin/uw-limits', json={'limits': edited}).status_code == 200
+    try:
+        result = screen(client, [opening], climate_zone='A')
+        assert result['results']['pass'] == [False]
+        assert result['alternatives'][0]['alternative']['Uw'] <= uw - 0.01
+    finally:
+        client.put('/api/admin/uw-limits', json={'limits': limits})
+    assert screen(client, [opening], climate_zone='A')['results']['pass'] == [True]
+
+
+@pytest.mark.parametrize('limits, detail', [
+    ([{'climate_zone': ' ', 'building_use': 'residential', 'max_uw': 2}], "Climate zone and building use must not be empty"),
+    ([{'climate_zone': 'A', 'building_use': 'residential', 'max_uw': 0}], "max_uw must be positive"),
+    ([{'climate_zone': 'A', 'building_use': 'residential', 'max_uw': 2}] * 2, "Duplicate climate zone and building use"),
+])
+def test_limit_table_checks(client, limits, detail):
+    response = client.put('/api/admin/uw-limits', json={'limits': limits})
+    assert (response.status_code, response.json()['detail']) == (400, detail)
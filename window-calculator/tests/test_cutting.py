@@ -0,0 +1,181 @@
+"""Glass nesting and profile cutting: every piece placed once, nothing overlaps."""
+from collections import Counter
+from random import Random
+
+import pytest
+
+import backend
+
+
+def random_panes(random, count):
+    return [[random.randint(150, 2500), random.randint(150, 2000), random.randint(1, 12)] for _ in range(count)]
+
+
+def check_layouts(panes, sheet, layouts, oversize):
+    placed = Counter()
+    for layout in layouts:
+        pieces = layout['pieces']
+        for pane, x, y, width, height, rotated in pieces:
+            pane_width, pane_height = panes[pane][:2]
+            assert (width, height) == ((pane_height, pane_width) if rotated else (pane_width, pane_height))
+            assert not rotated or sheet.rotate
+            assert x >= sheet.trim and y >= sheet.trim
+            assert x + width <= sheet.width - sheet.trim and y + height <= sheet.height - sheet.trim
+        # The gap is kept between panes
+        for i, (_, x, y, width, height, _) in enumerate(pieces):
+            for _, other_x, other_y, other_width, other_height, _ in pieces[i + 1:]:
+                assert (
+                    x + width + sheet.gap <= other_x or other_x + other_width + sheet.gap <= x
+                    or y + height + sheet.gap <= other_y or other_y + other_height + sheet.gap <= y
+                )
+        for piece in pieces:
+            placed[piece[0]] += layout['sheets']
+    assert placed == Counter({i: pane[2] for i, pane in enumerate(panes) if i not in oversize})
+
+
+@pytest.mark.parametrize('seed', range(20))
+@pytest.mark.parametrize('trim, gap, rotate', [(0, 0, True), (10, 4, True), (15, 6, False)])
+def test_nesting(seed, trim, gap, rotate):
+    random = Random(seed)
+    panes = random_panes(random, random.randint(1, 25))
+    panes.append([3500, 3500, 2])  # larger than the sheet
+    sheet = backend.glass_sheet(backend.GLASS_SHEET_WIDTH, backend.GLASS_SHEET_HEIGHT, trim, gap, rotate)
+    layouts, oversize = backend.nest_panes(panes, sheet)
+    assert oversize == [len(panes) - 1]
+    check_layouts(panes, sheet, layouts, oversize)
+
+
+@pytest.mark.parametrize('seed', range(20))
+@pytest.mark.parametrize('kerf, trim', [(0, 0), (4, 0), (5, 25)])
+def test_bar_cutting(seed, kerf, trim):
+    random = Random(seed)
+    pieces = sorted(
+        {random.randint(200, 3000): random.randint(1, 20) for _ in range(random.randint(1, 15))}.items(),
+        reverse=True,
+    )
+    pieces.insert(0, (7000, 1))  # longer than a bar
+    bar = backend.profile_bar(backend.PROFILE_BAR_LENGTH, kerf, trim)
+    patterns, oversize = backend.cut_bars(pieces, bar)
+    assert oversize == [0]
+
+    cut = Counter()
+    for pattern in patterns:
+        used = sum(pieces[piece][0] + kerf for piece in pattern['cuts'])
+        assert used <= bar.length - 2 * trim + kerf
+        assert pattern['offcut'] == pytest.approx(max(bar.length - 2 * trim - used, 0), abs=0.05)
+        for piece in pattern['cuts']:
+            cut[piece] += pattern['bars']
+    assert cut == Counter({i: count for i, (_, count) in enumerate(pieces) if i not in oversize})
+
+
+def test_many_open_bars():
+    # Every bar keeps room for the short pieces: the improvement pass tries
+    # each of them against all the others
+    pieces = [(3300, 20_000), (1000, 100)]
+    bar = backend.profile_bar(backend.PROFILE_BAR_LENGTH, 4, 0)
+    patterns, oversize = backend.cut_bars(pieces, bar)
+    assert oversize == []
+    cut = Counter()
+    for pattern in patterns:
+        for piece in pattern['cuts']:
+            cut[piece] += pattern['bars']
+    assert cut == Counter({0: 20_000, 1: 100})
+    assert sum(pattern['bars'] for pattern in patterns) == 20_000
+
+
+def test_glass_endpoint(client, opening, configurations):
+    rows = [{**opening, **key._asdict(), 'quantity': 1 + i % 3} for i, key in enumerate(configurations)]
+    rows.append({**opening, 'psi_value': 0.07})
+    plan = client.post('/api/calculate/glass', params={'trim': 10, 'gap': 3}, json=rows).json()
+    assert plan['valid'] == len(rows) - 1
+    assert [error['index'] for error in plan['errors']] == [len(rows) - 1]
+
+    sheet = backend.GlassSheet(**plan['sheet'])
+    panes = [[pane['width'], pane['height'], pane['quantity']] for pane in plan['panes']]
+    oversize = [entry['pane'] for entry in plan['oversize']]
+    check_layouts(panes, sheet, plan['layouts'], oversize)
+    assert plan['sheets'] >= plan['min_sheets']
+
+    # Every leaf of every opening is a pane
+    batch = client.post('/api/calculate/batch', json=rows[:-1]).json()
+    catalog = backend.get_catalog()
+    leaves = sum(catalog.categories[row['category_id']].num_glasses * row['quantity'] for row in rows[:-1])
+    assert sum(pane[2] for pane in panes) == leaves
+    assert sorted({(round(w), round(h)) for w, h in zip(batch['results']['GW'], batch['results']['GH'])}) == \
+        sorted((pane[0], pane[1]) for pane in panes)
+
+
+def opening_params(opening):
+    catalog = backend.get_catalog()
+    return next(
+        params for params in catalog.params_by_id.values()
+        if (params.series_id, params.category_id) == (opening['series_id'], opening['category_id'])
+    )
+
+
+@pytest.mark.parametrize('quantity', [0, 1.5, backend.MAX_QUANTITY + 1, 1e19, 'two'])
+def test_glass_quantity_out_of_range(client, opening, quantity):
+    plan = client.post('/api/calculate/glass', json=[opening, {**opening, 'quantity': quantity}]).json()
+    assert plan['valid'] == 1
+    assert [(error['index'], error['code']) for error in plan['errors']] == [(1, 'INVALID_VALUE')]
+    assert plan['pane_count'] == backend.get_catalog().categories[opening['category_id']].num_glasses
+
+
+def test_glass_rows_without_glass_area(client, opening, configurations):
+    params = opening_params(opening)
+    other = next(
+        {**opening, **key._asdict()} for key in configurations
+        if (key.series_id, key.category_id) != (opening['series_id'], opening['category_id'])
+    )
+    # The height offset leaves no glass for this configuration
+    client.put(f"/api/admin/series-category-params/{params.id}", json={'gh_offset': opening['plaisio_height'] + 100})
+    try:
+        plan = client.post('/api/calculate/glass', json=[opening, other]).json()
+    finally:
+        client.put(f"/api/admin/series-category-params/{params.id}", json={'gh_offset': params.gh_offset})
+    assert plan['valid'] == 1
+    assert plan['errors'] == [{
+        'index': 0, 'code': 'NO_GLASS_AREA', 'status': 422,
+        'detail': backend.BATCH_ERRORS['NO_GLASS_AREA'][1],
+    }]
+    assert plan['pane_count'] == backend.get_catalog().categories[other['category_id']].num_glasses
+
+
+def test_profiles_endpoint(client, opening, configurations):
+    rows = [{**opening, **key._asdict(), 'quantity': 2} for key in configurations]
+    plan = client.post('/api/calculate/profiles', params={'kerf': 4}, json=rows).json()
+    assert plan['valid'] == len(rows)
+    for profile in plan['profiles']:
+        cut = Counter()
+        for pattern in profile['patterns']:
+            for piece in pattern['cuts']:
+                cut[piece] += pattern['bars']
+        assert cut == Counter({i: piece['quantity'] for i, piece in enumerate(profile['pieces'])})
+        assert profile['bars'] >= profile['min_bars']
+    # Four frame and 4 * leaves sash pieces per opening
+    catalog = backend.get_catalog()
+    expected = sum((4 + 4 * catalog.categories[row['category_id']].num_glasses) * 2 for row in rows)
+    assert sum(profile['piece_count'] for profile in plan['profiles']) == expected
+
+
+@pytest.mark.parametrize('quantity', [0, 2.5, backend.MAX_QUANTITY + 1, 1e19])
+def test_profile_quantity_out_of_range(client, opening, quantity):
+    plan = client.post('/api/calculate/profiles', json=[opening, {**opening, 'quantity': quantity}]).json()
+    assert plan['valid'] == 1
+    assert [(error['index'], error['code']) for error in plan['errors']] == [(1, 'INVALID_VALUE')]
+    leaves = backend.get_catalog().categories[opening['category_id']].num_glasses
+    assert sum(profile['piece_count'] for profile in plan['profiles']) == 4 + 4 * leaves
+
+
+def test_profile_rows_too_small(client, opening):
+    params = opening_params(opening)
+    # The width offset leaves the sash pieces no length
+    client.put(f"/api/admin/series-category-params/{params.id}", json={'gw_offset': opening['plaisio_width']})
+    try:
+        plan = client.post('/api/calculate/profiles', json=[opening, {**opening, 'plaisio_width': 4000}]).json()
+    finally:
+        client.put(f"/api/admin/series-category-params/{params.id}", json={'gw_offset': params.gw_offset})
+    assert [(error['index'], error['code'], error['status']) for error in plan['errors']] == [(0, 'PROFILE_TOO_SHORT', 422)]
+    assert plan['valid'] == 1
+    frame = next(profile for profile in plan['profiles'] if profile['profile'] == 'frame')
+    assert {piece['length'] for piece in frame['pieces']} == {4000, opening['plaisio_height']}
@@ -0,0 +1,107 @@
+"""/api/catalog/events: a version event, then one event per committed catalog edit."""
+import asyncio
+import json
+import sqlite3
+
+import pytest
+from starlette.requests import Request
+
+import backend
+
+
+@pytest.fixture
+def broker(client, monkeypatch):
+    """A broker of its own, used only from the test's event loop"""
+    monkeypatch.setattr(backend, 'catalog_events', backend.CatalogEventBroker())
+    return backend.catalog_events
+
+
+def event_request(last_event_id=None):
+    headers = [(b'last-event-id', last_event_id.encode())] if last_event_id else []
+    return Request({'type': 'http', 'method': 'GET', 'path': '/api/catalog/events', 'headers': headers, 'query_string': b''})
+
+
+def parse(message):
+    fields = dict(line.split(': ', 1) for line in message.strip().split('\n'))
+    return fields['event'], json.loads(fields['data'])
+
+
+def edit_series(series_id, **values):
+    """An edit committed by another worker"""
+    conn = sqlite3.connect(backend.DB_PATH)
+    conn.execute(f"UPDATE series SET {', '.join(f'{name} = ?' for name in values)} WHERE id = ?", [*values.values(), series_id])
+    backend.bump_catalog_version(conn.cursor())
+    conn.commit()
+    conn.close()
+
+
+def test_stream_sends_the_version_then_changes(broker, opening):
+    series = backend.get_catalog().series[opening['series_id']]
+
+    async def run():
+        response = await backend.catalog_event_stream(event_request())
+        assert response.media_type == 'text/event-stream'
+        events = response.body_iterator
+        try:
+            assert await anext(events) == 'retry: 5000\n\n'
+            kind, first = parse(await anext(events))
+            assert (kind, first) == ('version', {'type': 'version', 'catalog': 'default', 'version': backend.read_catalog_version()})
+            assert broker.stats()['subscribers'] == 1
+
+            edit_series(series.id, uf1=series.uf1 + 1)
+            await broker.poll(backend.DEFAULT_CATALOG)
+            kind, change = parse(await anext(events))
+            assert kind == 'catalog-change'
+            assert change == {'type': 'catalog-change', 'catalog': 'default', 'version': first['version'] + 1, 'table': 'series', 'ids': [series.id]}
+            # The poll expired the resident catalog
+            assert backend.get_catalog().series[series.id].uf1 == series.uf1 + 1
+        finally:
+            await events.aclose()
+        assert broker.stats()['subscribers'] == 0
+
+    try:
+        asyncio.run(run())
+    finally:
+        edit_series(series.id, uf1=series.uf1)
+        backend.expire_catalog(backend.DEFAULT_CATALOG)
+
+
+def test_reconnect_after_missed_changes(broker):
+    async def run():
+        version = backend.read_catalog_version()
+        for last_seen, expected in ((str(version), 'version'), (str(version - 1), 'resync')):
+            events = (await backend.catalog_event_stream(event_request(last_seen))).body_iterator
+            await anext(events)
+            assert parse(await anext(events))[0] == expected
+            await events.aclose()
+
+    asyncio.run(run())
+
+
+def test_slow_subscriber_gets_one_resync(broker):
+    async def run():
+        queue = broker.subscribe('default', 1)
+        for version in range(2, backend.CATALOG_EVENT_QUEUE_SIZE + 3):
+            broker.publish({'type': 'catalog-change', 'catalog': 'default', 'version': version, 'table': 'series', 'ids': [1]})
+        assert queue.qsize() == 1
+        assert queue.get_nowait() == {'type': 'resync', 'catalog': 'default', 'version': backend.CATALOG_EVENT_QUEUE_SIZE + 2}
+        assert broker.resyncs == 1
+        broker.unsubscribe('default', queue)
+
+    asyncio.run(run())
+
+
+def test_params_change_carries_its_configuration(client, opening):
+    catalog = backend.get_catalog()
+    params = next(iter(catalog.params_by_id.values()))
+    since = catalog.version
+    assert client.put(f"/api/admin/series-category-params/{params.id}", json={'gh_offset': params.gh_offset + 1}).status_code == 200
+    try:
+        version, events = backend.load_change_events(backend.DEFAULT_CATALOG, since)
+    finally:
+        client.put(f"/api/admin/series-category-params/{params.id}", json={'gh_offset': params.gh_offset})
+    assert version == since + 1
+    assert events == [{
+        'type': 'catalog-change', 'catalog': 'default', 'version': version, 'table': 'series_category_params',
+        'ids': [params.id], 'series_id': params.series_id, 'category_id': params.category_id,
+    }]
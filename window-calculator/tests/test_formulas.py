@@ -0,0 +1,95 @@
+"""Admin formulas: only the formula language compiles."""
+import pytest
+
+import backend
+
+SLIDING = backend.DEFAULT_FORMULAS['sliding']
+
+
+def with_formula(name, expression):
+    """The built-in sliding formulas with `name` replaced (or appended)"""
+    formulas = [[formula, expression if formula == name else body] for formula, body in SLIDING]
+    if name not in dict(SLIDING):
+        formulas.insert(0, [name, expression])
+    return [{'name': formula, 'expression': body} for formula, body in formulas]
+
+
+@pytest.mark.parametrize('formulas, message', [
+    (with_formula('Uw', "__import__('os')"), "only abs(x), min(x, y, ...) and max(x, y, ...) can be called"),
+    (with_formula('Uw', 'a.real'), "Attribute is not allowed"),
+    (with_formula('Uw', "'x'"), "only numbers are allowed as constants"),
+    (with_formula('Uw', '1e400'), "number too large"),
+    (with_formula('Uw', '99999999999999999999' * 20), "number too large"),
+    (with_formula('Uw', 'a ** 2'), "only + - * / are allowed"),
+    (with_formula('Uw', 'a and b'), "'and'/'or' are only allowed in conditions"),
+    (with_formula('Uw', 'nothing'), "unknown name 'nothing'"),
+    (with_formula('Uw', 'Aw if 1 < a < 2 else 0'), "use one of < <= > >= == != per comparison"),
+    (with_formula('Uw', 'abs(a, b)'), "abs() takes one argument"),
+    (with_formula('Uw', 'a +'), "Uw: "),
+    (with_formula('where', '1'), "'where' is reserved"),
+    (with_formula('truthy', '1'), "'truthy' is reserved"),
+    (with_formula('Ug', '1'), "Ug: already defined"),
+    (with_formula('_hidden', '1'), "'_hidden' is not a valid formula name"),
+    ([formula for formula in with_formula('Uw', '1') if formula['name'] != 'Uw'], "Missing formulas for Uw"),
+    ([], "A method needs between 1 and"),
+])
+def test_rejected_formulas(client, formulas, message):
+    response = client.put('/api/admin/formulas/sliding', json={'formulas': formulas})
+    assert response.status_code == 400
+    assert message in response.json()['detail']
+
+
+def test_unknown_method(client):
+    response = client.put('/api/admin/formulas/nothing', json={'formulas': with_formula('Uw', '1')})
+    assert response.status_code == 404
+
+
+def test_edited_formulas_apply_until_reset(client, opening):
+    before = client.post('/api/calculate', json=opening).json()['Uw']
+    assert client.put('/api/admin/formulas/sliding', json={'formulas': with_formula('Uw', '2.5')}).status_code == 200
+    try:
+        assert client.post('/api/calculate', json=opening).json()['Uw'] == 2.5
+        batch = client.post('/api/calculate/batch', json=[opening]).json()
+        assert batch['results']['Uw'] == [2.5]
+    finally:
+        assert client.delete('/api/admin/formulas/sliding').status_code == 200
+    assert client.post('/api/calculate', json=opening).json()['Uw'] == before
+
+
+def test_default_formulas_match_the_hand_written_methods(client):
+    assert backend.check_default_formulas() == []
+
+
+@pytest.mark.parametrize('expression, reason', [
+    (f"({dict(SLIDING)['Uw']}) * 1e308 * 1e308", 'no finite result'),
+    (f"({dict(SLIDING)['Uw']}) / (Aw - Aw)", 'a division by zero'),
+])
+def test_formulas_without_finite_results_are_not_stored(client, opening, expression, reason):
+    before = client.get('/api/admin/formulas').json()
+    response = client.put('/api/admin/formulas/sliding', json={'formulas': with_formula('Uw', expression)})
+    assert response.status_code == 400
+    assert response.json()['detail'].startswith(f"The formulas give {reason} for ")
+    assert client.get('/api/admin/formulas').json() == before
+
+
+def test_non_finite_results_are_calculation_failures(client, opening, monkeypatch):
+    """Formulas stored before the trial run, or inputs it did not try"""
+    monkeypatch.setattr(backend, 'formula_trial_problem', lambda catalog, method_name, definitions: None)
+    expression = f"({dict(SLIDING)['Uw']}) * 1e308 * 1e308"
+    assert client.put('/api/admin/formulas/sliding', json={'formulas': with_formula('Uw', expression)}).status_code == 200
+    try:
+        response = client.post('/api/calculate', json=opening)
+        assert response.status_code == 422
+        assert response.json()['detail'] == backend.CALCULATION_FAILED
+        batch = client.post('/api/calculate/batch', json=[opening]).json()
+        assert [error['code'] for error in batch['errors']] == ['CALCULATION_FAILED']
+        project = client.post('/api/projects', json={'name': 'Overflow', 'openings': []}).json()
+        try:
+            response = client.post(f"/api/projects/{project['id']}/openings", json=opening)
+            assert response.status_code == 422
+            assert response.json()['detail'] == backend.CALCULATION_FAILED
+        finally:
+            client.delete(f"/api/projects/{project['id']}")
+    finally:
+        client.delete('/api/admin/formulas/sliding')
+    assert client.post('/api/calculate', json=opening).status_code == 200
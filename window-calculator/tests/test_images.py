@@ -0,0 +1,139 @@
+"""Image uploads: size and type checks, the WebP/JPEG variants and image_url."""
+import asyncio
+import io
+import sqlite3
+import time
+
+import pytest
+from starlette.requests import Request
+
+import backend
+
+Image = pytest.importorskip('PIL.Image')
+
+
+@pytest.fixture
+def media(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(backend, 'MEDIA_DIR', str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def category(client):
+    """A category whose image_url is put back afterwards"""
+    row = client.get('/api/categories', params={'fields': 'image_url', 'limit': 1}).json()[0]
+    yield row['id']
+    conn = sqlite3.connect(backend.DB_PATH)
+    conn.execute("UPDATE categories SET image_url = ? WHERE id = ?", (row['image_url'], row['id']))
+    conn.commit()
+    conn.close()
+    backend.expire_catalog(backend.DEFAULT_CATALOG)
+
+
+def png(width, height, seed=0):
+    """Half transparent, half opaque red"""
+    image = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    image.paste((255, seed, 0, 255), (0, 0, width // 2, height))
+    body = io.BytesIO()
+    image.save(body, 'PNG')
+    return body.getvalue()
+
+
+def upload(client, table, row_id, data, content_type='image/png'):
+    return client.put(f'/api/admin/{table}/{row_id}/image', content=data, headers={'Content-Type': content_type})
+
+
+def image_url(client, category_id, digest, timeout=10):
+    """image_url of the category once it points at the upload `digest`"""
+    deadline = time.monotonic() + timeout
+    while True:
+        rows = client.get('/api/categories', params={'fields': 'image_url'}).json()
+        url = next(row['image_url'] for row in rows if row['id'] == category_id)
+        if (url or '').startswith(f'{backend.MEDIA_URL}/{digest}') or time.monotonic() > deadline:
+            return url
+        time.sleep(0.02)
+
+
+def test_variants_are_written(client, media, category):
+    data = png(1600, 900, seed=1)
+    response = upload(client, 'categories', category, data)
+    assert response.status_code == 202
+    digest = response.json()['hash']
+    assert (media / f'{digest}.png').read_bytes() == data
+
+    url = image_url(client, category, digest)
+    assert url == f'{backend.MEDIA_URL}/{digest}-{backend.IMAGE_URL_WIDTH}w.webp'
+    job = client.get(f'/api/admin/images/{digest}').json()
+    assert job['status'] == 'done'
+    assert job['variants'] == [
+        f'{backend.MEDIA_URL}/{digest}-{width}w.{ext}' for width in backend.IMAGE_WIDTHS for ext in ('webp', 'jpg')
+    ]
+    for width in backend.IMAGE_WIDTHS:
+        with Image.open(media / f'{digest}-{width}w.webp') as webp:
+            assert (webp.format, webp.size, webp.mode) == ('WEBP', (width, round(900 * width / 1600)), 'RGBA')
+        with Image.open(media / f'{digest}-{width}w.jpg') as jpeg:
+            assert (jpeg.format, jpeg.size, jpeg.mode) == ('JPEG', (width, round(900 * width / 1600)), 'RGB')
+            # The transparent half is laid on white
+            red, green, blue = jpeg.getpixel((width * 3 // 4, 10))
+            assert min(red, green, blue) > 240
+            assert jpeg.getpixel((width // 4, 10))[0] > 200 > jpeg.getpixel((width // 4, 10))[2]
+
+    served = client.get(f'{backend.MEDIA_URL}/{digest}-320w.jpg')
+    assert served.headers['content-type'] == 'image/jpeg'
+    assert 'immutable' in served.headers['cache-control']
+
+
+def test_small_original_keeps_its_width(client, media, category):
+    response = upload(client, 'categories', category, png(200, 100, seed=2))
+    digest = response.json()['hash']
+    assert image_url(client, category, digest) == f'{backend.MEDIA_URL}/{digest}-200w.webp'
+    assert sorted(path.name for path in media.iterdir()) == sorted([f'{digest}.png', f'{digest}-200w.webp', f'{digest}-200w.jpg'])
+
+
+def test_same_content_again_is_done_at_once(client, media, category):
+    data = png(400, 300, seed=3)
+    digest = upload(client, 'categories', category, data).json()['hash']
+    image_url(client, category, digest)
+    response = upload(client, 'categories', category, data)
+    assert response.status_code == 200
+    assert response.json()['hash'] == digest
+    assert response.json()['status'] == 'done'
+
+
+def test_unsupported_type(client, media, category):
+    response = upload(client, 'categories', category, b'GIF89a...', 'text/plain')
+    assert response.status_code == 415
+    assert upload(client, 'categories', category, b'not an image').status_code == 400
+    assert upload(client, 'drivers', 1, png(10, 10)).status_code == 404
+    assert upload(client, 'categories', 999999, png(10, 10)).status_code == 404
+
+
+def test_too_large(client, media, category, monkeypatch):
+    monkeypatch.setattr(backend, 'IMAGE_MAX_BYTES', 1000)
+    data = png(10, 10)
+    assert len(data) < 1000
+    assert upload(client, 'categories', category, data + b'\0' * 1000).status_code == 413
+
+    # A chunked body without a Content-Length
+    def chunks():
+        for _ in range(10):
+            yield b'\0' * 500
+
+    response = client.put(f'/api/admin/categories/{category}/image', content=chunks(), headers={'Content-Type': 'image/png'})
+    assert response.status_code == 413
+    assert list(media.iterdir()) == []
+
+
+def test_content_length_is_checked_before_reading(monkeypatch):
+    monkeypatch.setattr(backend, 'IMAGE_MAX_BYTES', 1000)
+
+    async def receive():
+        raise AssertionError('body read')
+
+    request = Request({
+        'type': 'http', 'method': 'PUT', 'path': '/api/admin/categories/1/image', 'query_string': b'',
+        'headers': [(b'content-type', b'image/png'), (b'content-length', b'1001')],
+    }, receive)
+    with pytest.raises(backend.HTTPException) as error:
+        asyncio.run(backend.read_image_body(request))
+    assert error.value.status_code == 413
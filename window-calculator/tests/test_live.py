@@ -0,0 +1,102 @@
+"""/api/calculate/live: bind a configuration, then stream input deltas."""
+import pytest
+
+import backend
+
+
+def bind(opening, **extra):
+    return {'type': 'bind', **{field: opening[field] for field in backend.ConfigKey._fields}, **extra}
+
+
+def calculated(client, body):
+    result = client.post('/api/calculate', json=body).json()
+    del result['debug']
+    return result
+
+
+def test_results_match_calculate(client, opening):
+    with client.websocket_connect('/api/calculate/live') as socket:
+        socket.send_json(bind(opening))
+        assert socket.receive_json() == {'type': 'bound', 'catalog_version': backend.get_catalog().version}
+        inputs = {field: opening[field] for field in ('plaisio_width', 'plaisio_height', 'ug_value', 'psi_value')}
+        socket.send_json({'type': 'input', 'seq': 1, **inputs})
+        reply = socket.receive_json()
+        assert (reply['type'], reply['seq']) == ('result', 1)
+        assert reply['result'] == calculated(client, opening)
+
+        # A delta keeps the other inputs
+        socket.send_json({'seq': 2, 'plaisio_width': 1800})
+        reply = socket.receive_json()
+        assert reply['seq'] == 2
+        assert reply['result'] == calculated(client, {**opening, 'plaisio_width': 1800})
+
+
+def test_bind_with_inputs_and_flags(client, opening):
+    body = {**opening, 'is_narrow': True, 'has_rolo': True, 'rolo_height': 250, 'ur_value': 1.2}
+    with client.websocket_connect('/api/calculate/live') as socket:
+        socket.send_json({**bind(opening, is_narrow=1, has_rolo=True, seq=7), **{
+            field: body[field] for field in backend.LIVE_INPUT_FIELDS
+        }})
+        assert socket.receive_json()['type'] == 'bound'
+        reply = socket.receive_json()
+        assert reply['seq'] == 7
+        assert reply['result'] == calculated(client, body)
+        assert reply['result']['is_narrow'] is True
+
+
+@pytest.mark.parametrize('flags', [{'is_narrow': 'yes'}, {'has_rolo': 2}, {'is_narrow': [True]}])
+def test_flags_follow_the_batch_rule(client, opening, flags):
+    with client.websocket_connect('/api/calculate/live') as socket:
+        socket.send_json(bind(opening, seq=3, **flags))
+        assert socket.receive_json() == {
+            'type': 'error', 'status': 422, 'detail': "is_narrow and has_rolo must be true or false", 'seq': 3,
+        }
+        # Not bound
+        socket.send_json({'seq': 4, 'plaisio_width': 1500})
+        assert socket.receive_json()['detail'] == "Bind a configuration first"
+
+
+def test_errors(client, opening):
+    with client.websocket_connect('/api/calculate/live') as socket:
+        socket.send_json({'seq': 1, 'plaisio_width': 1500})
+        assert socket.receive_json() == {'type': 'error', 'status': 400, 'detail': "Bind a configuration first", 'seq': 1}
+        socket.send_json({**bind(opening), 'series_id': '1'})
+        assert socket.receive_json()['status'] == 422
+        socket.send_json(bind(opening, driver_id=999))
+        assert socket.receive_json()['status'] == 404
+        socket.send_json({'type': 'refresh'})
+        assert socket.receive_json()['detail'] == "Unknown message type 'refresh'"
+        socket.send_text('[1, 2]')
+        assert socket.receive_json()['detail'] == "Messages must be JSON objects"
+
+        socket.send_json(bind(opening))
+        assert socket.receive_json()['type'] == 'bound'
+        # Incomplete inputs
+        socket.send_json({'seq': 2, 'plaisio_width': 1500})
+        assert socket.receive_json() == {
+            'type': 'error', 'status': 422, 'detail': backend.BATCH_ERRORS['INVALID_VALUE'][1], 'seq': 2,
+        }
+        socket.send_json({'seq': 3, 'plaisio_width': 'wide'})
+        assert socket.receive_json()['status'] == 422
+        socket.send_json({'seq': 4, **{field: opening[field] for field in ('plaisio_height', 'ug_value', 'psi_value')}, 'plaisio_width': 1})
+        reply = socket.receive_json()
+        assert (reply['status'], reply['code'], reply['seq']) == (400, 'WIDTH_RANGE', 4)
+
+
+def test_result_resent_after_a_catalog_edit(client, opening):
+    series = backend.get_catalog().series[opening['series_id']]
+    with client.websocket_connect('/api/calculate/live') as socket:
+        socket.send_json({**bind(opening), 'seq': 1, **{
+            field: opening[field] for field in ('plaisio_width', 'plaisio_height', 'ug_value', 'psi_value')
+        }})
+        assert socket.receive_json()['type'] == 'bound'
+        before = socket.receive_json()
+        client.put(f"/api/admin/series/{series.id}", json={'uf1': series.uf1 + 1})
+        try:
+            after = socket.receive_json()
+            assert after['seq'] == 1
+            assert after['catalog_version'] > before['catalog_version']
+            assert after['result'] == calculated(client, opening)
+            assert after['result']['Uw'] > before['result']['Uw']
+        finally:
+            client.put(f"/api/admin/series/{series.id}", json={'uf1': series.uf1})
@@ -0,0 +1,109 @@
+"""Opening (casement) configurations: created through the admin, calculated by OPENING_METHOD."""
+import pytest
+
+import backend
+
+OPENING_TYPE = 2
+
+
+@pytest.fixture(scope='module')
+def opening_configurations(client):
+    """One- and two-leaf opening categories, offered with the first driver of every series"""
+    categories = [
+        client.post('/api/admin/categories', json={'type_id': OPENING_TYPE, 'name': name, 'num_glasses': glasses}).json()
+        for name, glasses in (('Μονόφυλλο Ανοιγόμενο', 1), ('Δίφυλλο Ανοιγόμενο', 2))
+    ]
+    catalog = backend.get_catalog()
+    drivers = {}
+    for driver in catalog.drivers.values():
+        drivers.setdefault(driver.series_id, driver)
+    links = [
+        client.post('/api/admin/driver-categories', json={'driver_id': driver.id, 'category_id': category['id']}).json()
+        for category in categories for driver in drivers.values()
+    ]
+    catalog = backend.get_catalog()
+    keys = [
+        backend.ConfigKey(driver.series_id, category['id'], driver.id, sash.id)
+        for category in categories for driver in drivers.values()
+        for sash in catalog.sashes.values() if sash.series_id == driver.series_id
+    ]
+    yield keys
+    for link in links:
+        client.delete(f"/api/admin/driver-categories/{link['id']}")
+
+
+def test_configurations_are_offered(client, opening_configurations):
+    offered = backend.catalog_configurations(backend.get_catalog())
+    for key in opening_configurations:
+        assert key.driver_id in offered[key.series_id][(key.category_id, key.sash_id)]
+    series_id = opening_configurations[0].series_id
+    categories = client.get(f'/api/series/{series_id}/categories').json()
+    assert {category['id'] for category in categories} >= {key.category_id for key in opening_configurations}
+
+
+def test_scalar_and_columnar_results_agree(client, opening, opening_configurations):
+    rows = [
+        {**opening, **key._asdict(), 'plaisio_width': width, 'is_narrow': narrow, **extra}
+        for key in opening_configurations
+        for width in (800, 1500)
+        for narrow in (False, True)
+        for extra in ({}, {'has_rolo': True, 'rolo_height': 250, 'ur_value': 1.2})
+    ]
+    batch = client.post('/api/calculate/batch', json=rows).json()
+    assert batch['errors'] == []
+    for i, row in enumerate(rows):
+        single = client.post('/api/calculate', json=row).json()
+        assert single['debug']['method'] == 'opening'
+        for name in ('Uw', 'Uw_open', 'Uw_closed', 'GW', 'GH', 'Af', 'Ag', 'Ig'):
+            expected = single[name]
+            assert batch['results'][name][i] == (None if expected is None else pytest.approx(expected, abs=1e-4)), (name, row)
+
+
+def test_leaves_share_the_width(client, opening, opening_configurations):
+    one, two = (
+        client.post('/api/calculate', json={**opening, **key._asdict()}).json()
+        for key in (opening_configurations[0], opening_configurations[len(opening_configurations) // 2])
+    )
+    assert (one['num_glasses'], two['num_glasses']) == (1, 2)
+    assert two['GW'] < one['GW'] / 2
+    assert one['GH'] == two['GH']
+
+
+def test_special_opening_category_is_not_calculated(client, opening, opening_configurations):
+    key = opening_configurations[0]
+    assert client.put(f'/api/admin/categories/{key.category_id}', json={'has_special_calculation': True}).status_code == 200
+    try:
+        row = {**opening, **key._asdict()}
+        response = client.post('/api/calculate', json=row)
+        assert response.status_code == 404
+        assert response.json()['detail'] == "Calculation method not found for this category"
+        batch = client.post('/api/calculate/batch', json=[row]).json()
+        assert batch['errors'][0]['status'] == 404
+    finally:
+        client.put(f'/api/admin/categories/{key.category_id}', json={'has_special_calculation': False})
+
+
+def test_type_picks_the_method(client, opening):
+    category_id = opening['category_id']
+    sliding = client.post('/api/calculate', json=opening).json()
+    assert client.put(f'/api/admin/categories/{category_id}', json={'type_id': OPENING_TYPE}).status_code == 200
+    try:
+        result = client.post('/api/calculate', json=opening).json()
+        req = backend.CalculationRequest(**opening)
+        assert result == backend.compute_opening_uw(req, *backend.resolve_calculation(backend.get_catalog(), req)[:5])
+        assert result['Uw'] != sliding['Uw']
+    finally:
+        client.put(f'/api/admin/categories/{category_id}', json={'type_id': 1})
+    assert client.post('/api/calculate', json=opening).json() == sliding
+
+
+def test_admin_checks(client, opening):
+    assert client.post('/api/admin/categories', json={'type_id': 99, 'name': 'x', 'num_glasses': 1}).status_code == 400
+    assert client.post('/api/admin/categories', json={'type_id': OPENING_TYPE, 'name': 'x', 'num_glasses': 0}).status_code == 422
+    assert client.put(f"/api/admin/categories/{opening['category_id']}", json={'type_id': 99}).status_code == 400
+    assert client.put(f"/api/admin/series/{opening['series_id']}", json={'type_id': 99}).status_code == 400
+    link = {'driver_id': opening['driver_id'], 'category_id': opening['category_id']}
+    assert client.post('/api/admin/driver-categories', json=link).status_code == 409
+    assert client.post('/api/admin/driver-categories', json={**link, 'driver_id': 999}).status_code == 404
+    assert client.post('/api/admin/driver-categories', json={**link, 'category_id': 999}).status_code == 404
+    assert client.delete('/api/admin/driver-categories/999999').status_code == 404
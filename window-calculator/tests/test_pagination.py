@@ -0,0 +1,130 @@
+"""List endpoints: `fields` projection and keyset pages linked by rel="next"."""
+import re
+import sqlite3
+
+import pytest
+
+import backend
+
+
+def walk(client, url, **params):
+    """Rows of every page, following the Link headers; returns (rows, pages)"""
+    rows, pages = [], 0
+    response = client.get(url, params=params)
+    while True:
+        assert response.status_code == 200
+        rows += response.json()
+        pages += 1
+        link = response.headers.get('link')
+        if link is None:
+            return rows, pages
+        match = re.fullmatch(r'<\?(.*)>; rel="next"', link)
+        assert match, link
+        response = client.get(f"{url}?{match.group(1)}")
+
+
+def test_fields_projection(client):
+    assert client.get('/api/series', params={'fields': 'name'}).json()[0].keys() == {'id', 'name'}
+    # Schema order, whatever the order asked for
+    assert list(client.get('/api/series', params={'fields': 'name, type_id'}).json()[0]) == ['id', 'type_id', 'name']
+    series = client.get('/api/series').json()[0]
+    assert client.get(f"/api/series/{series['id']}", params={'fields': 'name'}).json() == {'id': series['id'], 'name': series['name']}
+
+    response = client.get('/api/series', params={'fields': 'name,price'})
+    assert (response.status_code, response.json()['detail']) == (400, "Unknown field(s) for series: price")
+
+
+def test_heavy_columns_only_when_asked(client):
+    assert 'image_url' not in client.get('/api/types').json()[0]
+    assert 'image_url' in client.get('/api/types', params={'fields': '*'}).json()[0]
+    assert 'image_url' in client.get('/api/types', params={'fields': 'image_url'}).json()[0]
+    # Not a calculator step: every column
+    assert 'image_url' in client.get('/api/series').json()[0]
+
+
+@pytest.mark.parametrize('url, order', [
+    ('/api/categories', ('id',)),
+    ('/api/series/1/categories', ('num_glasses', 'id')),
+])
+def test_pages_cover_the_list(client, url, order):
+    everything = client.get(url).json()
+    assert 'link' not in client.get(url).headers
+    assert everything == sorted(everything, key=lambda row: tuple(row[column] for column in order))
+    rows, pages = walk(client, url, limit=1, fields='name')
+    assert [row['id'] for row in rows] == [row['id'] for row in everything]
+    assert rows[0].keys() == {'id', 'name'}
+    # No Link on the last page
+    assert pages == len(everything)
+
+    rows, pages = walk(client, url, limit=len(everything))
+    assert (rows, pages) == (everything, 1)
+
+
+@pytest.mark.parametrize('limit', [0, backend.MAX_LIST_LIMIT + 1])
+def test_limit_bounds(client, limit):
+    assert client.get('/api/categories', params={'limit': limit}).status_code == 422
+
+
+def test_deleted_after_id(client, opening):
+    category = client.post('/api/admin/categories', json={'type_id': 1, 'name': 'Page test', 'num_glasses': 2}).json()
+    link = client.post('/api/admin/driver-categories', json={'driver_id': opening['driver_id'], 'category_id': category['id']}).json()
+    url = f"/api/series/{opening['series_id']}/categories"
+    everything = client.get(url).json()
+    position = [row['id'] for row in everything].index(category['id'])
+    assert client.get(url, params={'after_id': category['id']}).json() == everything[position + 1:]
+
+    client.delete(f"/api/admin/driver-categories/{link['id']}")
+    conn = sqlite3.connect(backend.DB_PATH)
+    conn.execute("DELETE FROM categories WHERE id = ?", (category['id'],))
+    backend.bump_catalog_version(conn.cursor())
+    conn.commit()
+    conn.close()
+    backend.expire_catalog(backend.DEFAULT_CATALOG)
+
+    response = client.get(url, params={'after_id': category['id']})
+    assert response.status_code == 400
+    assert response.json()['detail'] == f"after_id {category['id']} no longer exists; start from the first page"
+    # An id-ordered list goes on after any id
+    assert client.get('/api/categories', params={'after_id': category['id']}).status_code == 200
+
+
+def test_all_data_pages_one_table(client):
+    everything = client.get('/api/admin/all-data').json()['sashes']
+    rows = []
+    response = client.get('/api/admin/all-data', params={'tables': 'sashes', 'fields': 'sashes.name', 'limit': 2})
+    while True:
+        rows += response.json()['sashes']
+        link = response.headers.get('link')
+        if link is None:
+            break
+        response = client.get(f"/api/admin/all-data?{link[2:link.index('>')]}")
+    assert rows == [{'id': row['id'], 'name': row['name']} for row in everything]
+    response = client.get('/api/admin/all-data', params={'tables': 'sashes,drivers', 'limit': 2})
+    assert response.status_code == 400
+
+
+@pytest.fixture
+def projects(client):
+    ids = [client.post('/api/projects', json={'name': f'Page {i}'}).json()['id'] for i in range(5)]
+    yield ids
+    for project_id in ids:
+        client.delete(f'/api/projects/{project_id}')
+
+
+def test_projects_pages(client, projects, monkeypatch):
+    monkeypatch.setattr(backend, 'PROJECTS_PAGE_SIZE', 2)
+    first = client.get('/api/projects')
+    assert len(first.json()) == 2 and 'link' in first.headers
+
+    rows, pages = walk(client, '/api/projects', fields='name')
+    ids = [row['id'] for row in rows]
+    assert ids == sorted(set(ids))
+    assert [project_id for project_id in ids if project_id in projects] == projects
+    assert pages >= 3
+    assert rows[0].keys() == {'id', 'name', 'opening_count', 'stale_openings', 'results_current'}
+
+    # An explicit limit wins over the page size
+    assert len(client.get('/api/projects', params={'limit': 4}).json()) == 4
+    assert client.get('/api/projects', params={'after_id': projects[-1]}).json() == [
+        row for row in client.get('/api/projects', params={'limit': backend.MAX_LIST_LIMIT}).json() if row['id'] > projects[-1]
+    ]
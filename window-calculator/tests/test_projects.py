@@ -0,0 +1,85 @@
+"""Saved projects: results stored with the openings, recalculated after catalog edits."""
+import pytest
+
+import backend
+
+
+@pytest.fixture
+def project(client, opening):
+    response = client.post('/api/projects', json={
+        'name': 'Test project',
+        'openings': [{**opening, 'label': 'W1', 'quantity': 2}, {**opening, 'plaisio_width': 2000}],
+    })
+    assert response.status_code == 200
+    project = response.json()
+    yield project
+    client.delete(f"/api/projects/{project['id']}")
+
+
+def stored_openings(client, project):
+    return client.get(f"/api/projects/{project['id']}").json()['openings']
+
+
+def test_openings_are_stored_with_their_results(client, opening, project):
+    assert project['opening_count'] == 2
+    assert project['results_current'] is True
+    first, second = stored_openings(client, project)
+    assert (first['label'], first['quantity']) == ('W1', 2)
+    assert first['result']['Uw'] == client.post('/api/calculate', json=opening).json()['Uw']
+    assert second['result']['Uw'] == client.post('/api/calculate', json={**opening, 'plaisio_width': 2000}).json()['Uw']
+    assert first['catalog_version'] == backend.read_catalog_version()
+
+
+@pytest.mark.parametrize('quantity', [0, -1, backend.MAX_QUANTITY + 1])
+def test_quantity_limits(client, opening, project, quantity):
+    response = client.post(f"/api/projects/{project['id']}/openings", json={**opening, 'quantity': quantity})
+    assert response.status_code == 422
+    assert len(stored_openings(client, project)) == 2
+
+
+def test_invalid_opening_is_not_stored(client, opening, project):
+    response = client.post(f"/api/projects/{project['id']}/openings", json={**opening, 'psi_value': 0.07})
+    assert response.status_code == 400
+    assert len(stored_openings(client, project)) == 2
+    assert client.post('/api/projects/999999/openings', json=opening).status_code == 404
+
+
+def test_catalog_edit_recalculates_dependent_openings(client, opening, project):
+    series = backend.get_catalog().series[opening['series_id']]
+    before = [stored['result']['Uw'] for stored in stored_openings(client, project)]
+    # Background tasks run before the test client returns
+    assert client.put(f"/api/admin/series/{series.id}", json={'uf1': series.uf1 + 1}).status_code == 200
+    try:
+        after = stored_openings(client, project)
+        assert all(stored['results_current'] for stored in after)
+        assert all(stored['result']['Uw'] > uw for stored, uw in zip(after, before))
+        assert after[0]['result']['Uw'] == client.post('/api/calculate', json=opening).json()['Uw']
+    finally:
+        client.put(f"/api/admin/series/{series.id}", json={'uf1': series.uf1})
+    assert [stored['result']['Uw'] for stored in stored_openings(client, project)] == before
+
+
+def test_failing_opening_keeps_an_error(client, opening, project):
+    params = backend.get_catalog().params_by_id[stored_openings(client, project)[0]['params_id']]
+    assert client.put(f"/api/admin/series-category-params/{params.id}", json={'gw_divisor': 0}).status_code == 200
+    try:
+        for stored in stored_openings(client, project):
+            assert stored['result'] is None
+            assert stored['error']
+    finally:
+        client.put(f"/api/admin/series-category-params/{params.id}", json={'gw_divisor': params.gw_divisor})
+    assert all(stored['error'] is None and stored['result'] for stored in stored_openings(client, project))
+
+
+def test_recalculate_and_delete(client, opening, project):
+    response = client.post(f"/api/projects/{project['id']}/recalculate")
+    assert response.status_code == 200
+    assert client.get(f"/api/projects/{project['id']}").json()['results_current'] is True
+
+    opening_id = stored_openings(client, project)[1]['id']
+    assert client.delete(f"/api/projects/{project['id']}/openings/{opening_id}").status_code == 200
+    assert client.delete(f"/api/projects/{project['id']}/openings/{opening_id}").status_code == 404
+    assert [stored['label'] for stored in stored_openings(client, project)] == ['W1']
+
+    assert client.delete(f"/api/projects/{project['id']}").status_code == 200
+    assert client.get(f"/api/projects/{project['id']}").status_code == 404
@@ -0,0 +1,80 @@
+"""/api/ready: 503 until the default catalog is warm, 200 from then on."""
+import pytest
+
+import backend
+
+
+@pytest.fixture
+def warm_up_states(monkeypatch):
+    """A worker started with WARM_UP=1 that has not warmed anything yet"""
+    monkeypatch.setattr(backend, 'WARM_UP', True)
+    monkeypatch.setattr(backend, 'warm_up_states', {})
+    monkeypatch.setattr(backend, 'warming_catalogs', set())
+    return backend.warm_up_states
+
+
+def test_ready_without_warm_up(client, monkeypatch):
+    monkeypatch.setattr(backend, 'WARM_UP', False)
+    monkeypatch.setattr(backend, 'warm_up_states', {})
+    assert client.get('/api/ready').status_code == 200
+
+
+def test_ready_after_warm_up(client, warm_up_states):
+    response = client.get('/api/ready')
+    assert response.status_code == 503
+    assert response.json()['status'] == 'pending'
+
+    backend.warming_catalogs.add(backend.DEFAULT_CATALOG)
+    response = client.get('/api/ready')
+    assert response.status_code == 503
+    assert response.json()['status'] == 'warming'
+    backend.warming_catalogs.clear()
+
+    state = client.post('/api/admin/warm-up').json()
+    assert state['status'] == 'ready'
+    assert state['failed'] == 0
+    assert state['configurations'] > 0
+    response = client.get('/api/ready')
+    assert response.status_code == 200
+    assert response.json()['warming'] is False
+
+
+def test_stays_ready_while_warming_again(client, warm_up_states):
+    client.post('/api/admin/warm-up')
+    backend.warming_catalogs.add(backend.DEFAULT_CATALOG)
+    response = client.get('/api/ready')
+    assert response.status_code == 200
+    assert response.json()['status'] == 'ready'
+    assert response.json()['warming'] is True
+
+
+def test_failed_warm_up(client, warm_up_states, monkeypatch):
+    def fail(catalog):
+        raise RuntimeError('no memory')
+
+    monkeypatch.setattr(backend, 'compiled_catalog', fail)
+    state = client.post('/api/admin/warm-up').json()
+    assert state['status'] == 'failed'
+    assert state['detail'] == 'no memory'
+    assert client.get('/api/ready').status_code == 503
+
+
+def test_failing_configurations_keep_the_worker_ready(client, warm_up_states, monkeypatch):
+    failing = backend.run_calculation
+
+    def run_calculation(req, catalog_version=None):
+        if req.series_id == 1:
+            raise ZeroDivisionError('float division by zero')
+        return failing(req, catalog_version)
+
+    monkeypatch.setattr(backend, 'run_calculation', run_calculation)
+    state = client.post('/api/admin/warm-up').json()
+    assert state['status'] == 'ready'
+    assert state['failed'] > 0
+    assert len(state['errors']) == min(state['failed'], backend.MAX_WARM_UP_ERRORS)
+    assert client.get('/api/ready').status_code == 200
+
+
+def test_unknown_catalog(client, warm_up_states):
+    assert client.post('/api/catalogs/nothing/admin/warm-up').status_code == 404
+    assert 'nothing' not in backend.warm_up_states
@@ -0,0 +1,66 @@
+"""/api/calculate/sensitivity: the analytical derivatives match finite differences."""
+import numpy as np
+import pytest
+
+import backend
+
+ROLO = {'has_rolo': True, 'rolo_height': 250, 'ur_value': 1.2}
+STEPS = {'ug_value': 1e-4, 'psi_value': 1e-4, 'plaisio_width': 1e-3, 'plaisio_height': 1e-3, 'rolo_height': 1e-3, 'ur_value': 1e-4}
+
+
+@pytest.fixture
+def rows(opening, configurations):
+    return [{**opening, **key._asdict(), **extra} for key in configurations for extra in ({}, ROLO)]
+
+
+def unrounded(rows):
+    """compute_uw_columns() of `rows`, as the batch endpoint runs it"""
+    n, columns, invalid = backend.parse_batch_columns(rows)
+    codes = backend.batch_validation_codes(columns, invalid)
+    codes, config = backend.gather_config_columns(backend.get_catalog(), columns, codes)
+    return codes, backend.compute_uw_columns(config, columns)
+
+
+def test_derivatives_match_finite_differences(client, rows):
+    response = client.post('/api/calculate/sensitivity', json=rows).json()
+    codes, _ = unrounded(rows)
+    valid = codes == 0
+    assert response['valid'] == valid.sum() > len(rows) // 2
+
+    for name, step in STEPS.items():
+        _, above = unrounded([{**row, name: row[name] + step} if row.get(name) is not None else row for row in rows])
+        _, below = unrounded([{**row, name: row[name] - step} if row.get(name) is not None else row for row in rows])
+        for output in ('Uw', 'Uw_open', 'Uw_closed'):
+            reported = response['sensitivities'][output][name]
+            differences = (above[output] - below[output]) / (2 * step)
+            for i in np.flatnonzero(valid):
+                if reported[i] is None:
+                    continue
+                assert reported[i] == pytest.approx(differences[i], rel=1e-3, abs=1e-7), (output, name, rows[i])
+
+
+def test_entries_that_do_not_apply_are_null(client, opening):
+    response = client.post('/api/calculate/sensitivity', json=[opening, {**opening, **ROLO}, {**opening, 'psi_value': 0.07}]).json()
+    sensitivities = response['sensitivities']
+    assert sensitivities['Uw']['ur_value'] == [None, None, None]
+    assert sensitivities['Uw']['rolo_height'][0] is None and sensitivities['Uw']['rolo_height'][1] is not None
+    assert sensitivities['Uw_open']['ug_value'][0] is None and sensitivities['Uw_open']['ug_value'][1] is not None
+    # An invalid row has no derivatives
+    assert all(derivatives[2] is None for output in sensitivities.values() for derivatives in output.values())
+    assert [error['index'] for error in response['errors']] == [2]
+
+
+def test_admin_formulas_are_differentiated_numerically(client, rows):
+    analytic = client.post('/api/calculate/sensitivity', json=rows).json()
+    formulas = [{'name': name, 'expression': expression} for name, expression in backend.DEFAULT_FORMULAS['sliding']]
+    assert client.put('/api/admin/formulas/sliding', json={'formulas': formulas}).status_code == 200
+    try:
+        numeric = client.post('/api/calculate/sensitivity', json=rows).json()
+    finally:
+        client.delete('/api/admin/formulas/sliding')
+    assert numeric['results'] == analytic['results']
+    for output, derivatives in analytic['sensitivities'].items():
+        for name, column in derivatives.items():
+            assert numeric['sensitivities'][output][name] == [
+                None if value is None else pytest.approx(value, rel=1e-4, abs=1e-7) for value in column
+            ], (output, name)
@@ -0,0 +1,99 @@
+"""SQL_TRACE: statement accounting per text, Server-Timing and the slow/scan/N+1 warnings."""
+import logging
+import sqlite3
+
+import pytest
+
+import backend
+
+
+@pytest.fixture
+def traced(client, monkeypatch):
+    """SQL_TRACE on, with statement stats of the test's own"""
+    monkeypatch.setattr(backend, 'SQL_TRACE', True)
+    monkeypatch.setattr(backend, 'sql_statements', {})
+    return backend.sql_statements
+
+
+@pytest.fixture
+def conn(traced, tmp_path):
+    conn = backend.open_db(str(tmp_path / 'traced.db'))
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.executemany("INSERT INTO t (name) VALUES (?)", [('a',), ('b',), ('c',)])
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize('sql, key', [
+    ("SELECT *\n    FROM t\n    WHERE id = ?", "SELECT * FROM t WHERE id = ?"),
+    ("SELECT * FROM t WHERE id IN (?)", "SELECT * FROM t WHERE id IN (?)"),
+    ("SELECT * FROM t WHERE id IN (?,?)", "SELECT * FROM t WHERE id IN (?, ...)"),
+    ("SELECT * FROM t WHERE id IN (?, ?,\n ?, ?)", "SELECT * FROM t WHERE id IN (?, ...)"),
+    ("INSERT INTO t (id, name) VALUES (?, ?)", "INSERT INTO t (id, name) VALUES (?, ...)"),
+])
+def test_statement_key(sql, key):
+    assert backend.sql_statement_key(sql) == key
+
+
+def test_statements_are_counted_once_per_text(conn, traced):
+    assert isinstance(conn, backend.TracedConnection)
+    for ids in ([1], [1, 2], [1, 2, 3]):
+        conn.cursor().execute(f"SELECT name FROM t WHERE id IN ({', '.join('?' * len(ids))})", ids)
+    # The connection shortcuts are timed too
+    conn.execute("SELECT name FROM t WHERE id IN (?, ?)", (2, 3))
+    stats = traced["SELECT name FROM t WHERE id IN (?, ...)"]
+    assert stats.count == 3
+    assert traced["SELECT name FROM t WHERE id IN (?)"].count == 1
+    assert stats.total >= stats.max > 0
+    assert stats.plan and stats.scans == []
+    assert traced["INSERT INTO t (name) VALUES (?)"].count == 1
+
+
+def test_scans_are_reported_once(conn, traced, caplog):
+    with caplog.at_level(logging.WARNING, logger=backend.logger.name):
+        for name in ('a', 'b'):
+            conn.execute("SELECT id FROM t WHERE name = ?", (name,))
+        conn.execute("SELECT id FROM t")
+    assert traced["SELECT id FROM t WHERE name = ?"].scans == ['t']
+    # Reading the whole table is not a missing index
+    assert traced["SELECT id FROM t"].scans == []
+    assert [record.getMessage() for record in caplog.records if 'without an index' in record.getMessage()] == [
+        "SQL scans t without an index: SELECT id FROM t WHERE name = ?",
+    ]
+
+
+def test_slow_statements_are_logged(conn, monkeypatch, caplog):
+    monkeypatch.setattr(backend, 'SQL_SLOW_MS', -1)
+    with caplog.at_level(logging.WARNING, logger=backend.logger.name):
+        conn.execute("SELECT name FROM t WHERE id = ?", (1,))
+    assert any(record.getMessage().startswith('Slow SQL') and 'WHERE id = ?' in record.getMessage() for record in caplog.records)
+
+
+def test_statement_table_is_bounded(conn, traced, monkeypatch):
+    monkeypatch.setattr(backend, 'MAX_SQL_STATEMENTS', len(traced))
+    conn.execute("SELECT count(*) FROM t")
+    assert "SELECT count(*) FROM t" not in traced
+
+
+def test_requests_carry_server_timing(client, traced, monkeypatch, caplog):
+    response = client.get('/api/projects')
+    timing = response.headers['server-timing']
+    assert timing.startswith('sql;dur=') and timing.endswith(' statements"')
+    assert int(timing.split('desc="')[1].split()[0]) > 0
+    assert {entry['sql'] for entry in client.get('/api/metrics').json()['sql']} == set(traced)
+
+    monkeypatch.setattr(backend, 'SQL_REPEAT_WARNING', 0)
+    with caplog.at_level(logging.WARNING, logger=backend.logger.name):
+        client.get('/api/projects')
+    assert any('(N+1?)' in record.getMessage() and 'GET /api/projects' in record.getMessage() for record in caplog.records)
+
+
+def test_untraced_by_default(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(backend, 'SQL_TRACE', False)
+    conn = backend.open_db(str(tmp_path / 'plain.db'))
+    try:
+        assert type(conn) is sqlite3.Connection
+    finally:
+        conn.close()
+    assert 'server-timing' not in client.get('/api/projects').headers
+    assert client.get('/api/metrics').json()['sql'] is None
@@ -0,0 +1,62 @@
+"""Precomputed Uw tables (`python backend.py tables`): written, then checked cell by cell."""
+import json
+
+import pytest
+
+import backend
+
+
+@pytest.fixture
+def tables(client, tmp_path, monkeypatch):
+    """Tables of a small grid, written to a temporary directory"""
+    monkeypatch.setattr(backend, 'UW_TABLE_AXES', {
+        'plaisio_width': [800, 1500],
+        'plaisio_height': [1000, 1400],
+        'ug_value': [1.1],
+        'psi_value': [0.04, 0.08],
+    })
+    manifest = backend.write_uw_tables(str(tmp_path))
+    return tmp_path, manifest
+
+
+def test_written_tables_check_clean(client, tables):
+    out_dir, manifest = tables
+    assert manifest['catalog_version'] == backend.get_catalog().version
+    assert backend.check_uw_tables(str(out_dir)) == []
+
+
+def test_cells_match_the_calculation(client, opening, tables):
+    out_dir, manifest = tables
+    series = json.loads((out_dir / manifest['files'][str(opening['series_id'])]).read_text())
+    table = next(
+        table for table in series['tables']
+        if (table['category_id'], table['sash_id']) == (opening['category_id'], opening['sash_id'])
+        and str(opening['driver_id']) in table['drivers'] and table['is_narrow'] in (None, False)
+    )
+    axes = manifest['axes']
+    # plaisio_width 1500, plaisio_height 1400, ug_value 1.1, psi_value 0.08: the last cell
+    index = ((1 * len(axes['plaisio_height']) + 1) * len(axes['ug_value']) + 0) * len(axes['psi_value']) + 1
+    assert table['Uw'][index] / manifest['scale'] == client.post('/api/calculate', json=opening).json()['Uw']
+
+
+def test_catalog_edit_makes_the_tables_stale(client, opening, tables):
+    out_dir, manifest = tables
+    series = backend.get_catalog().series[opening['series_id']]
+    client.put(f"/api/admin/series/{series.id}", json={'uf1': series.uf1 + 1})
+    try:
+        problems = backend.check_uw_tables(str(out_dir))
+    finally:
+        client.put(f"/api/admin/series/{series.id}", json={'uf1': series.uf1})
+    assert problems[0].startswith(f"tables are for catalog version {manifest['catalog_version']}")
+    assert any('stored' in problem for problem in problems)
+
+
+def test_tampered_file(client, tables):
+    out_dir, manifest = tables
+    path = out_dir / next(iter(manifest['files'].values()))
+    content = json.loads(path.read_text())
+    content['tables'][0]['Uw'][0] += 1
+    path.write_text(json.dumps(content))
+    problems = backend.check_uw_tables(str(out_dir))
+    assert any('content does not match its hash' in problem for problem in problems)
+    assert any('stored' in problem for problem in problems)
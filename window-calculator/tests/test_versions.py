@@ -0,0 +1,80 @@
+"""?catalog_version=: calculations against an earlier catalog version, rebuilt from the change log."""
+import sqlite3
+
+import backend
+
+
+def committed_elsewhere(sql, values=()):
+    """One catalog edit committed by another process"""
+    conn = sqlite3.connect(backend.DB_PATH)
+    conn.execute(sql, values)
+    backend.bump_catalog_version(conn.cursor())
+    conn.commit()
+    conn.close()
+    backend.expire_catalog(backend.DEFAULT_CATALOG)
+
+
+def change_log_start():
+    conn = sqlite3.connect(backend.DB_PATH)
+    try:
+        return int(conn.execute("SELECT value FROM metadata WHERE key = 'change_log_start'").fetchone()[0])
+    finally:
+        conn.close()
+
+
+def test_calculate_at_an_earlier_version(client, opening):
+    catalog = backend.get_catalog()
+    series = catalog.series[opening['series_id']]
+    before = client.post('/api/calculate', json=opening).json()
+    client.put(f"/api/admin/series/{series.id}", json={'uf1': series.uf1 + 1})
+    try:
+        assert client.post('/api/calculate', json=opening).json()['Uw'] > before['Uw']
+        assert client.post('/api/calculate', json=opening, params={'catalog_version': catalog.version}).json() == before
+
+        batch = client.post('/api/calculate/batch', json=[opening], params={'catalog_version': catalog.version}).json()
+        assert batch['catalog_version'] == catalog.version
+        assert batch['results']['Uw'] == [before['Uw']]
+        # The rebuilt version shares the records that did not change
+        old = backend.get_catalog(catalog.version)
+        assert old.series[series.id] == series
+        assert old.categories is backend.get_catalog().categories
+    finally:
+        client.put(f"/api/admin/series/{series.id}", json={'uf1': series.uf1})
+
+
+def test_unknown_versions(client, opening):
+    current = backend.get_catalog().version
+    for version in (current + 1, change_log_start() - 1):
+        response = client.post('/api/calculate', json=opening, params={'catalog_version': version})
+        assert response.status_code == 404
+        assert response.json()['detail'] == f"Catalog version {version} not found"
+
+
+def test_configurations_of_an_earlier_version(client):
+    catalog = backend.get_catalog()
+    existing = next(iter(catalog.driver_categories.values()))
+    driver = catalog.drivers[existing.driver_id]
+    # A category the driver does not fit yet, with params for its series
+    category_id = next(
+        params.category_id for params in catalog.params_by_id.values()
+        if params.series_id == driver.series_id and params.category_id in catalog.methods
+        and not any(link.driver_id == driver.id and link.category_id == params.category_id
+                    for link in catalog.driver_categories.values())
+    )
+    committed_elsewhere("DELETE FROM driver_categories WHERE id = ?", (existing.id,))
+    committed_elsewhere("INSERT INTO driver_categories (id, driver_id, category_id) VALUES (9100, ?, ?)", (driver.id, category_id))
+    try:
+        assert 9100 in backend.get_catalog().driver_categories
+        old = backend.catalog_configurations(backend.get_catalog(catalog.version))
+        assert old == backend.catalog_configurations(catalog)
+        new = backend.catalog_configurations(backend.get_catalog())
+        assert any(driver.id in drivers for (category, _), drivers in new[driver.series_id].items() if category == category_id)
+        assert not any(driver.id in drivers for (category, _), drivers in old[driver.series_id].items() if category == category_id)
+        assert existing.id not in backend.get_catalog().driver_categories
+    finally:
+        committed_elsewhere("DELETE FROM driver_categories WHERE id = 9100")
+        committed_elsewhere(
+            "INSERT INTO driver_categories (id, driver_id, category_id) VALUES (?, ?, ?)",
+            (existing.id, existing.driver_id, existing.category_id),
+        )
+    assert backend.catalog_configurations(backend.get_catalog()) == backend.catalog_configurations(catalog)
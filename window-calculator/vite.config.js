@@ -7,6 +7,11 @@ export default defineConfig({
     port: 3000,
     proxy: {
       '/api': {
+        target: 'http://localhost:8000',
+        changeOrigin: true,
+        ws: true
+      },
+      '/media': {
         target: 'http://localhost:8000',
         changeOrigin: true
       }